@@ -0,0 +1,147 @@
+import concurrent.futures
+
+from collections.abc import Sequence
+from typing import Callable
+from typing import TypeVar
+
+from ktoolbox import common
+
+from testConfig import ConfigDescriptor
+from tftbase import ConnectionMode
+
+
+logger = common.ExtendedLogger("tft." + __name__)
+
+
+T = TypeVar("T")
+
+
+def connection_resources(cfg_descr: ConfigDescriptor) -> frozenset[str]:
+    # The resources that a connection occupies while it runs. Two connections
+    # that share any resource must not run at the same time. These are the
+    # nodes where the server/client pods run (the measurements on the node
+    # would interfere) and the single external perf server container.
+    test_case_info = cfg_descr.get_test_case().info
+    node_client = cfg_descr.get_client()
+    if test_case_info.is_same_node:
+        node_server = node_client.name
+    else:
+        node_server = cfg_descr.get_server().name
+    resources = {
+        f"node/{node_client.name}",
+        f"node/{node_server}",
+    }
+    if test_case_info.connection_mode == ConnectionMode.EXTERNAL_IP:
+        resources.add("external-perf-server")
+    return frozenset(resources)
+
+
+def conflict_graph(resources: Sequence[frozenset[str]]) -> list[set[int]]:
+    # For each connection, the indexes of the other connections that share
+    # a resource with it.
+    graph: list[set[int]] = [set() for _ in resources]
+    for idx1, res1 in enumerate(resources):
+        for idx2 in range(idx1 + 1, len(resources)):
+            if res1 & resources[idx2]:
+                graph[idx1].add(idx2)
+                graph[idx2].add(idx1)
+    return graph
+
+
+def run_scheduled(
+    run: Callable[[int], T],
+    *,
+    resources: Sequence[frozenset[str]],
+    max_parallel: int,
+) -> list[T]:
+    """Call run(idx) for each index in resources, in parallel where possible.
+
+    At most "max_parallel" calls run at the same time and calls whose
+    resources intersect never do. Pending indexes are started in order,
+    but an index that is free to run may overtake a blocked one. The
+    results are returned in the order of the indexes.
+    """
+    n = len(resources)
+    if max_parallel <= 1 or n <= 1:
+        return [run(idx) for idx in range(n)]
+
+    graph = conflict_graph(resources)
+    results: dict[int, T] = {}
+    pending = list(range(n))
+    running: dict[concurrent.futures.Future[T], int] = {}
+
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers=min(max_parallel, n),
+        thread_name_prefix="tft-connection",
+    ) as executor:
+        while pending or running:
+            running_idxs = set(running.values())
+            for idx in list(pending):
+                if len(running) >= max_parallel:
+                    break
+                if graph[idx] & running_idxs:
+                    continue
+                pending.remove(idx)
+                running_idxs.add(idx)
+                running[executor.submit(run, idx)] = idx
+
+            done, _ = concurrent.futures.wait(
+                running,
+                return_when=concurrent.futures.FIRST_COMPLETED,
+            )
+            for future in done:
+                idx = running.pop(future)
+                results[idx] = future.result()
+
+    return [results[idx] for idx in range(n)]
+
+
+def run_pipelined(
+    run: Callable[[int], T],
+    *,
+    prepare: Callable[[int, frozenset[str]], None],
+    resources: Sequence[frozenset[str]],
+    lookahead: int,
+) -> list[T]:
+    """Call run(idx) for each index in order, and prepare(idx) ahead of time.
+
+    While run(idx) is running, prepare(idx2, busy) is called in the
+    background for up to "lookahead" of the following indexes. "busy" are
+    the resources of idx, prepare() must leave them alone. Before run(idx)
+    starts, we wait for the pending preparations of idx and of all indexes
+    that share a resource with it. prepare() is best effort, a failure is
+    only logged.
+    """
+    n = len(resources)
+    if lookahead <= 0 or n <= 1:
+        return [run(idx) for idx in range(n)]
+
+    results: list[T] = []
+    prepared: set[int] = set()
+    pending: dict[int, concurrent.futures.Future[None]] = {}
+
+    def _wait(idx2: int) -> None:
+        try:
+            pending.pop(idx2).result()
+        except Exception as e:
+            logger.warning(f"Preparing test case #{idx2} ahead failed: {e}")
+
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers=lookahead,
+        thread_name_prefix="tft-prepare",
+    ) as executor:
+        for idx in range(n):
+            for idx2 in list(pending):
+                if idx2 == idx or resources[idx2] & resources[idx]:
+                    _wait(idx2)
+            prepared.add(idx)
+            for idx2 in range(idx + 1, min(n, idx + 1 + lookahead)):
+                if idx2 in prepared:
+                    continue
+                prepared.add(idx2)
+                pending[idx2] = executor.submit(prepare, idx2, resources[idx])
+            results.append(run(idx))
+        for idx2 in list(pending):
+            _wait(idx2)
+
+    return results
@@ -73,6 +73,7 @@ class EvalIdentity:
 class TestItem(StructParseBase):
     threshold_rx: Optional[float]
     threshold_tx: Optional[float]
+    latency_threshold_p99: Optional[float]
 
     def _post_check(self) -> None:
         object.__setattr__(
@@ -85,6 +86,10 @@ class TestItem(StructParseBase):
     def has_thresholds(self) -> bool:
         return self.threshold_rx is not None or self.threshold_tx is not None
 
+    @property
+    def has_any_thresholds(self) -> bool:
+        return self.has_thresholds or self.latency_threshold_p99 is not None
+
     @property
     def bitrate(self) -> Bitrate:
         bitrate: Bitrate = getattr(self, "_bitrate")
@@ -119,6 +124,7 @@ class TestItem(StructParseBase):
                 yamlpath=pctx.yamlpath,
                 threshold_rx=None,
                 threshold_tx=None,
+                latency_threshold_p99=None,
             )
 
         with pctx.with_strdict() as varg:
@@ -134,6 +140,11 @@ class TestItem(StructParseBase):
                 varg.for_key("threshold"),
                 default=None,
             )
+            latency_threshold_p99 = common.structparse_pop_float(
+                varg.for_key("latency_threshold_p99"),
+                default=None,
+                check=lambda val: val > 0,
+            )
 
             if threshold_rx is None and threshold_tx is None:
                 if threshold is not None:
@@ -151,19 +162,19 @@ class TestItem(StructParseBase):
             yamlpath=pctx.yamlpath,
             threshold_rx=threshold_rx,
             threshold_tx=threshold_tx,
+            latency_threshold_p99=latency_threshold_p99,
         )
 
     def serialize(self) -> dict[str, Any]:
+        def _normalize(x: Optional[float]) -> Optional[int | float]:
+            if x is None:
+                return None
+            if x == int(x):
+                return int(x)
+            return x
+
         extra: dict[str, Any] = {}
         if self.has_thresholds:
-
-            def _normalize(x: Optional[float]) -> Optional[int | float]:
-                if x is None:
-                    return None
-                if x == int(x):
-                    return int(x)
-                return x
-
             if self.threshold_rx == self.threshold_tx:
                 common.dict_add_optional(
                     extra, "threshold", _normalize(self.threshold_rx)
@@ -175,6 +186,9 @@ class TestItem(StructParseBase):
                 common.dict_add_optional(
                     extra, "threshold_tx", _normalize(self.threshold_tx)
                 )
+        common.dict_add_optional(
+            extra, "latency_threshold_p99", _normalize(self.latency_threshold_p99)
+        )
         return extra
 
 
@@ -225,9 +239,9 @@ class TestCaseData(StructParseBase):
 
     def serialize(self) -> dict[str, Any]:
         extra: dict[str, Any] = {}
-        if self.normal.has_thresholds:
+        if self.normal.has_any_thresholds:
             common.dict_add_optional(extra, "Normal", self.normal.serialize())
-        if self.reverse.has_thresholds:
+        if self.reverse.has_any_thresholds:
             common.dict_add_optional(extra, "Reverse", self.reverse.serialize())
         return {
             "id": self.test_case_type.name,
@@ -38,9 +38,18 @@ class Evaluator:
 
         bitrate_threshold_rx: Optional[float] = None
         bitrate_threshold_tx: Optional[float] = None
+        latency_threshold_p99: Optional[float] = None
         if item is not None:
             bitrate_threshold_rx = item.get_threshold(rx=True)
             bitrate_threshold_tx = item.get_threshold(tx=True)
+            latency_threshold_p99 = item.latency_threshold_p99
+
+        latency_us: Optional[tftbase.Latency] = None
+        latency_error = "no latency was recorded"
+        try:
+            latency_us = flow_test.latency_us
+        except ValueError as e:
+            latency_error = str(e)
 
         success = True
         msg: Optional[str] = None
@@ -56,6 +65,14 @@ class Evaluator:
         elif not flow_test.bitrate_gbps.is_passing(bitrate_threshold_tx, tx=True):
             success = False
             msg = f"Run succeeded but {flow_test.bitrate_gbps} is below TX threshold {bitrate_threshold_tx}"
+        elif latency_threshold_p99 is not None and latency_us is None:
+            success = False
+            msg = f"Run succeeded but p99 latency threshold {latency_threshold_p99}us cannot be checked: {latency_error}"
+        elif latency_us is not None and not latency_us.is_passing(
+            latency_threshold_p99
+        ):
+            success = False
+            msg = f"Run succeeded but p99 latency {latency_us.p99}us is above threshold {latency_threshold_p99}us"
 
         return flow_test.clone(
             eval_result=tftbase.EvalResult(
@@ -32,10 +32,15 @@ def load_logs(
     logs: Iterable[str],
     *,
     skip_invalid_logs: bool = False,
+    validate: bool = True,
 ) -> Iterable[TftResults]:
     for log in list(logs):
         try:
-            tft_results = TftResults.parse_from_file(log)
+            tft_results = TftResults.parse_from_file(
+                log,
+                validate=validate,
+                lazy=True,
+            )
         except Exception as e:
             if not skip_invalid_logs:
                 raise
@@ -182,6 +187,11 @@ def parse_args() -> argparse.Namespace:
         action="store_true",
         help='If set any invalid "--logs" files are ignored. This is useful because the output format is not stable, so your last logs might have been generated with an incompatible version and we want to skip those errors.',
     )
+    parser.add_argument(
+        "--trust-logs",
+        action="store_true",
+        help="Skip the type checks while loading the logs. This is faster with many logs, but only use it for logs that were written by tft.py.",
+    )
     parser.add_argument(
         "-f",
         "--force",
@@ -292,6 +302,16 @@ def generate_result_config(
         if not bitrate_reverse.is_na:
             list_entry["Reverse"] = bitrate_to_yaml(bitrate_reverse)
 
+        if config is not None:
+            # Latency thresholds are not generated from the logs. Keep the
+            # ones from the base config.
+            for key, ei2 in (("Normal", ei), ("Reverse", ei_reverse)):
+                item = config.get_item_for_id(ei2)
+                if item is not None and item.latency_threshold_p99 is not None:
+                    list_entry.setdefault(key, {})[
+                        "latency_threshold_p99"
+                    ] = item.latency_threshold_p99
+
         lst.append(list_entry)
 
     # Normalize the generated dictionary by sorting.
@@ -334,6 +354,7 @@ def main() -> None:
     all_tft_results = load_logs(
         args.logs,
         skip_invalid_logs=args.skip_invalid_logs,
+        validate=not args.trust_logs,
     )
 
     all_bitrates = collect_all_bitrates(config, all_tft_results)
@@ -0,0 +1,740 @@
+import base64
+import concurrent.futures
+import dataclasses
+import http.client
+import json
+import os
+import select
+import socket
+import ssl
+import struct
+import tempfile
+import threading
+import urllib.parse
+import yaml
+
+from collections.abc import Generator
+from typing import Any
+from typing import Callable
+from typing import Optional
+
+from ktoolbox import common
+
+
+logger = common.ExtendedLogger("tft." + __name__)
+
+
+# The resource names that we use with "oc get"/"oc delete", mapped to the API
+# path prefix and the plural resource name.
+RESOURCES: dict[str, tuple[str, str]] = {
+    "pod": ("api/v1", "pods"),
+    "pods": ("api/v1", "pods"),
+    "service": ("api/v1", "services"),
+    "services": ("api/v1", "services"),
+    "multi-networkpolicy": ("apis/k8s.cni.cncf.io/v1beta1", "multi-networkpolicies"),
+    "multi-networkpolicies": (
+        "apis/k8s.cni.cncf.io/v1beta1",
+        "multi-networkpolicies",
+    ),
+    "network-attachment-definition": (
+        "apis/k8s.cni.cncf.io/v1",
+        "network-attachment-definitions",
+    ),
+    "network-attachment-definitions": (
+        "apis/k8s.cni.cncf.io/v1",
+        "network-attachment-definitions",
+    ),
+}
+
+# The kinds that appear in our manifests, mapped to their plural resource name.
+KINDS: dict[str, str] = {
+    "Pod": "pods",
+    "Service": "services",
+    "MultiNetworkPolicy": "multi-networkpolicies",
+    "NetworkAttachmentDefinition": "network-attachment-definitions",
+}
+
+FIELD_MANAGER = "tft"
+
+_WS_OP_CONT = 0x0
+_WS_OP_TEXT = 0x1
+_WS_OP_BINARY = 0x2
+_WS_OP_CLOSE = 0x8
+_WS_OP_PING = 0x9
+_WS_OP_PONG = 0xA
+
+_EXEC_CHANNEL_STDOUT = 1
+_EXEC_CHANNEL_STDERR = 2
+_EXEC_CHANNEL_ERROR = 3
+
+
+class K8sApiError(Exception):
+    def __init__(self, status: int, msg: str) -> None:
+        super().__init__(f"HTTP {status}: {msg}")
+        self.status = status
+
+
+@dataclasses.dataclass(frozen=True, kw_only=True)
+class ExecResult:
+    out: str
+    err: str
+    returncode: int
+
+    @property
+    def success(self) -> bool:
+        return self.returncode == 0
+
+
+def _as_dict(v: Any) -> dict[str, Any]:
+    if not isinstance(v, dict):
+        raise ValueError(f"expected a dictionary but got {type(v)}")
+    return v
+
+
+@dataclasses.dataclass(frozen=True, kw_only=True)
+class ApiServerConfig:
+    server: str
+    ca_data: Optional[bytes] = None
+    insecure: bool = False
+    token: Optional[str] = None
+    client_cert_data: Optional[bytes] = None
+    client_key_data: Optional[bytes] = None
+
+    @staticmethod
+    def from_kubeconfig(kubeconfig: str) -> "ApiServerConfig":
+        # Only the subset of KUBECONFIG that our clusters use is supported
+        # (certificates, tokens). For anything else (like exec plugins),
+        # this raises a ValueError and the caller keeps using "oc".
+        with open(kubeconfig, "rb") as f:
+            kc = yaml.safe_load(f)
+        basedir = os.path.dirname(os.path.abspath(kubeconfig))
+
+        def _named(lst_key: str, name: Any) -> dict[str, Any]:
+            for item in kc.get(lst_key) or ():
+                if item.get("name") == name:
+                    return _as_dict(item.get(lst_key[:-1]))
+            raise ValueError(f"{lst_key} {repr(name)} not found in {kubeconfig}")
+
+        context = _named("contexts", kc.get("current-context"))
+        cluster = _named("clusters", context.get("cluster"))
+        user = _named("users", context.get("user"))
+
+        if "exec" in user or "auth-provider" in user:
+            raise ValueError(f"unsupported authentication method in {kubeconfig}")
+
+        def _data(d: dict[str, Any], key: str) -> Optional[bytes]:
+            v = d.get(f"{key}-data")
+            if v:
+                return base64.b64decode(v)
+            v = d.get(key)
+            if v:
+                with open(os.path.join(basedir, v), "rb") as f:
+                    return f.read()
+            return None
+
+        token = user.get("token")
+        if not token and user.get("tokenFile"):
+            with open(os.path.join(basedir, user["tokenFile"])) as token_file:
+                token = token_file.read().strip()
+
+        server = cluster.get("server")
+        if not isinstance(server, str) or not server:
+            raise ValueError(f"no server in {kubeconfig}")
+
+        return ApiServerConfig(
+            server=server,
+            ca_data=_data(cluster, "certificate-authority"),
+            insecure=bool(cluster.get("insecure-skip-tls-verify")),
+            token=token or None,
+            client_cert_data=_data(user, "client-certificate"),
+            client_key_data=_data(user, "client-key"),
+        )
+
+
+def resource_path(
+    resource: str,
+    *,
+    namespace: Optional[str],
+    name: Optional[str] = None,
+) -> str:
+    try:
+        prefix, plural = RESOURCES[resource]
+    except KeyError:
+        raise ValueError(f"unsupported resource {repr(resource)}") from None
+    path = f"/{prefix}"
+    if namespace is not None:
+        path += f"/namespaces/{urllib.parse.quote(namespace)}"
+    path += f"/{plural}"
+    if name is not None:
+        path += f"/{urllib.parse.quote(name)}"
+    return path
+
+
+def _connection_dropped(conn: http.client.HTTPConnection) -> bool:
+    # An idle keep-alive connection has nothing to read. If it is readable,
+    # the server closed it (or sent something unexpected). Either way, it
+    # cannot be used for the next request.
+    sock = conn.sock
+    if sock is None:
+        return True
+    try:
+        readable, _, _ = select.select([sock], [], [], 0)
+    except (OSError, ValueError):
+        return True
+    return bool(readable)
+
+
+def _response_error(
+    method: str,
+    path: str,
+    resp: http.client.HTTPResponse,
+    resp_data: bytes,
+) -> K8sApiError:
+    msg = resp.reason
+    try:
+        msg = json.loads(resp_data)["message"]
+    except Exception:
+        pass
+    return K8sApiError(resp.status, f"{method} {path}: {msg}")
+
+
+class K8sApiClient:
+    """A small client for the Kubernetes API.
+
+    Calling "oc" costs a process spawn, parsing the KUBECONFIG and a TLS
+    handshake each time. This keeps a pool of keep-alive connections to the
+    API server instead. It only supports what the tests need: get, list,
+    server-side apply, delete and exec (via the websocket "v4.channel.k8s.io"
+    protocol).
+
+    An exec upgrades its connection to a websocket, which cannot be reused
+    afterwards. So execs don't use the pool, but each opens a new
+    connection. To make that cheaper, they resume the TLS session of the
+    previous exec, which saves the certificate exchange and verification.
+    """
+
+    def __init__(
+        self,
+        config: ApiServerConfig,
+        *,
+        timeout: float = 60,
+        max_idle_connections: int = 8,
+    ) -> None:
+        url = urllib.parse.urlsplit(config.server)
+        if url.scheme not in ("https", "http") or not url.hostname:
+            raise ValueError(f"invalid API server {repr(config.server)}")
+
+        self.config = config
+        self.timeout = timeout
+        self._https = url.scheme == "https"
+        self._host = url.hostname
+        self._port = url.port or (443 if self._https else 80)
+        self._basepath = url.path.rstrip("/")
+        self._max_idle_connections = max_idle_connections
+        self._idle: list[http.client.HTTPConnection] = []
+        self._lock = threading.Lock()
+        self._ssl_context = self._create_ssl_context() if self._https else None
+        self._ssl_session: Optional[ssl.SSLSession] = None
+
+    @staticmethod
+    def from_kubeconfig(kubeconfig: str) -> "K8sApiClient":
+        return K8sApiClient(ApiServerConfig.from_kubeconfig(kubeconfig))
+
+    def _create_ssl_context(self) -> ssl.SSLContext:
+        config = self.config
+        if config.ca_data is not None:
+            ctx = ssl.create_default_context(cadata=config.ca_data.decode())
+        else:
+            ctx = ssl.create_default_context()
+        if config.insecure:
+            ctx.check_hostname = False
+            ctx.verify_mode = ssl.CERT_NONE
+        if config.client_cert_data is not None and config.client_key_data is not None:
+            # load_cert_chain() only accepts files. They are read right away,
+            # so the files don't need to stay around.
+            with tempfile.TemporaryDirectory(prefix="tft-k8s-api-") as tmpdir:
+                certfile = os.path.join(tmpdir, "client.crt")
+                keyfile = os.path.join(tmpdir, "client.key")
+                for filename, data in (
+                    (certfile, config.client_cert_data),
+                    (keyfile, config.client_key_data),
+                ):
+                    fd = os.open(filename, os.O_WRONLY | os.O_CREAT, 0o600)
+                    with os.fdopen(fd, "wb") as f:
+                        f.write(data)
+                ctx.load_cert_chain(certfile, keyfile)
+        return ctx
+
+    def _headers(self) -> dict[str, str]:
+        headers = {"Accept": "application/json"}
+        if self.config.token:
+            headers["Authorization"] = f"Bearer {self.config.token}"
+        return headers
+
+    def _connection_new(self, timeout: Optional[float]) -> http.client.HTTPConnection:
+        if self._https:
+            return http.client.HTTPSConnection(
+                self._host,
+                self._port,
+                timeout=timeout,
+                context=self._ssl_context,
+            )
+        return http.client.HTTPConnection(
+            self._host,
+            self._port,
+            timeout=timeout,
+        )
+
+    def _connection_acquire(self) -> tuple[http.client.HTTPConnection, bool]:
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                conn = self._idle.pop()
+            if not _connection_dropped(conn):
+                return conn, True
+            conn.close()
+        return self._connection_new(self.timeout), False
+
+    def _connection_release(self, conn: http.client.HTTPConnection) -> None:
+        with self._lock:
+            if len(self._idle) < self._max_idle_connections:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    def close(self) -> None:
+        with self._lock:
+            idle = self._idle
+            self._idle = []
+        for conn in idle:
+            conn.close()
+
+    def request(
+        self,
+        method: str,
+        path: str,
+        *,
+        query: Optional[list[tuple[str, str]]] = None,
+        body: Optional[Any] = None,
+        content_type: str = "application/json",
+    ) -> Any:
+        url = self._basepath + path
+        if query:
+            url += "?" + urllib.parse.urlencode(query)
+        headers = self._headers()
+        data: Optional[bytes] = None
+        if body is not None:
+            data = json.dumps(body).encode()
+            headers["Content-Type"] = content_type
+
+        # A request is only sent again with another connection, if the
+        # server closed the idle connection without getting it. That is, if
+        # sending it failed, or (for a GET) the server hung up without a
+        # response. Otherwise, a PATCH/DELETE might be done twice. After a
+        # timeout, the request may still be in progress, it is never retried.
+        while True:
+            conn, reused = self._connection_acquire()
+            try:
+                conn.request(method, url, body=data, headers=headers)
+            except (http.client.HTTPException, OSError) as e:
+                conn.close()
+                if reused and isinstance(e, (BrokenPipeError, ConnectionResetError)):
+                    continue
+                raise
+            try:
+                resp = conn.getresponse()
+                resp_data = resp.read()
+            except (http.client.HTTPException, OSError) as e:
+                conn.close()
+                if (
+                    reused
+                    and method == "GET"
+                    and isinstance(e, http.client.RemoteDisconnected)
+                ):
+                    continue
+                raise
+            break
+
+        if resp.will_close:
+            conn.close()
+        else:
+            self._connection_release(conn)
+
+        if resp.status >= 400:
+            raise _response_error(method, path, resp, resp_data)
+
+        if not resp_data:
+            return None
+        return json.loads(resp_data)
+
+    def get(
+        self,
+        resource: str,
+        name: str,
+        *,
+        namespace: Optional[str],
+    ) -> Optional[dict[str, Any]]:
+        try:
+            obj = self.request(
+                "GET",
+                resource_path(resource, namespace=namespace, name=name),
+            )
+        except K8sApiError as e:
+            if e.status == 404:
+                return None
+            raise
+        return _as_dict(obj)
+
+    def list_items(
+        self,
+        resource: str,
+        *,
+        namespace: Optional[str],
+        label_selector: Optional[str] = None,
+    ) -> list[dict[str, Any]]:
+        items, _ = self.list_items_with_version(
+            resource,
+            namespace=namespace,
+            label_selector=label_selector,
+        )
+        return items
+
+    def list_items_with_version(
+        self,
+        resource: str,
+        *,
+        namespace: Optional[str],
+        label_selector: Optional[str] = None,
+    ) -> tuple[list[dict[str, Any]], str]:
+        # Also returns the resourceVersion of the list, to start a watch().
+        query = []
+        if label_selector is not None:
+            query.append(("labelSelector", label_selector))
+        obj = self.request(
+            "GET",
+            resource_path(resource, namespace=namespace),
+            query=query,
+        )
+        resource_version = (obj.get("metadata") or {}).get("resourceVersion") or ""
+        return list(obj.get("items") or ()), resource_version
+
+    def watch(
+        self,
+        resource: str,
+        *,
+        namespace: Optional[str],
+        label_selector: Optional[str] = None,
+        resource_version: str = "",
+        timeout_seconds: int = 300,
+    ) -> Generator[dict[str, Any], None, None]:
+        # Yields the watch events ({"type": ..., "object": ...}) until the
+        # server ends the watch after "timeout_seconds". A watch holds on to
+        # its connection, so it does not use the pool.
+        query = [
+            ("watch", "1"),
+            ("allowWatchBookmarks", "true"),
+            ("timeoutSeconds", str(timeout_seconds)),
+        ]
+        if label_selector is not None:
+            query.append(("labelSelector", label_selector))
+        if resource_version:
+            query.append(("resourceVersion", resource_version))
+        path = resource_path(resource, namespace=namespace)
+        url = self._basepath + path + "?" + urllib.parse.urlencode(query)
+
+        conn = self._connection_new(timeout_seconds + 30)
+        try:
+            conn.request("GET", url, headers=self._headers())
+            resp = conn.getresponse()
+            if resp.status >= 400:
+                raise _response_error("GET", path, resp, resp.read())
+            while True:
+                line = resp.readline()
+                if not line:
+                    break
+                line = line.strip()
+                if line:
+                    yield _as_dict(json.loads(line))
+        finally:
+            conn.close()
+
+    def apply(
+        self,
+        obj: dict[str, Any],
+        *,
+        namespace: Optional[str] = None,
+    ) -> dict[str, Any]:
+        # Server-side apply. Unlike "oc apply", this needs no prior GET.
+        try:
+            plural = KINDS[obj["kind"]]
+        except KeyError:
+            raise ValueError(f"unsupported kind {repr(obj.get('kind'))}") from None
+        metadata = obj["metadata"]
+        namespace = metadata.get("namespace") or namespace
+        api_version = obj["apiVersion"]
+        if "/" in api_version:
+            path = f"/apis/{api_version}"
+        else:
+            path = f"/api/{api_version}"
+        if namespace is not None:
+            path += f"/namespaces/{urllib.parse.quote(namespace)}"
+        path += f"/{plural}/{urllib.parse.quote(metadata['name'])}"
+        result = self.request(
+            "PATCH",
+            path,
+            query=[("fieldManager", FIELD_MANAGER), ("force", "true")],
+            body=obj,
+            content_type="application/apply-patch+yaml",
+        )
+        return _as_dict(result)
+
+    def apply_all(
+        self,
+        objs: list[dict[str, Any]],
+        *,
+        namespace: Optional[str] = None,
+        max_parallel: int = 8,
+    ) -> list[dict[str, Any]]:
+        # There is no API to apply several objects with one request. Instead,
+        # send the requests concurrently over the pooled connections, which
+        # costs about one round trip. The results are in the order of "objs".
+        if len(objs) <= 1:
+            return [self.apply(obj, namespace=namespace) for obj in objs]
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=min(max_parallel, len(objs)),
+            thread_name_prefix="k8s-apply",
+        ) as executor:
+            return list(
+                executor.map(lambda obj: self.apply(obj, namespace=namespace), objs)
+            )
+
+    def delete(
+        self,
+        resource: str,
+        name: str,
+        *,
+        namespace: Optional[str],
+    ) -> bool:
+        try:
+            self.request(
+                "DELETE",
+                resource_path(resource, namespace=namespace, name=name),
+            )
+        except K8sApiError as e:
+            if e.status == 404:
+                return False
+            raise
+        return True
+
+    def delete_collection(
+        self,
+        resource: str,
+        *,
+        namespace: Optional[str],
+        label_selector: str,
+    ) -> None:
+        self.request(
+            "DELETE",
+            resource_path(resource, namespace=namespace),
+            query=[("labelSelector", label_selector)],
+        )
+
+    def _open_socket(self, timeout: Optional[float]) -> socket.socket:
+        sock = socket.create_connection((self._host, self._port), timeout=timeout)
+        if self._ssl_context is not None:
+            with self._lock:
+                session = self._ssl_session
+            try:
+                sock = self._ssl_context.wrap_socket(
+                    sock,
+                    server_hostname=self._host,
+                    session=session,
+                )
+            except BaseException:
+                sock.close()
+                raise
+        return sock
+
+    def _ssl_session_save(self, sock: socket.socket) -> None:
+        # With TLS 1.3, the server sends the session ticket only after the
+        # handshake. Save the session once the connection was used, so that
+        # it can be resumed.
+        if isinstance(sock, ssl.SSLSocket) and sock.session is not None:
+            with self._lock:
+                self._ssl_session = sock.session
+
+    def exec(
+        self,
+        pod_name: str,
+        command: list[str],
+        *,
+        namespace: Optional[str],
+        container: Optional[str] = None,
+        timeout: Optional[float] = None,
+        on_stdout: Optional[Callable[[bytes], None]] = None,
+    ) -> ExecResult:
+        # "on_stdout" gets called with the chunks of stdout as they arrive,
+        # while the command still runs.
+        query = [("command", c) for c in command]
+        query.extend([("stdout", "true"), ("stderr", "true")])
+        if container is not None:
+            query.append(("container", container))
+        path = resource_path("pod", namespace=namespace, name=pod_name) + "/exec"
+        url = self._basepath + path + "?" + urllib.parse.urlencode(query)
+
+        key = base64.b64encode(os.urandom(16)).decode()
+        headers = {
+            **self._headers(),
+            "Host": f"{self._host}:{self._port}",
+            "Upgrade": "websocket",
+            "Connection": "Upgrade",
+            "Sec-WebSocket-Key": key,
+            "Sec-WebSocket-Version": "13",
+            "Sec-WebSocket-Protocol": "v4.channel.k8s.io",
+        }
+        req = f"GET {url} HTTP/1.1\r\n"
+        req += "".join(f"{k}: {v}\r\n" for k, v in headers.items())
+        req += "\r\n"
+
+        with self._open_socket(timeout) as sock:
+            sock.sendall(req.encode())
+            with sock.makefile("rb") as f:
+                status_line = f.readline().decode("latin-1")
+                resp_headers: list[str] = []
+                while True:
+                    line = f.readline().decode("latin-1")
+                    if line in ("\r\n", "\n", ""):
+                        break
+                    resp_headers.append(line)
+                try:
+                    status = int(status_line.split(" ", 2)[1])
+                except Exception:
+                    raise K8sApiError(0, f"exec {pod_name}: invalid response") from None
+                if status != 101:
+                    raise K8sApiError(status, f"exec {pod_name}: {status_line.strip()}")
+                result = _exec_read_websocket(sock, f, on_stdout=on_stdout)
+            self._ssl_session_save(sock)
+            return result
+
+
+def _ws_send(sock: socket.socket, opcode: int, payload: bytes) -> None:
+    # Client frames must be masked.
+    mask = os.urandom(4)
+    n = len(payload)
+    if n < 126:
+        header = struct.pack("!BB", 0x80 | opcode, 0x80 | n)
+    elif n < 65536:
+        header = struct.pack("!BBH", 0x80 | opcode, 0x80 | 126, n)
+    else:
+        header = struct.pack("!BBQ", 0x80 | opcode, 0x80 | 127, n)
+    masked = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+    sock.sendall(header + mask + masked)
+
+
+def _ws_read_exact(f: Any, n: int) -> bytes:
+    data = f.read(n)
+    if len(data) != n:
+        raise EOFError("websocket closed unexpectedly")
+    return bytes(data)
+
+
+def _ws_read_frame(f: Any) -> tuple[bool, int, bytes]:
+    b0, b1 = _ws_read_exact(f, 2)
+    fin = bool(b0 & 0x80)
+    opcode = b0 & 0x0F
+    n = b1 & 0x7F
+    if n == 126:
+        (n,) = struct.unpack("!H", _ws_read_exact(f, 2))
+    elif n == 127:
+        (n,) = struct.unpack("!Q", _ws_read_exact(f, 8))
+    mask = _ws_read_exact(f, 4) if b1 & 0x80 else None
+    payload = _ws_read_exact(f, n)
+    if mask is not None:
+        payload = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+    return fin, opcode, payload
+
+
+def _exec_read_websocket(
+    sock: socket.socket,
+    f: Any,
+    *,
+    on_stdout: Optional[Callable[[bytes], None]] = None,
+) -> ExecResult:
+    out: list[bytes] = []
+    err: list[bytes] = []
+    error: Optional[bytes] = None
+    message = b""
+
+    while True:
+        try:
+            fin, opcode, payload = _ws_read_frame(f)
+        except (EOFError, OSError):
+            # The command is already running. Don't raise an exception, which
+            # might tempt the caller to run it again. Without a status, this
+            # gets reported as failure.
+            break
+
+        if opcode == _WS_OP_CLOSE:
+            try:
+                _ws_send(sock, _WS_OP_CLOSE, payload[:2])
+            except OSError:
+                pass
+            break
+        if opcode == _WS_OP_PING:
+            try:
+                _ws_send(sock, _WS_OP_PONG, payload)
+            except OSError:
+                break
+            continue
+        if opcode == _WS_OP_PONG:
+            continue
+        if opcode not in (_WS_OP_CONT, _WS_OP_TEXT, _WS_OP_BINARY):
+            continue
+
+        message += payload
+        if not fin:
+            continue
+        msg, message = message, b""
+        if not msg:
+            continue
+        channel, data = msg[0], msg[1:]
+        if channel == _EXEC_CHANNEL_STDOUT:
+            out.append(data)
+            if on_stdout is not None:
+                on_stdout(data)
+        elif channel == _EXEC_CHANNEL_STDERR:
+            err.append(data)
+        elif channel == _EXEC_CHANNEL_ERROR:
+            error = (error or b"") + data
+
+    returncode, error_msg = _exec_parse_status(error)
+    err_str = b"".join(err).decode(errors="replace")
+    if error_msg:
+        err_str += error_msg
+    return ExecResult(
+        out=b"".join(out).decode(errors="replace"),
+        err=err_str,
+        returncode=returncode,
+    )
+
+
+def _exec_parse_status(error: Optional[bytes]) -> tuple[int, str]:
+    # The error channel carries a v1.Status with the exit code.
+    if not error:
+        # Without status, the connection broke off.
+        return 255, "exec: no status received"
+    try:
+        status = json.loads(error)
+    except Exception:
+        return 255, error.decode(errors="replace")
+    if status.get("status") == "Success":
+        return 0, ""
+    if status.get("reason") == "NonZeroExitCode":
+        for cause in (status.get("details") or {}).get("causes") or ():
+            if cause.get("reason") == "ExitCode":
+                try:
+                    return int(cause["message"]), ""
+                except Exception:
+                    pass
+    return 255, str(status.get("message") or "")
@@ -0,0 +1,281 @@
+import json
+import re
+
+from collections.abc import Iterator
+from typing import Any
+from typing import Optional
+
+
+class _Lazy:
+    def __repr__(self) -> str:
+        return "LAZY"
+
+
+# In a spec for loads(), marks a value that is kept as JSON text until used.
+LAZY = _Lazy()
+
+_WS_RE = re.compile(r"[ \t\n\r]*")
+_OBJECT_START_RE = re.compile(r"\{[ \t\n\r]*(\}?)")
+_ARRAY_START_RE = re.compile(r"\[[ \t\n\r]*(\]?)")
+_KEY_RE = re.compile(r'"((?:[^"\\]|\\.)*)"[ \t\n\r]*:[ \t\n\r]*')
+_OBJECT_SEP_RE = re.compile(r"[ \t\n\r]*([,}])[ \t\n\r]*")
+_ARRAY_SEP_RE = re.compile(r"[ \t\n\r]*([,\]])[ \t\n\r]*")
+_CLOSE_AFTER_VALUE_RE = re.compile(r"[^\s{\[][ \t]*[}\]]")
+
+_scan_once = json.JSONDecoder().scan_once  # type: ignore[attr-defined]
+
+# The key of the placeholder entry of a LazyDict that is not loaded.
+_UNLOADED = object()
+
+
+class LazyDict(dict[str, Any]):
+    """A dict that is only decoded from its JSON text when first used.
+
+    Until then, it only references a span of the (shared) text of the
+    document. It is a real dict, so it can be used wherever one is expected.
+    All methods load it first.
+    """
+
+    __slots__ = ("_text", "_start", "_end")
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self._text: Optional[str] = None
+        self._start = 0
+        self._end = 0
+
+    @staticmethod
+    def from_span(text: str, start: int, end: int) -> "LazyDict":
+        d = LazyDict()
+        d._text = text
+        d._start = start
+        d._end = end
+        # Some C code checks the size of the dict directly. For example,
+        # json.dumps() writes an empty dict as "{}" without calling any
+        # methods. Don't look empty while not loaded.
+        super(LazyDict, d).__setitem__(_UNLOADED, None)  # type: ignore[index]
+        return d
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._text is None
+
+    def _load(self) -> None:
+        text = self._text
+        if text is None:
+            return
+        data = json.loads(text[self._start : self._end])
+        if not isinstance(data, dict):
+            raise ValueError(f"expected a JSON object at offset {self._start}")
+        super().clear()
+        super().update(data)
+        self._text = None
+
+    def __getitem__(self, key: str) -> Any:
+        self._load()
+        return super().__getitem__(key)
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        self._load()
+        super().__setitem__(key, value)
+
+    def __delitem__(self, key: str) -> None:
+        self._load()
+        super().__delitem__(key)
+
+    def __contains__(self, key: object) -> bool:
+        self._load()
+        return super().__contains__(key)
+
+    def __iter__(self) -> Iterator[str]:
+        self._load()
+        return super().__iter__()
+
+    def __reversed__(self) -> Iterator[str]:
+        self._load()
+        return super().__reversed__()
+
+    def __len__(self) -> int:
+        self._load()
+        return super().__len__()
+
+    def __eq__(self, other: object) -> bool:
+        self._load()
+        if isinstance(other, LazyDict):
+            other._load()
+        return super().__eq__(other)
+
+    def __ne__(self, other: object) -> bool:
+        return not self == other
+
+    def __repr__(self) -> str:
+        self._load()
+        return super().__repr__()
+
+    def __or__(self, other: Any) -> Any:
+        return dict(self.items()) | other
+
+    def __ror__(self, other: Any) -> Any:
+        return other | dict(self.items())
+
+    def __ior__(self, other: Any) -> "LazyDict":  # type: ignore[override]
+        self._load()
+        super().update(other)
+        return self
+
+    def __reduce__(self) -> tuple[Any, ...]:
+        # Copies and pickles are plain dicts.
+        return (dict, (dict(self.items()),))
+
+    def get(self, key: str, default: Any = None) -> Any:
+        self._load()
+        return super().get(key, default)
+
+    def keys(self) -> Any:
+        self._load()
+        return super().keys()
+
+    def values(self) -> Any:
+        self._load()
+        return super().values()
+
+    def items(self) -> Any:
+        self._load()
+        return super().items()
+
+    def copy(self) -> dict[str, Any]:
+        return dict(self.items())
+
+    def pop(self, key: str, *args: Any) -> Any:
+        self._load()
+        return super().pop(key, *args)
+
+    def popitem(self) -> tuple[str, Any]:
+        self._load()
+        return super().popitem()
+
+    def setdefault(self, key: str, default: Any = None) -> Any:
+        self._load()
+        return super().setdefault(key, default)
+
+    def update(self, *args: Any, **kwargs: Any) -> None:
+        self._load()
+        super().update(*args, **kwargs)
+
+    def clear(self) -> None:
+        super().clear()
+        self._text = None
+
+
+class _Loader:
+    def __init__(self, text: str) -> None:
+        self.text = text
+
+    def _ws(self, idx: int) -> int:
+        m = _WS_RE.match(self.text, idx)
+        assert m is not None
+        return m.end()
+
+    def _match(self, regex: re.Pattern[str], idx: int) -> re.Match[str]:
+        m = regex.match(self.text, idx)
+        if m is None:
+            raise ValueError(f"invalid JSON at offset {idx}")
+        return m
+
+    def _scan(self, idx: int) -> tuple[Any, int]:
+        try:
+            value, end = _scan_once(self.text, idx)
+        except StopIteration:
+            raise ValueError(f"expected a JSON value at offset {idx}")
+        return value, end
+
+    def _skip_object(self, idx: int) -> int:
+        # Find the end of the object at "idx", without decoding it. Files
+        # written with indentation (like common.json_dump() does) have the
+        # closing brace on its own line, indented like the line with the
+        # opening one, and all lines in between indented deeper. JSON strings
+        # cannot contain newlines, so the first line that is not indented
+        # deeper is the end. Check that the layout holds for the span: also
+        # no closing bracket may follow a value on the same line and the
+        # brackets must balance. Otherwise (a compact or hand-edited file, or
+        # brackets in strings), decode the object to find the end.
+        text = self.text
+        if text.startswith("{}", idx):
+            return idx + 2
+        if text.startswith("{\n", idx):
+            line_start = text.rfind("\n", 0, idx) + 1
+            line = text[line_start:idx]
+            n = len(line) - len(line.lstrip(" "))
+            m = re.compile(f"\n {{0,{n}}}(?! )").search(text, idx)
+            if m is not None and m.end() - m.start() == n + 1:
+                end = m.end() + 1
+                if (
+                    text.startswith("}", m.end())
+                    and _CLOSE_AFTER_VALUE_RE.search(text, idx, end) is None
+                    and text.count("{", idx, end) == text.count("}", idx, end)
+                    and text.count("[", idx, end) == text.count("]", idx, end)
+                ):
+                    return end
+        return self._scan(idx)[1]
+
+    def load(self, idx: int, spec: Any) -> tuple[Any, int]:
+        if spec is LAZY:
+            if self.text.startswith("{", idx):
+                end = self._skip_object(idx)
+                return LazyDict.from_span(self.text, idx, end), end
+        elif isinstance(spec, dict) and self.text.startswith("{", idx):
+            return self._load_object(idx, spec)
+        elif isinstance(spec, list) and self.text.startswith("[", idx):
+            return self._load_array(idx, spec[0])
+        return self._scan(idx)
+
+    def _load_object(self, idx: int, spec: dict[str, Any]) -> tuple[Any, int]:
+        result: dict[str, Any] = {}
+        m = self._match(_OBJECT_START_RE, idx)
+        if m.group(1):
+            return result, m.end()
+        idx = m.end()
+        while True:
+            m = self._match(_KEY_RE, idx)
+            key = m.group(1)
+            if "\\" in key:
+                key = json.loads(f'"{key}"')
+            sub_spec = spec.get(key)
+            if sub_spec is None:
+                result[key], idx = self._scan(m.end())
+            else:
+                result[key], idx = self.load(m.end(), sub_spec)
+            m = self._match(_OBJECT_SEP_RE, idx)
+            if m.group(1) == "}":
+                return result, m.end()
+            idx = m.end()
+
+    def _load_array(self, idx: int, spec: Any) -> tuple[Any, int]:
+        result: list[Any] = []
+        m = self._match(_ARRAY_START_RE, idx)
+        if m.group(1):
+            return result, m.end()
+        idx = m.end()
+        while True:
+            value, idx = self.load(idx, spec)
+            result.append(value)
+            m = self._match(_ARRAY_SEP_RE, idx)
+            if m.group(1) == "]":
+                return result, m.end()
+            idx = m.end()
+
+
+def loads(text: str, spec: Any) -> Any:
+    """Decode the JSON document "text", but keep some objects undecoded.
+
+    "spec" describes the shape of the document. A dict spec walks the keys
+    of an object that are in the spec (other keys are decoded as usual), a
+    one-element list spec walks each element of an array and LAZY keeps an
+    object as LazyDict. Raises ValueError for invalid JSON. Note that the
+    lazy parts are only checked for validity when they are used.
+    """
+    loader = _Loader(text)
+    value, idx = loader.load(loader._ws(0), spec)
+    if loader._ws(idx) != len(text):
+        raise ValueError(f"extra data at offset {idx}")
+    return value
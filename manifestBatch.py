@@ -0,0 +1,135 @@
+import itertools
+import json
+import threading
+import yaml
+
+from typing import Any
+from typing import Optional
+
+from ktoolbox import common
+
+import testConfig
+import tftbase
+
+from k8sApiClient import K8sApiError
+from manifestRender import RenderedManifest
+
+
+logger = common.ExtendedLogger("tft." + __name__)
+
+
+_batch_counter = itertools.count()
+
+
+def _object_key(obj: dict[str, Any]) -> tuple[str, str]:
+    return str(obj.get("kind")), str((obj.get("metadata") or {}).get("name"))
+
+
+class ManifestBatch:
+    """The rendered manifests of a test case, applied together.
+
+    The tasks add their rendered manifests (pods, services, multi network
+    policies) during prepare_manifests(). apply() then creates all of them
+    in one go, and the tasks read back what they need (like the cluster IP
+    of a service) via get_applied().
+
+    With the API client, the objects are sent as concurrent server-side
+    apply requests. Otherwise, all manifests are concatenated into one
+    file, for one "oc apply -f" and one "oc get -f".
+
+    Several tasks may add the same manifest (like the tools pod of a node,
+    that all plugins share). It is only applied once, and get_applied()
+    returns the object for each of them.
+    """
+
+    def __init__(self, tc: testConfig.TestConfig) -> None:
+        self.tc = tc
+        self._lock = threading.Lock()
+        self._docs: dict[tuple[bool, str], list[dict[str, Any]]] = {}
+        self._applied: dict[tuple[bool, str, str], dict[str, Any]] = {}
+        self._file_keys: dict[str, list[tuple[str, str]]] = {}
+        self._file_tenant: dict[str, bool] = {}
+        self._file_rendered: dict[str, str] = {}
+
+    def add(
+        self,
+        manifest: RenderedManifest,
+        *,
+        tenant: bool,
+        namespace: str,
+    ) -> None:
+        with self._lock:
+            if (
+                self._file_rendered.get(manifest.out_file_yaml) == manifest.rendered
+                and self._file_tenant[manifest.out_file_yaml] == tenant
+            ):
+                return
+            self._file_rendered[manifest.out_file_yaml] = manifest.rendered
+            self._docs.setdefault((tenant, namespace), []).extend(manifest.docs)
+            self._file_keys[manifest.out_file_yaml] = [
+                _object_key(d) for d in manifest.docs
+            ]
+            self._file_tenant[manifest.out_file_yaml] = tenant
+
+    def _apply_api(
+        self,
+        tenant: bool,
+        namespace: str,
+        docs: list[dict[str, Any]],
+    ) -> Optional[list[dict[str, Any]]]:
+        api_client = self.tc.api_client(tenant=tenant)
+        if api_client is None:
+            return None
+        try:
+            return api_client.apply_all(docs, namespace=namespace)
+        except (K8sApiError, OSError, ValueError) as e:
+            logger.warning(f"apply {len(docs)} objects via API failed: {e}")
+            return None
+
+    def _apply_oc(
+        self,
+        tenant: bool,
+        namespace: str,
+        docs: list[dict[str, Any]],
+    ) -> list[dict[str, Any]]:
+        out_file_yaml = tftbase.get_manifest_renderpath(
+            f"manifest-batch-{next(_batch_counter)}.yaml"
+        )
+        with open(out_file_yaml, "w") as f:
+            yaml.safe_dump_all(docs, f)
+        client = self.tc.client(tenant=tenant)
+        client.oc(f"apply -f {out_file_yaml}", namespace=namespace, die_on_error=True)
+        r = client.oc(
+            f"get -f {out_file_yaml} -o json",
+            namespace=namespace,
+            die_on_error=True,
+        )
+        obj = json.loads(r.out)
+        if obj.get("kind") == "List":
+            return list(obj.get("items") or ())
+        return [obj]
+
+    def apply(self) -> None:
+        with self._lock:
+            all_docs = self._docs
+            self._docs = {}
+        for (tenant, namespace), docs in all_docs.items():
+            logger.info(f"Applying {len(docs)} objects in namespace {namespace}")
+            objs = self._apply_api(tenant, namespace, docs)
+            if objs is None:
+                objs = self._apply_oc(tenant, namespace, docs)
+            with self._lock:
+                for obj in objs:
+                    kind, name = _object_key(obj)
+                    self._applied[(tenant, kind, name)] = obj
+
+    def get_applied(self, manifest: RenderedManifest) -> Optional[dict[str, Any]]:
+        # The applied object (as returned by the API server) of the last
+        # document in "manifest", or None if it was not applied.
+        with self._lock:
+            keys = self._file_keys.get(manifest.out_file_yaml)
+            if not keys:
+                return None
+            kind, name = keys[-1]
+            tenant = self._file_tenant[manifest.out_file_yaml]
+            return self._applied.get((tenant, kind, name))
@@ -0,0 +1,95 @@
+import dataclasses
+import jinja2
+import os
+import threading
+import yaml
+
+from typing import Any
+from typing import Optional
+
+from ktoolbox import common
+
+import tftbase
+
+
+logger = common.ExtendedLogger("tft." + __name__)
+
+
+class TemplateCache:
+    """Compiled Jinja2 templates, keyed by path and modification time.
+
+    The same few templates get rendered for every pod and service of every
+    instance. Only load and compile them once. The path is the one from
+    tftbase.get_manifest(), so files from the overrides directory are cached
+    separately. Editing a template file invalidates its entry.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._env = jinja2.Environment(keep_trailing_newline=True)
+        self._templates: dict[str, tuple[tuple[int, int], jinja2.Template]] = {}
+
+    def get(self, path: str) -> jinja2.Template:
+        st = os.stat(path)
+        key = (st.st_mtime_ns, st.st_size)
+        with self._lock:
+            entry = self._templates.get(path)
+            if entry is not None and entry[0] == key:
+                return entry[1]
+        with open(path) as f:
+            contents = f.read()
+        template = self._env.from_string(contents)
+        with self._lock:
+            self._templates[path] = (key, template)
+        return template
+
+    def clear(self) -> None:
+        with self._lock:
+            self._templates.clear()
+
+
+template_cache = TemplateCache()
+
+
+@dataclasses.dataclass(frozen=True, kw_only=True)
+class RenderedManifest:
+    out_file_yaml: str
+    rendered: str
+    docs: tuple[dict[str, Any], ...]
+
+    @property
+    def obj(self) -> Optional[dict[str, Any]]:
+        return self.docs[-1] if self.docs else None
+
+    def dump(self) -> str:
+        # Only "oc" needs the file. Otherwise, it's only written for debugging
+        # with TFT_MANIFESTS_DUMP.
+        with open(self.out_file_yaml, "w") as f:
+            f.write(self.rendered)
+        return self.out_file_yaml
+
+
+def render(
+    in_file_template: str,
+    template_args: dict[str, Any],
+    *,
+    out_file_yaml: str,
+) -> RenderedManifest:
+    rendered = template_cache.get(in_file_template).render(**template_args)
+
+    try:
+        docs = tuple(d for d in yaml.safe_load_all(rendered) if d)
+    except Exception as e:
+        logger.error(
+            f'"{in_file_template}" rendered as {repr(rendered)} is not valid YAML: {e}'
+        )
+        raise
+
+    manifest = RenderedManifest(
+        out_file_yaml=out_file_yaml,
+        rendered=rendered,
+        docs=docs,
+    )
+    if tftbase.get_tft_manifests_dump():
+        manifest.dump()
+    return manifest
@@ -1,6 +1,7 @@
-import jc
-import typing
+import math
 
+from collections.abc import Sequence
+from dataclasses import dataclass
 from typing import Any
 from typing import Optional
 
@@ -41,6 +42,188 @@ class PluginMeasureCpu(pluginbase.Plugin):
 plugin = pluginbase.register_plugin(PluginMeasureCpu())
 
 
+# The fields of the "cpu" lines in /proc/stat, in USER_HZ. "guest" and
+# "guest_nice" are already included in "user" and "nice".
+PROC_STAT_FIELDS = (
+    "user",
+    "nice",
+    "system",
+    "idle",
+    "iowait",
+    "irq",
+    "softirq",
+    "steal",
+)
+
+# The summary of all CPUs uses the same keys as "jc --mpstat" did.
+MPSTAT_KEYS = {
+    "user": "percent_usr",
+    "nice": "percent_nice",
+    "system": "percent_sys",
+    "iowait": "percent_iowait",
+    "irq": "percent_irq",
+    "softirq": "percent_soft",
+    "steal": "percent_steal",
+    "idle": "percent_idle",
+}
+
+HOTTEST_CORES = 4
+
+# A core is saturated by softirq if, during a sample interval, it was
+# almost never idle and spent a large part of the time in softirq. That is
+# typically a core that serves a NIC queue, and it caps the throughput.
+SATURATED_BUSY_PERCENT = 95.0
+SATURATED_SOFTIRQ_PERCENT = 50.0
+
+
+@dataclass(frozen=True, kw_only=True)
+class CpuSample:
+    timestamp: float
+    # The counters from /proc/stat by CPU ("cpu" is the sum of all).
+    stat: dict[str, tuple[int, ...]]
+    # The NET_RX counts from /proc/softirqs by CPU.
+    net_rx: dict[str, int]
+
+
+def proc_stat_cmd(interval: float, count: int) -> str:
+    # Take "count + 1" snapshots of /proc/stat (and the NET_RX line of
+    # /proc/softirqs), "interval" seconds apart, in one command.
+    return (
+        f"for i in $(seq 0 {count}) ; do "
+        'echo "@ $(date +%s.%N)" ; '
+        "grep '^cpu' /proc/stat ; "
+        "grep -E '^ *(CPU0|NET_RX:)' /proc/softirqs ; "
+        f'if [ "$i" -lt {count} ] ; then sleep {interval} ; fi ; '
+        "done"
+    )
+
+
+def proc_stat_parse(out: str) -> list[CpuSample]:
+    samples: list[CpuSample] = []
+    timestamp: Optional[float] = None
+    stat: dict[str, tuple[int, ...]] = {}
+    net_rx: dict[str, int] = {}
+    softirq_cpus: list[str] = []
+
+    def _add() -> None:
+        if timestamp is not None:
+            samples.append(CpuSample(timestamp=timestamp, stat=stat, net_rx=net_rx))
+
+    for line in out.splitlines():
+        words = line.split()
+        if not words:
+            continue
+        if words[0] == "@":
+            _add()
+            timestamp = float(words[1])
+            stat = {}
+            net_rx = {}
+        elif timestamp is None:
+            raise ValueError(f"unexpected line {repr(line)}")
+        elif words[0].startswith("cpu"):
+            stat[words[0]] = tuple(int(w) for w in words[1 : 1 + len(PROC_STAT_FIELDS)])
+        elif words[0] == "CPU0":
+            softirq_cpus = [w.lower() for w in words]
+        elif words[0] == "NET_RX:":
+            net_rx = {c: int(w) for c, w in zip(softirq_cpus, words[1:])}
+        else:
+            raise ValueError(f"unexpected line {repr(line)}")
+    _add()
+    return samples
+
+
+def _percentages(
+    stat0: Sequence[int],
+    stat1: Sequence[int],
+) -> Optional[dict[str, float]]:
+    delta = [max(0, b - a) for a, b in zip(stat0, stat1)]
+    total = sum(delta)
+    if total <= 0:
+        return None
+    return {k: 100.0 * v / total for k, v in zip(PROC_STAT_FIELDS, delta)}
+
+
+def cpu_time_series(samples: Sequence[CpuSample]) -> dict[str, Any]:
+    """Evaluate the samples of proc_stat_parse().
+
+    Returns the average over all samples for all CPUs (with the keys of
+    mpstat), the per core time series of user/sys/softirq/idle percent
+    for each sample interval, and the hottest cores.
+    """
+    if len(samples) < 2:
+        raise ValueError("need at least two samples")
+
+    first = samples[0]
+    last = samples[-1]
+
+    avg = _percentages(first.stat["cpu"], last.stat["cpu"])
+    if avg is None:
+        raise ValueError("no CPU time elapsed")
+    result: dict[str, Any] = {"cpu": "all"}
+    for k, key in MPSTAT_KEYS.items():
+        result[key] = round(avg[k], 2)
+
+    cpus = [c for c in first.stat if c != "cpu" and c in last.stat]
+
+    cores: dict[str, dict[str, list[float]]] = {}
+    hottest: list[dict[str, Any]] = []
+    saturated: list[str] = []
+    for cpu in cpus:
+        series: dict[str, list[float]] = {
+            "user": [],
+            "sys": [],
+            "softirq": [],
+            "idle": [],
+        }
+        is_saturated = False
+        for s0, s1 in zip(samples, samples[1:]):
+            p = _percentages(s0.stat.get(cpu, ()), s1.stat.get(cpu, ()))
+            if p is None:
+                continue
+            # Time in hard interrupts counts as "sys", waiting for IO as
+            # "idle".
+            busy = 100.0 - p["idle"] - p["iowait"]
+            series["user"].append(round(p["user"] + p["nice"], 1))
+            series["sys"].append(round(p["system"] + p["irq"], 1))
+            series["softirq"].append(round(p["softirq"], 1))
+            series["idle"].append(round(p["idle"] + p["iowait"], 1))
+            if (
+                busy >= SATURATED_BUSY_PERCENT
+                and p["softirq"] >= SATURATED_SOFTIRQ_PERCENT
+            ):
+                is_saturated = True
+        cores[cpu] = series
+        if is_saturated:
+            saturated.append(cpu)
+
+        p = _percentages(first.stat[cpu], last.stat[cpu])
+        if p is None or not series["idle"]:
+            continue
+        hottest.append(
+            {
+                "cpu": cpu,
+                "busy_avg": round(100.0 - p["idle"] - p["iowait"], 1),
+                "busy_max": round(100.0 - min(series["idle"]), 1),
+                "softirq_avg": round(p["softirq"], 1),
+                "softirq_max": max(series["softirq"]),
+                "net_rx": last.net_rx.get(cpu, 0) - first.net_rx.get(cpu, 0),
+            }
+        )
+
+    hottest.sort(key=lambda h: (-h["busy_avg"], -h["softirq_avg"]))
+
+    result["interval"] = round(
+        (last.timestamp - first.timestamp) / (len(samples) - 1), 3
+    )
+    result["timestamps"] = [
+        round(s.timestamp - first.timestamp, 3) for s in samples[1:]
+    ]
+    result["cores"] = cores
+    result["hottest"] = hottest[:HOTTEST_CORES]
+    result["softirq_saturated"] = saturated
+    return result
+
+
 class TaskMeasureCPU(PluginTask):
     @property
     def plugin(self) -> pluginbase.Plugin:
@@ -54,8 +237,7 @@ class TaskMeasureCPU(PluginTask):
             tenant=tenant,
         )
 
-        self.pod_name = f"tools-pod-{self.node_name_sanitized}-measure-cpu"
-        self.in_file_template = tftbase.get_manifest("tools-pod.yaml.j2")
+        self.use_tools_pod()
 
     def initialize(self) -> None:
         super().initialize()
@@ -66,7 +248,9 @@ class TaskMeasureCPU(PluginTask):
 
             self.ts.clmo_barrier.wait()
 
-            cmd = f"mpstat -P ALL {self.get_duration()} 1"
+            interval = tftbase.get_tft_cpu_sample_interval()
+            count = max(1, math.ceil(self.get_duration() / interval))
+            cmd = proc_stat_cmd(interval, count)
             r = self.run_oc_exec(cmd)
 
             success = True
@@ -79,22 +263,10 @@ class TaskMeasureCPU(PluginTask):
 
             if success:
                 try:
-                    lst = typing.cast(list[dict[str, Any]], jc.parse("mpstat", r.out))
-                    rdict = lst[0]
-                except Exception:
-                    success = False
-                    msg = f'Output of "{cmd}" cannot be parsed: {r.debug_msg()}'
-
-            if success:
-                if (
-                    isinstance(rdict, dict)
-                    and all(isinstance(k, str) for k in rdict)
-                    and all(required_key in rdict for required_key in ("percent_idle",))
-                ):
-                    result = rdict
-                else:
+                    result = cpu_time_series(proc_stat_parse(r.out))
+                except (ValueError, KeyError) as e:
                     success = False
-                    msg = 'Output of "{cmd}" contains unexpected data: {r.debug_msg()}'
+                    msg = f'Output of "{cmd}" cannot be parsed ({e}): {r.debug_msg()}'
 
             result["cmd"] = common.dataclass_to_dict(r)
 
@@ -117,4 +289,15 @@ class TaskMeasureCPU(PluginTask):
     ) -> None:
         assert isinstance(result, PluginOutput)
         p_idle = result.result["percent_idle"]
-        logger.info(f"Idle on {self.node_name} = {p_idle}%")
+        logger.info(
+            f"Idle on {self.node_name} = {p_idle}%"
+            + "".join(
+                f"\n  {h['cpu']}: busy {h['busy_avg']}% (max {h['busy_max']}%), softirq {h['softirq_avg']}% (max {h['softirq_max']}%), {h['net_rx']} NET_RX"
+                for h in result.result.get("hottest", ())
+            )
+        )
+        saturated = result.result.get("softirq_saturated")
+        if saturated:
+            logger.warning(
+                f"Cores saturated by softirq on {self.node_name}: {', '.join(saturated)}"
+            )
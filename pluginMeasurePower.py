@@ -1,6 +1,7 @@
+import dataclasses
 import re
-import time
 
+from collections.abc import Sequence
 from typing import Any
 from typing import Optional
 
@@ -41,14 +42,124 @@ class PluginMeasurePower(pluginbase.Plugin):
 plugin = pluginbase.register_plugin(PluginMeasurePower())
 
 
+POWER_SAMPLE_INTERVAL = 0.2
+
+_POWER_READING_RE = re.compile(r"^ *Instantaneous power reading: +(\d+) +Watts *$")
+
+
 def _extract(ipmitool_output: str) -> Optional[int]:
     for e in ipmitool_output.split("\n"):
-        match = re.search(r"^ *Instantaneous power reading: +(\d+) +Watts *$", e)
+        match = _POWER_READING_RE.search(e)
         if match:
             return int(match.group(1))
     return None
 
 
+def power_sampler_cmd(stop_file: str, max_duration: int) -> str:
+    # Read the power every POWER_SAMPLE_INTERVAL seconds and print it with
+    # its timestamp. The first and last lines mark the window.
+    sampler = task.sampler_loop_cmd(
+        "r=\"$(ipmitool dcmi power reading 2>&1 | grep 'Instantaneous power reading')\" ; "
+        'echo "$(date +%s.%N) $r"',
+        interval=POWER_SAMPLE_INTERVAL,
+        stop_file=stop_file,
+        max_duration=max_duration,
+    )
+    return f'echo "start $(date +%s.%N)" ; {sampler} ; echo "stop $(date +%s.%N)"'
+
+
+@dataclasses.dataclass(frozen=True, kw_only=True)
+class PowerSamples:
+    start: float
+    stop: float
+    # The timestamp and Watts of each reading.
+    readings: tuple[tuple[float, int], ...]
+    # The lines for which ipmitool printed no reading.
+    failed: tuple[str, ...]
+
+
+def power_sampler_parse(out: str) -> PowerSamples:
+    start: Optional[float] = None
+    stop: Optional[float] = None
+    readings: list[tuple[float, int]] = []
+    failed: list[str] = []
+    for line in out.splitlines():
+        words = line.split(maxsplit=1)
+        if not words:
+            continue
+        if words[0] == "start":
+            start = float(words[1])
+        elif words[0] == "stop":
+            stop = float(words[1])
+        else:
+            pwr = _extract(words[1]) if len(words) > 1 else None
+            if pwr is None:
+                failed.append(line)
+            else:
+                readings.append((float(words[0]), pwr))
+    if start is None or stop is None:
+        raise ValueError("sampler did not report its start and stop")
+    return PowerSamples(
+        start=start,
+        stop=stop,
+        readings=tuple(readings),
+        failed=tuple(failed),
+    )
+
+
+def power_stats(
+    readings: Sequence[tuple[float, int]],
+    start: float,
+    stop: float,
+) -> dict[str, Any]:
+    """Evaluate the power readings over the window from start to stop.
+
+    A reading holds until the next one. Before the first reading in the
+    window, the last reading before it (or else the first one) applies.
+    """
+    if not readings:
+        raise ValueError("no power readings")
+    if stop <= start:
+        raise ValueError("empty window")
+
+    idx = 0
+    value = readings[0][1]
+    while idx < len(readings) and readings[idx][0] <= start:
+        value = readings[idx][1]
+        idx += 1
+
+    t = start
+    energy = 0.0
+    peak = value
+    n_samples = 0
+    for ts, pwr in readings[idx:]:
+        if ts >= stop:
+            break
+        energy += value * (ts - t)
+        t = ts
+        value = pwr
+        peak = max(peak, pwr)
+        n_samples += 1
+    energy += value * (stop - t)
+
+    window = stop - start
+    return {
+        "window": window,
+        "samples": n_samples,
+        "average_watts": energy / window,
+        "peak_watts": peak,
+        "energy_joules": energy,
+    }
+
+
+def energy_per_gb(average_watts: float, bitrate: tftbase.Bitrate) -> Optional[float]:
+    # Joules per transferred GB, with the bitrate of the flow test.
+    gbps = bitrate.rx if bitrate.rx is not None else bitrate.tx
+    if not gbps:
+        return None
+    return average_watts / (gbps / 8.0)
+
+
 class TaskMeasurePower(PluginTask):
     @property
     def plugin(self) -> pluginbase.Plugin:
@@ -62,8 +173,7 @@ class TaskMeasurePower(PluginTask):
             tenant=tenant,
         )
 
-        self.pod_name = f"tools-pod-{self.node_name_sanitized}-measure-cpu"
-        self.in_file_template = tftbase.get_manifest("tools-pod.yaml.j2")
+        self.use_tools_pod()
 
     def initialize(self) -> None:
         super().initialize()
@@ -71,37 +181,33 @@ class TaskMeasurePower(PluginTask):
 
     def _create_task_operation(self) -> TaskOperation:
         def _thread_action() -> BaseOutput:
-            cmd = "ipmitool dcmi power reading"
             self.ts.clmo_barrier.wait()
 
-            success_result = True
+            # The sampler starts after the client-monitor barrier and stops
+            # after the client finished. Both are delayed by starting an
+            # exec, so the window matches the traffic.
+            cmd, r = self.run_sampler(power_sampler_cmd)
+
+            success = True
             msg: Optional[str] = None
-            total_pwr = 0
-            iteration = 0
             result: dict[str, Any] = {}
-            while not self.ts.event_client_finished.is_set():
-                r = self.run_oc_exec(cmd)
-                if not r.success:
-                    if success_result:
-                        success_result = False
-                        result["failed_cmd"] = common.dataclass_to_dict(r)
-                        msg = "Failed running ipmitool command"
-                else:
-                    pwr = _extract(r.out)
-                    if pwr is None:
-                        if success_result:
-                            success_result = False
-                            result["failed_cmd"] = common.dataclass_to_dict(r)
-                            msg = "Failed to parse ipmitool output"
-                    else:
-                        total_pwr += pwr
-                iteration += 1
-                time.sleep(0.2)
-
-            result["measure_power"] = f"{total_pwr/iteration}"
+
+            try:
+                samples = power_sampler_parse(r.out)
+                result = power_stats(samples.readings, samples.start, samples.stop)
+            except ValueError as e:
+                success = False
+                msg = f"Failed to measure power ({e})"
+                result["failed_cmd"] = common.dataclass_to_dict(r)
+            else:
+                if samples.failed:
+                    success = False
+                    msg = "Failed to parse ipmitool output"
+                    result["failed_lines"] = list(samples.failed[:10])
+                result["measure_power"] = f"{result['average_watts']}"
 
             return PluginOutput(
-                success=success_result,
+                success=success,
                 msg=msg,
                 plugin_metadata=self.get_plugin_metadata(),
                 command=cmd,
@@ -113,9 +219,35 @@ class TaskMeasurePower(PluginTask):
             thread_action=_thread_action,
         )
 
+    def aggregate_output(self, tft_result_builder: tftbase.TftResultBuilder) -> None:
+        # The energy per GB needs the bitrate of the flow test, which is
+        # aggregated before the plugins.
+        flow_test = tft_result_builder.flow_test
+        result = self._result
+        if (
+            isinstance(result, PluginOutput)
+            and result.success
+            and flow_test is not None
+        ):
+            joules = energy_per_gb(
+                result.result["average_watts"],
+                flow_test.bitrate_gbps,
+            )
+            if joules is not None:
+                self._result = dataclasses.replace(
+                    result,
+                    result={**result.result, "energy_per_gb": joules},
+                )
+        super().aggregate_output(tft_result_builder)
+
     def _aggregate_output_log_success(
         self,
         result: tftbase.AggregatableOutput,
     ) -> None:
         assert isinstance(result, PluginOutput)
-        logger.info(f"measurePower results: {result.result['measure_power']}")
+        r = result.result
+        joules = r.get("energy_per_gb")
+        logger.info(
+            f"measurePower results on {self.node_name}: average {r['average_watts']:.1f} W, peak {r['peak_watts']} W, {r['energy_joules']:.1f} J over {r['window']:.1f} sec ({r['samples']} samples)"
+            + (f", {joules:.1f} J/GB" if joules is not None else "")
+        )
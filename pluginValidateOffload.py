@@ -1,5 +1,9 @@
+import functools
+import shlex
 import typing
 
+from collections.abc import Sequence
+from typing import Any
 from typing import Optional
 
 from ktoolbox import common
@@ -22,6 +26,12 @@ logger = common.ExtendedLogger("tft." + __name__)
 
 VF_REP_TRAFFIC_THRESHOLD = 1000
 
+VF_REP_SAMPLE_INTERVAL = 0.5
+
+# An interval in which the VF representor sees at least that many packets
+# per second is reported as slow path traffic.
+VF_REP_SLOW_PATH_PPS = 100.0
+
 
 def ethtool_stat_parse(output: str) -> dict[str, str]:
     result = {}
@@ -116,6 +126,78 @@ def check_no_traffic_on_vf_rep(
     return None
 
 
+def vf_rep_sampler_cmd(vf_rep: str, stop_file: str, max_duration: int) -> str:
+    # Read the packet counters of the VF representor from sysfs every
+    # VF_REP_SAMPLE_INTERVAL seconds and print them with their timestamp.
+    statistics = shlex.quote(f"/sys/class/net/{vf_rep}/statistics")
+    sampler = task.sampler_loop_cmd(
+        'read -r rx < "$d/rx_packets" && read -r tx < "$d/tx_packets" && '
+        'echo "$(date +%s.%N) $rx $tx"',
+        interval=VF_REP_SAMPLE_INTERVAL,
+        stop_file=stop_file,
+        max_duration=max_duration,
+    )
+    return f"d={statistics} ; {sampler}"
+
+
+def vf_rep_sampler_parse(out: str) -> list[tuple[float, int, int]]:
+    # The timestamp and the rx/tx packet counters of each sample.
+    samples: list[tuple[float, int, int]] = []
+    for line in out.splitlines():
+        words = line.split()
+        if not words:
+            continue
+        if len(words) != 3:
+            raise ValueError(f"unexpected line {repr(line)}")
+        samples.append((float(words[0]), int(words[1]), int(words[2])))
+    return samples
+
+
+def vf_rep_rates(samples: Sequence[tuple[float, int, int]]) -> dict[str, Any]:
+    """Evaluate the packet rates on the VF representor per sample interval.
+
+    The offsets are in seconds since the first sample. "slow_path" lists the
+    [start, end] offsets of the (merged) intervals where the rx or tx rate
+    reached VF_REP_SLOW_PATH_PPS, which is when flows were not offloaded.
+    """
+    if len(samples) < 2:
+        raise ValueError(f"need at least 2 samples but got {len(samples)}")
+
+    t0 = samples[0][0]
+    offsets: list[float] = []
+    rx_pps: list[float] = []
+    tx_pps: list[float] = []
+    slow_path: list[list[float]] = []
+    for (ts1, rx1, tx1), (ts2, rx2, tx2) in zip(samples, samples[1:]):
+        dt = ts2 - ts1
+        if dt <= 0.0:
+            continue
+        rx = (rx2 - rx1) / dt
+        tx = (tx2 - tx1) / dt
+        offsets.append(round(ts2 - t0, 3))
+        rx_pps.append(round(rx, 1))
+        tx_pps.append(round(tx, 1))
+        if rx >= VF_REP_SLOW_PATH_PPS or tx >= VF_REP_SLOW_PATH_PPS:
+            start = round(ts1 - t0, 3)
+            if slow_path and slow_path[-1][1] == start:
+                slow_path[-1][1] = offsets[-1]
+            else:
+                slow_path.append([start, offsets[-1]])
+
+    if not offsets:
+        raise ValueError("samples have no increasing timestamps")
+
+    return {
+        "interval": VF_REP_SAMPLE_INTERVAL,
+        "offsets": offsets,
+        "rx_pps": rx_pps,
+        "tx_pps": tx_pps,
+        "rx_pps_max": max(rx_pps),
+        "tx_pps_max": max(tx_pps),
+        "slow_path": slow_path,
+    }
+
+
 class PluginValidateOffload(pluginbase.Plugin):
     PLUGIN_NAME = "validate_offload"
 
@@ -133,6 +215,23 @@ class PluginValidateOffload(pluginbase.Plugin):
             TaskValidateOffload(ts, TaskRole.CLIENT, perf_client, tenant),
         ]
 
+    def eval_plugin_output(
+        self,
+        md: tftbase.TestMetadata,
+        plugin_output: PluginOutput,
+    ) -> PluginOutput:
+        # The ethtool counters before and after the run decide about the
+        # offload (and the task already failed the result if they cannot be
+        # evaluated). Without "vf_rep_rates", only the time series of when
+        # traffic went through the representor is missing. That is no
+        # failure, but worth a warning.
+        error = plugin_output.result.get("vf_rep_sampler_error")
+        if error is not None:
+            logger.warning(
+                f"{self.PLUGIN_NAME} plugin has no samples of the VF rep counters for {common.dataclass_to_json(md)}: {error}"
+            )
+        return super().eval_plugin_output(md, plugin_output)
+
 
 plugin = pluginbase.register_plugin(PluginValidateOffload())
 
@@ -156,8 +255,7 @@ class TaskValidateOffload(PluginTask):
             tenant=tenant,
         )
 
-        self.pod_name = f"tools-pod-{self.node_name_sanitized}-validate-offload"
-        self.in_file_template = tftbase.get_manifest("tools-pod.yaml.j2")
+        self.use_tools_pod()
         self._perf_instance = perf_instance
         self.perf_pod_name = perf_instance.pod_name
         self.perf_pod_type = perf_instance.pod_type
@@ -206,7 +304,11 @@ class TaskValidateOffload(PluginTask):
             if vf_rep is not None:
                 r1 = self.run_oc_exec(ethtool_cmd)
 
-                self.ts.event_client_finished.wait()
+                # Between the two ethtool calls, sample the counters for the
+                # whole run.
+                _, r_samples = self.run_sampler(
+                    functools.partial(vf_rep_sampler_cmd, vf_rep)
+                )
 
                 r2 = self.run_oc_exec(ethtool_cmd)
 
@@ -241,6 +343,22 @@ class TaskValidateOffload(PluginTask):
                     f"tx_packet_end: {parsed_data.get('tx_end', 'N/A')}\n"
                 )
 
+                try:
+                    parsed_data["vf_rep_rates"] = vf_rep_rates(
+                        vf_rep_sampler_parse(r_samples.out)
+                    )
+                except ValueError as e:
+                    # The ethtool counters decide about the offload. The
+                    # missing samples are only recorded (see
+                    # eval_plugin_output()).
+                    parsed_data["vf_rep_sampler_cmd"] = common.dataclass_to_dict(
+                        r_samples
+                    )
+                    parsed_data["vf_rep_sampler_error"] = str(e)
+                    logger.warning(
+                        f"VF rep counters of {self.perf_pod_name} cannot be sampled ({e}): {r_samples.debug_msg()}"
+                    )
+
                 if success_result:
                     m1 = check_no_traffic_on_vf_rep(parsed_data, "rx")
                     m2 = check_no_traffic_on_vf_rep(parsed_data, "tx")
@@ -274,3 +392,11 @@ class TaskValidateOffload(PluginTask):
                 logger.info("The server VF representor ovn-k8s-mp0_0 does not exist")
 
         logger.info(f"validateOffload results on {self.perf_pod_name}: {result.result}")
+
+        rates = result.result.get("vf_rep_rates")
+        if rates and rates["slow_path"]:
+            logger.warning(
+                f"Traffic on the VF representor of {self.perf_pod_name} (not offloaded) at "
+                + ", ".join(f"{s:.1f}-{e:.1f}s" for s, e in rates["slow_path"])
+                + f" after start (up to {rates['rx_pps_max']} rx and {rates['tx_pps_max']} tx packets/sec)"
+            )
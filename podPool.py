@@ -0,0 +1,106 @@
+import dataclasses
+import threading
+
+from typing import Optional
+
+from ktoolbox import common
+
+from vfRepCache import VfRepCache
+
+
+logger = common.ExtendedLogger("tft." + __name__)
+
+
+@common.strict_dataclass
+@dataclasses.dataclass(frozen=True, kw_only=True)
+class PodPoolEntry:
+    pod_name: str
+    node_name: str
+    manifest_hash: str
+    port: str
+    # The UID of the created pod. Only informational, a pod with another
+    # UID still matches the entry.
+    uid: str = dataclasses.field(default="", compare=False)
+
+
+class PodPool:
+    """The pods that were created during one test run and are still around.
+
+    Test pods are no longer deleted after each instance and test case. Instead,
+    a pod is reused when a later task renders the very same manifest for it
+    (the pod name already contains the node). Only at the end of the test run
+    all pods are cleaned up.
+
+    The services select the server pod via the "tft-port" label. Hence, for
+    each port there may only be one warm pod, and creating a pod for a port
+    evicts the other pods of that port.
+
+    What was learned about the pods during the test run is cached here too
+    (see VfRepCache).
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._pods: dict[str, PodPoolEntry] = {}
+        self._pod_locks: dict[str, threading.Lock] = {}
+        self.vf_rep_cache = VfRepCache()
+
+    def pod_lock(self, pod_name: str) -> threading.Lock:
+        with self._lock:
+            lock = self._pod_locks.get(pod_name)
+            if lock is None:
+                lock = threading.Lock()
+                self._pod_locks[pod_name] = lock
+            return lock
+
+    def lookup(self, pod_name: str) -> Optional[PodPoolEntry]:
+        with self._lock:
+            return self._pods.get(pod_name)
+
+    def add(self, entry: PodPoolEntry) -> None:
+        with self._lock:
+            self._pods[entry.pod_name] = entry
+
+    def remove(self, pod_name: str) -> Optional[PodPoolEntry]:
+        with self._lock:
+            entry = self._pods.pop(pod_name, None)
+        self.vf_rep_cache.forget_pod(pod_name)
+        return entry
+
+    def take_conflicting(self, entry: PodPoolEntry) -> list[PodPoolEntry]:
+        # Remove and return the other pods that use the same port as "entry".
+        # The caller is supposed to delete them.
+        if not entry.port:
+            return []
+        with self._lock:
+            lst = [
+                e
+                for e in self._pods.values()
+                if e.port == entry.port and e.pod_name != entry.pod_name
+            ]
+            for e in lst:
+                del self._pods[e.pod_name]
+        for e in lst:
+            self.vf_rep_cache.forget_pod(e.pod_name)
+        return lst
+
+    def pciaddrs_on_node(self, node_name: str, ifname: str) -> list[str]:
+        # The known PCI addresses of "ifname" in the pods on "node_name".
+        # Their VF representors can be resolved together (see
+        # VfRepCache.get_vf_rep()).
+        with self._lock:
+            entries = [e for e in self._pods.values() if e.node_name == node_name]
+        pciaddrs: list[str] = []
+        for e in entries:
+            pciaddr = self.vf_rep_cache.lookup_pciaddr(e.pod_name, e.uid, ifname)
+            if pciaddr is not None and pciaddr not in pciaddrs:
+                pciaddrs.append(pciaddr)
+        return pciaddrs
+
+    def clear(self) -> list[PodPoolEntry]:
+        with self._lock:
+            lst = list(self._pods.values())
+            self._pods.clear()
+            self._pod_locks.clear()
+        self.vf_rep_cache.clear()
+        return lst
@@ -0,0 +1,281 @@
+import concurrent.futures
+import http.client
+import select
+import subprocess
+import threading
+import time
+import typing
+
+from typing import Any
+from typing import Optional
+
+from ktoolbox import common
+from ktoolbox import host
+
+import tftbase
+
+from k8sApiClient import K8sApiClient
+from k8sApiClient import K8sApiError
+
+
+logger = common.ExtendedLogger("tft." + __name__)
+
+
+def pod_is_ready(pod: Optional[dict[str, Any]]) -> bool:
+    if not pod:
+        return False
+    if (pod.get("metadata") or {}).get("deletionTimestamp"):
+        return False
+    for condition in (pod.get("status") or {}).get("conditions") or ():
+        if condition.get("type") == "Ready":
+            return bool(condition.get("status") == "True")
+    return False
+
+
+def _pod_uid(pod: dict[str, Any]) -> Optional[str]:
+    return typing.cast(Optional[str], (pod.get("metadata") or {}).get("uid"))
+
+
+class PodReadinessWaiterDied(RuntimeError):
+    pass
+
+
+class PodReadinessWaiter:
+    """Wait for test pods to become ready.
+
+    Instead of one "oc wait" process per pod, a background thread keeps
+    one watch on all "tft-tests" pods of the namespace. Each pod has a
+    future that gets resolved with the pod object once the pod is ready.
+    If the pod later becomes unready or is deleted, a new future replaces
+    it. The latest pod objects are cached and available via get_pod().
+
+    If the watch thread fails unexpectedly, the waiter is dead. Then
+    wait_ready() and get_pod() raise PodReadinessWaiterDied, and the caller
+    falls back to "oc".
+    """
+
+    def __init__(
+        self,
+        api_client: K8sApiClient,
+        namespace: str,
+        *,
+        label_selector: str = tftbase.TFT_TESTS,
+    ) -> None:
+        self.api_client = api_client
+        self.namespace = namespace
+        self.label_selector = label_selector
+        self._lock = threading.Lock()
+        self._pods: dict[str, dict[str, Any]] = {}
+        self._futures: dict[str, concurrent.futures.Future[dict[str, Any]]] = {}
+        self._synced = threading.Event()
+        self._dead = False
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def dead(self) -> bool:
+        with self._lock:
+            return self._dead
+
+    def _die(self) -> None:
+        with self._lock:
+            self._dead = True
+            for fut in self._futures.values():
+                if not fut.done():
+                    fut.set_exception(
+                        PodReadinessWaiterDied(f"watch pods in {self.namespace} died")
+                    )
+        self._synced.set()
+
+    def _check_alive(self) -> None:
+        # Must be called with the lock held.
+        if self._dead:
+            raise PodReadinessWaiterDied(f"watch pods in {self.namespace} died")
+
+    def _ensure_started(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run,
+                    name=f"pod-readiness-{self.namespace}",
+                    daemon=True,
+                )
+                self._thread.start()
+
+    def _future(self, pod_name: str) -> concurrent.futures.Future[dict[str, Any]]:
+        # Must be called with the lock held.
+        fut = self._futures.get(pod_name)
+        if fut is None:
+            fut = concurrent.futures.Future()
+            self._futures[pod_name] = fut
+        return fut
+
+    def _update(self, pod_name: str, pod: Optional[dict[str, Any]]) -> None:
+        # Must be called with the lock held.
+        if pod is None:
+            self._pods.pop(pod_name, None)
+        else:
+            self._pods[pod_name] = pod
+        fut = self._future(pod_name)
+        if pod_is_ready(pod):
+            assert pod is not None
+            if fut.done() and _pod_uid(fut.result()) != _pod_uid(pod):
+                # The pod was deleted and recreated between two resyncs.
+                fut = concurrent.futures.Future()
+                self._futures[pod_name] = fut
+            if not fut.done():
+                fut.set_result(pod)
+        elif fut.done():
+            self._futures[pod_name] = concurrent.futures.Future()
+
+    def _resync(self) -> str:
+        items, resource_version = self.api_client.list_items_with_version(
+            "pods",
+            namespace=self.namespace,
+            label_selector=self.label_selector,
+        )
+        pods = {pod["metadata"]["name"]: pod for pod in items}
+        with self._lock:
+            for pod_name in set(self._pods) - set(pods):
+                self._update(pod_name, None)
+            for pod_name, pod in pods.items():
+                self._update(pod_name, pod)
+        self._synced.set()
+        return resource_version
+
+    def _run(self) -> None:
+        resource_version = ""
+        while True:
+            try:
+                if not resource_version:
+                    resource_version = self._resync()
+                for event in self.api_client.watch(
+                    "pods",
+                    namespace=self.namespace,
+                    label_selector=self.label_selector,
+                    resource_version=resource_version,
+                ):
+                    event_type = event.get("type")
+                    obj = event.get("object") or {}
+                    if event_type == "ERROR":
+                        # Most likely "410 Gone", our resourceVersion is too
+                        # old. List again.
+                        resource_version = ""
+                        break
+                    metadata = obj.get("metadata") or {}
+                    resource_version = metadata.get("resourceVersion") or ""
+                    if event_type == "BOOKMARK":
+                        continue
+                    with self._lock:
+                        self._update(
+                            metadata["name"],
+                            None if event_type == "DELETED" else obj,
+                        )
+            except (
+                K8sApiError,
+                OSError,
+                ValueError,
+                KeyError,
+                http.client.HTTPException,
+            ) as e:
+                logger.debug(f"watch pods in {self.namespace} failed: {e}")
+                resource_version = ""
+                time.sleep(1)
+            except Exception as e:
+                logger.warning(
+                    f"watch pods in {self.namespace} failed unexpectedly, fall back to oc: {e}"
+                )
+                self._die()
+                return
+
+    def wait_ready(
+        self,
+        pod_name: str,
+        *,
+        timeout: float,
+        uid: Optional[str] = None,
+    ) -> Optional[dict[str, Any]]:
+        # Returns the ready pod object, or None on timeout. If "uid" is set,
+        # only that pod counts. A pod that was just recreated with the same
+        # name might still be known to us as the old, ready pod.
+        self._ensure_started()
+        end_time = time.monotonic() + timeout
+        while True:
+            with self._lock:
+                self._check_alive()
+                fut = self._future(pod_name)
+            remaining = end_time - time.monotonic()
+            try:
+                pod = fut.result(timeout=max(0.0, remaining))
+            except concurrent.futures.TimeoutError:
+                with self._lock:
+                    if fut is self._futures.get(pod_name) or remaining <= 0:
+                        return None
+                # The pod became unready and the future got replaced while
+                # we were waiting. Wait for the new one.
+                continue
+            if uid is None or _pod_uid(pod) == uid:
+                return pod
+            if remaining <= 0:
+                return None
+            # The watch did not yet see the deletion of the old pod.
+            time.sleep(0.1)
+
+    def get_pod(self, pod_name: str) -> Optional[dict[str, Any]]:
+        # The pod object as last seen by the watch.
+        self._ensure_started()
+        self._synced.wait(timeout=30)
+        with self._lock:
+            self._check_alive()
+            return self._pods.get(pod_name)
+
+
+def _podman_running(name: str) -> bool:
+    r = host.local.run(
+        f"podman ps --filter status=running --filter name={name} --format '{{{{.Names}}}}'"
+    )
+    return name in r.out.split()
+
+
+def podman_wait_running(name: str, *, timeout: float) -> bool:
+    # Wait for the container to run. Subscribe to "podman events" first and
+    # only then check the current state, so we don't miss the start event.
+    proc = subprocess.Popen(
+        [
+            "podman",
+            "events",
+            "--filter",
+            f"container={name}",
+            "--filter",
+            "event=start",
+            "--format",
+            "{{.Name}}",
+        ],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        text=True,
+    )
+    try:
+        end_time = time.monotonic() + timeout
+        if _podman_running(name):
+            return True
+        assert proc.stdout is not None
+        while True:
+            remaining = end_time - time.monotonic()
+            if remaining <= 0:
+                break
+            readable, _, _ = select.select([proc.stdout], [], [], remaining)
+            if not readable:
+                break
+            line = proc.stdout.readline()
+            if not line:
+                logger.warning(f"podman events for {name} ended unexpectedly")
+                break
+            if line.strip() == name:
+                return True
+    finally:
+        proc.kill()
+        proc.wait()
+
+    # "podman events" might not have been subscribed yet when the container
+    # started. Check one last time.
+    return _podman_running(name)
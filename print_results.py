@@ -131,7 +131,7 @@ def parse_args() -> argparse.Namespace:
 def main() -> int:
     args = parse_args()
     success = process_results_all(
-        tftbase.TftResults.parse_from_file(file) for file in args.result
+        tftbase.TftResults.parse_from_file(file, lazy=True) for file in args.result
     )
     return 0 if success else EXIT_CODE_VALIDATION
 
@@ -0,0 +1,389 @@
+#!/usr/bin/env python3
+
+import argparse
+import http.client
+import http.server
+import json
+import math
+import os
+import socket
+import sys
+import threading
+import time
+
+from datetime import datetime
+from typing import Any
+from typing import Optional
+
+
+DEFAULT_ADDR = "127.0.0.1"
+DEFAULT_CONCURRENCY = 8
+DEFAULT_DURATION = 10.0
+DEFAULT_PAYLOAD_SIZE = 1024
+DEFAULT_PORT = 5201
+DEFAULT_RATE = 0.0
+DEFAULT_WORKERS = 4
+
+MAX_PAYLOAD_SIZE = 64 * 1024 * 1024
+
+PAYLOAD_PATTERN = b"kubernetes-traffic-flow-tests\n"
+
+
+def _print(msg: str) -> None:
+    # The client prints the JSON result on stdout. Log to stderr.
+    now = datetime.now()
+    timestamp = now.strftime("%H:%M:%S.") + f"{now.microsecond // 100:04d}"
+    print(f"[{timestamp}] {msg}", file=sys.stderr)
+
+
+class Payloads:
+    # The response bodies, by size. They are created once and then served
+    # from memory.
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._payloads: dict[int, bytes] = {}
+
+    def get(self, size: int) -> bytes:
+        with self._lock:
+            payload = self._payloads.get(size)
+            if payload is None:
+                n = size // len(PAYLOAD_PATTERN) + 1
+                payload = (PAYLOAD_PATTERN * n)[:size]
+                self._payloads[size] = payload
+            return payload
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    # HTTP/1.1, so that clients can keep the connection alive. Headers and
+    # body are written separately, don't let Nagle delay the body.
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    payloads = Payloads()
+    payload_size = DEFAULT_PAYLOAD_SIZE
+
+    def do_GET(self) -> None:
+        # "/$SIZE" requests a payload of that many bytes. Other paths get the
+        # default payload size of the server.
+        size = self.payload_size
+        path = self.path.strip("/")
+        if path.isdigit():
+            size = int(path)
+        if size > MAX_PAYLOAD_SIZE:
+            self.send_error(400, f"payload size is limited to {MAX_PAYLOAD_SIZE}")
+            return
+        payload = self.payloads.get(size)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+
+class Server(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 1024
+
+    def server_bind(self) -> None:
+        # All worker processes bind the same port. The kernel distributes the
+        # connections between them.
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        super().server_bind()
+
+
+def run_server(
+    *,
+    s_addr: str = DEFAULT_ADDR,
+    port: int = DEFAULT_PORT,
+    workers: int = DEFAULT_WORKERS,
+    payload_size: int = DEFAULT_PAYLOAD_SIZE,
+    duration: float = 0.0,
+) -> None:
+    Handler.payload_size = payload_size
+
+    _print(
+        f"server: listen on {s_addr}:{port} with {workers} workers (payload {payload_size} bytes)"
+    )
+
+    children: list[int] = []
+    for _ in range(workers - 1):
+        pid = os.fork()
+        if pid == 0:
+            children = []
+            break
+        children.append(pid)
+
+    with Server((s_addr, port), Handler) as server:
+        if duration > 0.0:
+            threading.Timer(duration, server.shutdown).start()
+        try:
+            server.serve_forever()
+        finally:
+            for pid in children:
+                os.waitpid(pid, 0)
+
+
+def percentile(values: list[float], q: float) -> float:
+    # Same as tftbase.percentile(). This script runs standalone in the pod.
+    lst = sorted(values)
+    pos = (len(lst) - 1) * q / 100.0
+    idx = int(pos)
+    if idx + 1 >= len(lst):
+        return lst[-1]
+    return lst[idx] + (lst[idx + 1] - lst[idx]) * (pos - idx)
+
+
+class WorkerStats:
+    def __init__(self) -> None:
+        self.requests = 0
+        self.errors = 0
+        self.bytes = 0
+        self.latencies: list[float] = []
+
+
+def _wait_server(s_addr: str, port: int, timeout: float) -> None:
+    end_time = time.monotonic() + timeout
+    first_attempt = True
+    while True:
+        try:
+            socket.create_connection((s_addr, port), timeout=5).close()
+            return
+        except OSError:
+            if time.monotonic() >= end_time:
+                raise
+            if first_attempt:
+                first_attempt = False
+                _print("client: connection refused. Retry")
+            time.sleep(0.2)
+
+
+def _run_worker(
+    stats: WorkerStats,
+    *,
+    s_addr: str,
+    port: int,
+    path: str,
+    start_time: float,
+    end_time: float,
+    interval: float,
+) -> None:
+    conn = http.client.HTTPConnection(s_addr, port, timeout=10)
+    next_time = start_time
+    while True:
+        now = time.monotonic()
+        if interval > 0.0:
+            # Open loop. The requests are scheduled at a fixed rate and the
+            # latency counts from the scheduled time. A slow response thus
+            # also delays (and shows in) the following requests, instead of
+            # silently lowering the request rate.
+            if next_time >= end_time:
+                break
+            if next_time > now:
+                time.sleep(next_time - now)
+            t0 = next_time
+            next_time += interval
+        else:
+            if now >= end_time:
+                break
+            t0 = now
+        try:
+            conn.request("GET", path)
+            response = conn.getresponse()
+            body = response.read()
+        except (OSError, http.client.HTTPException):
+            stats.errors += 1
+            conn.close()
+            conn = http.client.HTTPConnection(s_addr, port, timeout=10)
+            continue
+        if response.status != 200:
+            stats.errors += 1
+            continue
+        stats.latencies.append(time.monotonic() - t0)
+        stats.requests += 1
+        stats.bytes += len(body)
+    conn.close()
+
+
+def run_client(
+    *,
+    s_addr: str = DEFAULT_ADDR,
+    port: int = DEFAULT_PORT,
+    duration: float = DEFAULT_DURATION,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    rate: float = DEFAULT_RATE,
+    payload_size: Optional[int] = None,
+) -> dict[str, Any]:
+    _wait_server(s_addr, port, min(duration, 60.0) if duration > 0.0 else 60.0)
+
+    path = "/" if payload_size is None else f"/{payload_size}"
+    interval = concurrency / rate if rate > 0.0 else 0.0
+
+    _print(
+        f"client: {concurrency} connections to {s_addr}:{port}{path} for {duration} seconds"
+        + (f" at {rate} requests/sec" if rate > 0.0 else "")
+    )
+
+    all_stats = [WorkerStats() for _ in range(concurrency)]
+    start_time = time.monotonic()
+    end_time = start_time + duration
+    threads = [
+        threading.Thread(
+            target=_run_worker,
+            args=(stats,),
+            kwargs={
+                "s_addr": s_addr,
+                "port": port,
+                "path": path,
+                # Spread the scheduled requests of the workers evenly.
+                "start_time": start_time + idx * interval / concurrency,
+                "end_time": end_time,
+                "interval": interval,
+            },
+            daemon=True,
+        )
+        for idx, stats in enumerate(all_stats)
+    ]
+    for th in threads:
+        th.start()
+    for th in threads:
+        th.join()
+    elapsed = time.monotonic() - start_time
+
+    requests = sum(s.requests for s in all_stats)
+    errors = sum(s.errors for s in all_stats)
+    total_bytes = sum(s.bytes for s in all_stats)
+    latencies = [t * 1e6 for s in all_stats for t in s.latencies]
+
+    result: dict[str, Any] = {
+        "concurrency": concurrency,
+        "rate": rate,
+        "duration": elapsed,
+        "requests": requests,
+        "errors": errors,
+        "bytes": total_bytes,
+        "requests_per_second": requests / elapsed,
+        "bytes_per_second": total_bytes / elapsed,
+    }
+    if latencies:
+        mean = sum(latencies) / len(latencies)
+        result["latency_us"] = {
+            "min": min(latencies),
+            "p50": percentile(latencies, 50),
+            "p90": percentile(latencies, 90),
+            "p99": percentile(latencies, 99),
+            "max": max(latencies),
+            "stddev": math.sqrt(
+                sum((x - mean) ** 2 for x in latencies) / len(latencies)
+            ),
+        }
+    return result
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="HTTP server and load generator")
+    parser.add_argument(
+        "-p",
+        "--port",
+        type=int,
+        help=f"TCP port to listen/connect (default: {DEFAULT_PORT})",
+        default=DEFAULT_PORT,
+    )
+    parser.add_argument(
+        "-a",
+        "--addr",
+        type=str,
+        help=f"IP address to listen/connect (default: {DEFAULT_ADDR})",
+        default=DEFAULT_ADDR,
+    )
+    parser.add_argument(
+        "-s",
+        "--server",
+        action="store_true",
+        help="Whether to run as server or client (default)",
+    )
+    parser.add_argument(
+        "-d",
+        "--duration",
+        type=float,
+        help=f"How long to send requests. For the server, how long before quitting (0 means infinity) (default: {DEFAULT_DURATION} for the client, 0 for the server)",
+        default=None,
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help=f"For the server, the number of processes that accept connections (default: {DEFAULT_WORKERS})",
+        default=DEFAULT_WORKERS,
+    )
+    parser.add_argument(
+        "--payload-size",
+        type=int,
+        help=f"The size of the response body. For the client, if unset the server's default (default for the server: {DEFAULT_PAYLOAD_SIZE})",
+        default=None,
+    )
+    parser.add_argument(
+        "-c",
+        "--concurrency",
+        type=int,
+        help=f"For the client, the number of keep-alive connections with requests in flight (default: {DEFAULT_CONCURRENCY})",
+        default=DEFAULT_CONCURRENCY,
+    )
+    parser.add_argument(
+        "-r",
+        "--rate",
+        type=float,
+        help="For the client, the total requests per second, sent open loop. 0 sends the next request on a connection as soon as the previous response arrived (default: 0)",
+        default=DEFAULT_RATE,
+    )
+
+    args = parser.parse_args()
+
+    if args.workers < 1:
+        parser.error("--workers must be positive")
+    if args.concurrency < 1:
+        parser.error("--concurrency must be positive")
+    if args.rate < 0.0:
+        parser.error("--rate must not be negative")
+    if args.payload_size is not None and not (
+        0 <= args.payload_size <= MAX_PAYLOAD_SIZE
+    ):
+        parser.error(f"--payload-size must be between 0 and {MAX_PAYLOAD_SIZE}")
+
+    return args
+
+
+def main() -> None:
+    args = parse_args()
+    if args.server:
+        run_server(
+            s_addr=args.addr,
+            port=args.port,
+            workers=args.workers,
+            payload_size=(
+                DEFAULT_PAYLOAD_SIZE if args.payload_size is None else args.payload_size
+            ),
+            duration=0.0 if args.duration is None else args.duration,
+        )
+    else:
+        result = run_client(
+            s_addr=args.addr,
+            port=args.port,
+            duration=DEFAULT_DURATION if args.duration is None else args.duration,
+            concurrency=args.concurrency,
+            rate=args.rate,
+            payload_size=args.payload_size,
+        )
+        print(json.dumps(result))
+        if not result["requests"] or result["errors"]:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        pass
@@ -1,12 +1,20 @@
 #!/usr/bin/env python3
 
 import argparse
+import array
+import errno
+import json
+import math
 import os
 import random
+import selectors
 import shlex
 import socket
 import string
+import struct
 import sys
+import tempfile
+import threading
 import time
 
 from collections.abc import Iterator
@@ -20,17 +28,30 @@ from typing import Optional
 DEFAULT_ADDR = "127.0.0.1"
 DEFAULT_BUFSIZE = 65495
 DEFAULT_DURATION = 0.0
+DEFAULT_MSG_SIZE = 64
 DEFAULT_NUM_CLIENTS = 1
 DEFAULT_PORT = 5201
+DEFAULT_PROTO = "tcp"
 DEFAULT_SLEEP = 0.001
+# The server waits for data in select(). It only sleeps to throttle.
+DEFAULT_SERVER_SLEEP = 0.0
+
+# UDP datagrams start with a sequence number.
+UDP_SEQ = struct.Struct("!Q")
+UDP_MAX_SIZE = 65507
+UDP_TIMEOUT = 1.0
 
 global_start_time = time.monotonic()
 
+# With "--json", the client prints its result as JSON on stdout and logs to
+# stderr.
+json_output = False
+
 
 def _print(msg: str) -> None:
     now = datetime.now()
     timestamp = now.strftime("%H:%M:%S.") + f"{now.microsecond // 100:04d}"
-    print(f"[{timestamp}] {msg}")
+    print(f"[{timestamp}] {msg}", file=sys.stderr if json_output else sys.stdout)
 
 
 def create_socket() -> socket.socket:
@@ -97,11 +118,91 @@ def sleep_timeout(
     sys.exit(exit_code)
 
 
+def percentile(values: list[int], q: float) -> float:
+    # Same as tftbase.percentile(). This script runs standalone in the pod.
+    lst = sorted(values)
+    pos = (len(lst) - 1) * q / 100.0
+    idx = int(pos)
+    if idx + 1 >= len(lst):
+        return lst[-1]
+    return lst[idx] + (lst[idx + 1] - lst[idx]) * (pos - idx)
+
+
+class LatencyHistogram:
+    # Round trip times, measured with time.perf_counter_ns(). They are kept
+    # in a compact array, 8 bytes per message.
+
+    def __init__(self) -> None:
+        self.samples_ns = array.array("q")
+
+    def add(self, rtt_ns: int) -> None:
+        self.samples_ns.append(rtt_ns)
+
+    def summary_us(self) -> Optional[dict[str, float]]:
+        if not self.samples_ns:
+            return None
+        lst = sorted(self.samples_ns)
+        mean = sum(lst) / len(lst)
+        return {
+            "min": lst[0] / 1000.0,
+            "p50": percentile(lst, 50) / 1000.0,
+            "p90": percentile(lst, 90) / 1000.0,
+            "p99": percentile(lst, 99) / 1000.0,
+            "max": lst[-1] / 1000.0,
+            "stddev": math.sqrt(sum((x - mean) ** 2 for x in lst) / len(lst)) / 1000.0,
+        }
+
+    def print(self, log_name: str) -> None:
+        summary = self.summary_us()
+        if summary is None:
+            _print(f"{log_name}: no round trips measured")
+            return
+        _print(
+            f"{log_name}: round trip latency of {len(self.samples_ns)} messages (us): "
+            + " ".join(f"{k} {v:.1f}" for k, v in summary.items())
+        )
+        # Power of two buckets in microseconds. Bucket b counts the latencies
+        # in [2^(b-1), 2^b).
+        buckets: dict[int, int] = {}
+        for rtt_ns in self.samples_ns:
+            b = (rtt_ns // 1000).bit_length()
+            buckets[b] = buckets.get(b, 0) + 1
+        max_count = max(buckets.values())
+        for b in range(min(buckets), max(buckets) + 1):
+            count = buckets.get(b, 0)
+            low = 0 if b == 0 else 1 << (b - 1)
+            bar = "#" * ((count * 40 + max_count - 1) // max_count)
+            _print(f"{log_name}:   {low:>8} - {1 << b:<8} {count:>9} {bar}")
+
+
+class ServerConnection:
+    def __init__(
+        self,
+        idx: int,
+        conn: socket.socket,
+        addr: Any,
+        bufsize: int,
+    ) -> None:
+        self.idx = idx
+        self.conn = conn
+        self.addr = addr
+        self.msg_count = 0
+        self.rcv_len = 0
+        # Receive into a preallocated buffer and send the echo from slices of
+        # it. No bytes objects are created per chunk.
+        self.buf = memoryview(bytearray(bufsize))
+        self.outbuf = self.buf[:0]
+        self.closed = False
+
+    def summary(self) -> str:
+        return f"connection #{self.idx} from {self.addr}: {self.msg_count} chunks received and returned ({self.rcv_len} bytes)"
+
+
 def run_server(
     *,
     s_addr: str = DEFAULT_ADDR,
     port: int = DEFAULT_PORT,
-    sleep: float = DEFAULT_SLEEP,
+    sleep: float = DEFAULT_SERVER_SLEEP,
     bufsize: int = DEFAULT_BUFSIZE,
     duration: float = DEFAULT_DURATION,
     num_clients: int = DEFAULT_NUM_CLIENTS,
@@ -112,85 +213,219 @@ def run_server(
 
     s = create_socket()
 
-    _print(f"server: listen on {s_addr}:{port}")
     s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
     s.bind((s_addr, port))
-    s.listen(1)
+    s.listen(max(num_clients, 128))
+    _print(f"server: listen on {s_addr}:{port}")
+    s.setblocking(False)
 
-    client_count = 0
+    sel = selectors.DefaultSelector()
+    sel.register(s, selectors.EVENT_READ)
 
-    while 1:
-        if num_clients > 0 and client_count >= num_clients:
-            _print(f"server: number of clients {num_clients} reached. Quit")
-            sys.exit(0)
-        with socket_timeout("server", s, start_time, duration):
-            conn, addr = s.accept()
-        client_count += 1
+    conns: list[ServerConnection] = []
+    last_time = -1000.0
+
+    def done_msg() -> None:
+        for c in conns:
+            if not c.closed:
+                _print(f"server: {c.summary()}")
+        msg_count = sum(c.msg_count for c in conns)
+        rcv_len = sum(c.rcv_len for c in conns)
         _print(
-            f"server: new connection #{client_count} on port {port} from addr {addr}."
+            f"server: {len(conns)} connections, {msg_count} chunks received and returned ({rcv_len} bytes) in total"
         )
-        msg_count = 0
-        last_time = -1000.0
-        rcv_len = 0
-        while 1:
 
-            def done_msg() -> None:
-                _print(
-                    f"server: {msg_count} chunks received and returned ({rcv_len} bytes) in total"
-                )
+    def close(c: ServerConnection) -> None:
+        sel.unregister(c.conn)
+        c.conn.close()
+        c.closed = True
+        _print(f"server: {c.summary()}, closed")
 
-            with socket_timeout(
-                "server", conn, start_time, duration, done_msg=done_msg
-            ):
-                try:
-                    data = conn.recv(bufsize)
-                except Exception:
-                    data = b""
-            if not data:
+    def update_events(c: ServerConnection) -> None:
+        # Stop reading while the echo of the previous chunk is still pending.
+        # That way, a slow reader gets backpressure.
+        if c.outbuf:
+            sel.modify(c.conn, selectors.EVENT_WRITE, c)
+        else:
+            sel.modify(c.conn, selectors.EVENT_READ, c)
+
+    while True:
+        accepting = num_clients <= 0 or len(conns) < num_clients
+        if not accepting and all(c.closed for c in conns):
+            done_msg()
+            _print(f"server: number of clients {num_clients} reached. Quit")
+            sys.exit(0)
+
+        if duration <= 0.0:
+            timeout = None
+        else:
+            timeout = (start_time + duration) - time.monotonic()
+            if timeout <= 0.0:
                 done_msg()
-                _print(f"server: connection {addr} closed")
-                break
-            msg_count += 1
-            rcv_len += len(data)
-            with socket_timeout(
-                "server", conn, start_time, duration, done_msg=done_msg
-            ):
+                _print("server: duration expired. Quit")
+                sys.exit(0)
+
+        for key, events in sel.select(timeout):
+            if key.fileobj is s:
                 try:
-                    conn.sendall(data)
-                except ConnectionResetError:
-                    done_msg()
-                    _print(f"server: connection {addr} closed")
-                    break
-            now_time = time.monotonic()
-            if now_time - last_time >= 1.0:
+                    conn, addr = s.accept()
+                except BlockingIOError:
+                    continue
+                conn.setblocking(False)
+                c = ServerConnection(len(conns) + 1, conn, addr, bufsize)
+                conns.append(c)
+                sel.register(conn, selectors.EVENT_READ, c)
                 _print(
-                    f"server: {msg_count} chunks received and returned ({rcv_len} bytes)"
+                    f"server: new connection #{c.idx} on port {port} from addr {addr}."
                 )
-                last_time = now_time
-            sleep_timeout("server", start_time, duration, sleep, done_msg=done_msg)
-        conn.close()
+                if num_clients > 0 and len(conns) >= num_clients:
+                    sel.unregister(s)
+                continue
 
+            c = key.data
+            if events & selectors.EVENT_READ:
+                try:
+                    n = c.conn.recv_into(c.buf)
+                except BlockingIOError:
+                    continue
+                except Exception:
+                    n = 0
+                if not n:
+                    close(c)
+                    continue
+                c.msg_count += 1
+                c.rcv_len += n
+                c.outbuf = c.buf[:n]
+            try:
+                n = c.conn.send(c.outbuf)
+            except BlockingIOError:
+                n = 0
+            except OSError:
+                close(c)
+                continue
+            c.outbuf = c.outbuf[n:]
+            update_events(c)
 
-printable = (string.ascii_letters + string.digits).encode("ascii")
+        now_time = time.monotonic()
+        if now_time - last_time >= 1.0:
+            msg_count = sum(c.msg_count for c in conns)
+            rcv_len = sum(c.rcv_len for c in conns)
+            n_open = sum(1 for c in conns if not c.closed)
+            _print(
+                f"server: {n_open} open connections, {msg_count} chunks received and returned ({rcv_len} bytes)"
+            )
+            last_time = now_time
+        # Each connection handles at most one chunk per iteration. With
+        # "--sleep", sleeping after each iteration thus throttles every
+        # connection. By default, the server does not sleep, so that the
+        # bitrate is not limited by it.
+        sleep_timeout("server", start_time, duration, sleep, done_msg=done_msg)
 
 
-def _random_ascii(n: int) -> bytes:
-    return bytes(random.choice(printable) for _ in range(n))
+class UdpPeer:
+    def __init__(self, idx: int, addr: Any) -> None:
+        self.idx = idx
+        self.addr = addr
+        self.msg_count = 0
+        self.rcv_len = 0
+        self.next_seq = 0
+        self.missing: set[int] = set()
+        self.reordered = 0
+        self.closed = False
 
+    def track(self, seq: int) -> None:
+        # A gap in the sequence numbers counts as lost, until the missing
+        # datagram arrives late. Then it counts as reordered instead.
+        # Anything else below "next_seq" is a duplicate.
+        if seq >= self.next_seq:
+            self.missing.update(range(self.next_seq, seq))
+            self.next_seq = seq + 1
+        elif seq in self.missing:
+            self.missing.remove(seq)
+            self.reordered += 1
 
-def run_client(
+    def summary(self) -> str:
+        return f"peer #{self.idx} {self.addr}: {self.msg_count} datagrams received and returned ({self.rcv_len} bytes), {len(self.missing)} lost, {self.reordered} reordered"
+
+
+def run_server_udp(
     *,
     s_addr: str = DEFAULT_ADDR,
     port: int = DEFAULT_PORT,
-    sleep: float = DEFAULT_SLEEP,
     bufsize: int = DEFAULT_BUFSIZE,
     duration: float = DEFAULT_DURATION,
-    verbose: bool = False,
-    echo_ascii: bool = False,
+    num_clients: int = DEFAULT_NUM_CLIENTS,
 ) -> None:
 
     start_time = global_start_time
 
+    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    s.bind((s_addr, port))
+    _print(f"server: listen on {s_addr}:{port} (UDP)")
+
+    buf = memoryview(bytearray(bufsize))
+    peers: dict[Any, UdpPeer] = {}
+    n_finished = 0
+
+    def done_msg() -> None:
+        for p in peers.values():
+            if not p.closed:
+                _print(f"server: {p.summary()}")
+        msg_count = sum(p.msg_count for p in peers.values())
+        rcv_len = sum(p.rcv_len for p in peers.values())
+        _print(
+            f"server: {len(peers)} peers, {msg_count} datagrams received and returned ({rcv_len} bytes) in total"
+        )
+
+    while True:
+        if num_clients > 0 and n_finished >= num_clients:
+            done_msg()
+            _print(f"server: number of clients {num_clients} reached. Quit")
+            sys.exit(0)
+
+        with socket_timeout("server", s, start_time, duration, done_msg=done_msg):
+            n, addr = s.recvfrom_into(buf)
+
+        p = peers.get(addr)
+        if p is None:
+            p = UdpPeer(len(peers) + 1, addr)
+            peers[addr] = p
+            _print(f"server: new peer #{p.idx} on port {port} from addr {addr}.")
+
+        if n == 0:
+            # An empty datagram is the client saying goodbye. It sends a few,
+            # in case some get lost.
+            if not p.closed:
+                p.closed = True
+                n_finished += 1
+                _print(f"server: {p.summary()}, finished")
+            continue
+
+        if n >= UDP_SEQ.size:
+            p.track(UDP_SEQ.unpack_from(buf)[0])
+        p.msg_count += 1
+        p.rcv_len += n
+        try:
+            s.sendto(buf[:n], addr)
+        except OSError:
+            pass
+
+
+printable = (string.ascii_letters + string.digits).encode("ascii")
+
+
+def _random_ascii(n: int) -> bytes:
+    return bytes(random.choice(printable) for _ in range(n))
+
+
+def _connect(
+    s_addr: str,
+    port: int,
+    start_time: float,
+    duration: float,
+) -> socket.socket:
     _print(f"client: connecting to {s_addr}:{port}")
     s = create_socket()
 
@@ -208,66 +443,471 @@ def run_client(
         else:
             connected = True
     _print(f"client: connected to {s_addr}:{port}")
+    return s
 
-    msg_count = 0
-    rcv_len = 0
-    while 1:
 
-        def done_msg() -> None:
-            _print(
-                f"client: {msg_count} chunks send and received ({rcv_len} bytes) in total"
-            )
+class ClientStats:
+    # What the client measured, counting from when it connected. With
+    # "--json" this is printed at exit.
+
+    def __init__(self, mode: str) -> None:
+        self.mode = mode
+        self.connected_time: Optional[float] = None
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.chunks_sent = 0
+        self.chunks_received = 0
+        self.lost: Optional[int] = None
+        self.reordered: Optional[int] = None
+        self.hist: Optional[LatencyHistogram] = None
+
+    def connected(self) -> None:
+        self.connected_time = time.monotonic()
+
+    def duration(self) -> float:
+        if self.connected_time is None:
+            return 0.0
+        return time.monotonic() - self.connected_time
+
+    def gbps(self, num_bytes: int) -> float:
+        elapsed = self.duration()
+        if elapsed <= 0.0:
+            return 0.0
+        return num_bytes * 8 / elapsed / 1e9
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "bytes_sent": self.bytes_sent,
+            "bytes_received": self.bytes_received,
+            "chunks_sent": self.chunks_sent,
+            "chunks_received": self.chunks_received,
+            "duration": self.duration(),
+            "tx_gbps": self.gbps(self.bytes_sent),
+            "rx_gbps": self.gbps(self.bytes_received),
+            "lost": self.lost,
+            "reordered": self.reordered,
+            "latency_us": None if self.hist is None else self.hist.summary_us(),
+        }
+
+    def print_json(self) -> None:
+        if json_output:
+            print(json.dumps(self.as_dict()), flush=True)
+
+
+def _create_payload(size: int, echo_ascii: bool) -> memoryview:
+    # The random data is created once. The chunks that get sent are slices
+    # of it.
+    if echo_ascii:
+        return memoryview(_random_ascii(size))
+    return memoryview(os.urandom(size))
+
+
+def run_client(
+    *,
+    s_addr: str = DEFAULT_ADDR,
+    port: int = DEFAULT_PORT,
+    sleep: float = DEFAULT_SLEEP,
+    bufsize: int = DEFAULT_BUFSIZE,
+    duration: float = DEFAULT_DURATION,
+    verbose: bool = False,
+    echo_ascii: bool = False,
+) -> None:
+
+    start_time = global_start_time
+
+    s = _connect(s_addr, port, start_time, duration)
+    # The chunks have random sizes and the echo mode measures no latency.
+    # That is what "--rr" and "--proto udp" are for.
+    stats = ClientStats("echo")
+    stats.connected()
+
+    payload = _create_payload(2 * bufsize, echo_ascii)
+    rcv_buf = memoryview(bytearray(bufsize))
+
+    def done_msg() -> None:
+        _print(
+            f"client: {stats.chunks_received} chunks send and received ({stats.bytes_received} bytes) in total, {stats.gbps(stats.bytes_received):.3f} Gbit/s"
+        )
+        stats.print_json()
+
+    while 1:
 
         i_bufsize = random.randint(1, bufsize)
-        if echo_ascii:
-            snd_data = _random_ascii(i_bufsize)
-        else:
-            snd_data = os.urandom(i_bufsize)
+        i_offset = random.randint(0, bufsize)
+        snd_data = payload[i_offset : i_offset + i_bufsize]
         if verbose:
             _print(f"client: echo random chunk of {i_bufsize} bytes")
         with socket_timeout("client", s, start_time, duration, done_msg=done_msg):
             s.sendall(snd_data)
-        msg_count += 1
+        stats.chunks_sent += 1
+        stats.bytes_sent += i_bufsize
 
         # We first read all the data we sent back.
-        rcv_data = b""
-        while len(rcv_data) < len(snd_data):
+        rcv_data = rcv_buf[:i_bufsize]
+        n_rcv = 0
+        while n_rcv < i_bufsize:
             timeout_sec = 1
             s.settimeout(timeout_sec)
             try:
-                r = s.recv(bufsize)
+                n = s.recv_into(rcv_data[n_rcv:])
             except socket.timeout:
                 s.settimeout(20)
                 try:
-                    r = s.recv(bufsize)
+                    n = s.recv_into(rcv_data[n_rcv:])
                 except socket.timeout:
                     _print(
                         f"client: unexpected response. Timeout after {timeout_sec} seconds to receive a response. Even after waiting additional 20 seconds no response was received"
                     )
                 else:
                     _print(
-                        f"client: unexpected response. Timeout after {timeout_sec} seconds to receive a response. Aftware waiting some more, {len(r)} bytes were received"
+                        f"client: unexpected response. Timeout after {timeout_sec} seconds to receive a response. Aftware waiting some more, {n} bytes were received"
                     )
                 sys.exit(1)
-            assert r
-            rcv_data += r
+            assert n
+            n_rcv += n
 
         if rcv_data != snd_data:
             if verbose:
-                _print("client: was expecting    {repr(snd_data)}")
-                _print("client: received instead {repr(rcv_data)}")
+                _print(f"client: was expecting    {repr(bytes(snd_data))}")
+                _print(f"client: received instead {repr(bytes(rcv_data))}")
             _print("client: unexpected response. Expect an echo of the data we sent")
             sys.exit(1)
 
-        rcv_len += len(rcv_data)
+        stats.chunks_received += 1
+        stats.bytes_received += i_bufsize
 
-        if msg_count % 10000 == 0:
+        if stats.chunks_received % 10000 == 0:
             _print(
-                f"client: {msg_count} chunks send and received ({rcv_len} bytes) for {s.getsockname()}->{s_addr}:{port}"
+                f"client: {stats.chunks_received} chunks send and received ({stats.bytes_received} bytes) for {s.getsockname()}->{s_addr}:{port}"
             )
         sleep_timeout("client", start_time, duration, sleep, done_msg=done_msg)
 
 
+class ZeroCopySender:
+    # Send with MSG_ZEROCOPY. The kernel pins the pages of the buffer instead
+    # of copying them, and reports completions on the socket's error queue.
+    # The payload is never modified, so we only need to reap completions to
+    # not exhaust the socket's option memory.
+
+    SO_ZEROCOPY = getattr(socket, "SO_ZEROCOPY", 60)
+    MSG_ZEROCOPY = getattr(socket, "MSG_ZEROCOPY", 0x4000000)
+
+    def __init__(self, s: socket.socket) -> None:
+        self.s = s
+        s.setsockopt(socket.SOL_SOCKET, self.SO_ZEROCOPY, 1)
+
+    def _reap(self) -> None:
+        while True:
+            try:
+                self.s.recvmsg(0, 4096, socket.MSG_ERRQUEUE | socket.MSG_DONTWAIT)
+            except (BlockingIOError, InterruptedError):
+                return
+
+    def sendall(self, data: memoryview) -> None:
+        while data:
+            try:
+                n = self.s.send(data, self.MSG_ZEROCOPY)
+            except OSError as e:
+                if e.errno != errno.ENOBUFS:
+                    raise
+                self._reap()
+                continue
+            data = data[n:]
+        self._reap()
+
+
+def run_client_throughput(
+    *,
+    s_addr: str = DEFAULT_ADDR,
+    port: int = DEFAULT_PORT,
+    bufsize: int = DEFAULT_BUFSIZE,
+    duration: float = DEFAULT_DURATION,
+    echo_ascii: bool = False,
+    use_sendfile: bool = False,
+    use_zerocopy: bool = False,
+) -> None:
+    # Send full chunks back to back, while a second thread receives and
+    # checks the echo. Unlike run_client(), this does not wait for the echo
+    # of a chunk before sending the next one.
+
+    start_time = global_start_time
+
+    s = _connect(s_addr, port, start_time, duration)
+    s.settimeout(None)
+    stats = ClientStats("throughput")
+    stats.connected()
+
+    payload = _create_payload(bufsize, echo_ascii)
+
+    sendfile: Optional[Any] = None
+    if use_sendfile:
+        sendfile = tempfile.TemporaryFile()
+        sendfile.write(payload)
+        sendfile.flush()
+
+    zerocopy: Optional[ZeroCopySender] = None
+    if use_zerocopy:
+        try:
+            zerocopy = ZeroCopySender(s)
+        except OSError as e:
+            _print(f"client: MSG_ZEROCOPY not supported ({e}). Use regular send")
+
+    rcv_error: list[str] = []
+
+    def _receive() -> None:
+        rcv_buf = memoryview(bytearray(bufsize))
+        offset = 0
+        while True:
+            try:
+                n = s.recv_into(rcv_buf[: bufsize - offset])
+            except OSError as e:
+                rcv_error.append(f"receive failed: {e}")
+                return
+            if not n:
+                return
+            if rcv_buf[:n] != payload[offset : offset + n]:
+                rcv_error.append(
+                    "unexpected response. Expect an echo of the data we sent"
+                )
+                return
+            stats.bytes_received += n
+            offset = (offset + n) % bufsize
+            if offset == 0:
+                stats.chunks_received += 1
+
+    receiver = threading.Thread(target=_receive, daemon=True)
+    receiver.start()
+
+    def done_msg() -> None:
+        _print(
+            f"client: {stats.chunks_sent} chunks send ({stats.bytes_sent} bytes) and {stats.bytes_received} bytes received in total, {stats.gbps(stats.bytes_received):.3f} Gbit/s"
+        )
+        stats.print_json()
+
+    end_time = start_time + duration
+    last_time = time.monotonic()
+    try:
+        while not rcv_error:
+            if sendfile is not None:
+                s.sendfile(sendfile, 0, bufsize)
+            elif zerocopy is not None:
+                zerocopy.sendall(payload)
+            else:
+                s.sendall(payload)
+            stats.chunks_sent += 1
+            stats.bytes_sent += bufsize
+            now_time = time.monotonic()
+            if duration > 0.0 and now_time >= end_time:
+                break
+            if now_time - last_time >= 1.0:
+                _print(
+                    f"client: {stats.bytes_sent} bytes send and {stats.bytes_received} bytes received, {stats.gbps(stats.bytes_received):.3f} Gbit/s"
+                )
+                last_time = now_time
+    except OSError as e:
+        rcv_error.append(f"send failed: {e}")
+
+    # Wait for the echo of what is still in flight.
+    try:
+        s.shutdown(socket.SHUT_WR)
+    except OSError:
+        pass
+    receiver.join(timeout=20)
+
+    done_msg()
+    if rcv_error:
+        _print(f"client: {rcv_error[0]}")
+        sys.exit(1)
+    if stats.bytes_received != stats.bytes_sent:
+        _print(
+            f"client: only {stats.bytes_received} of {stats.bytes_sent} bytes were echoed"
+        )
+        sys.exit(1)
+    _print("client: duration expired. Quit")
+
+
+def run_client_rr(
+    *,
+    s_addr: str = DEFAULT_ADDR,
+    port: int = DEFAULT_PORT,
+    sleep: float = DEFAULT_SLEEP,
+    msg_size: int = DEFAULT_MSG_SIZE,
+    duration: float = DEFAULT_DURATION,
+    echo_ascii: bool = False,
+) -> None:
+    # Request/response over TCP. Send one message of "msg_size" bytes and
+    # wait for its complete echo before sending the next one.
+
+    start_time = global_start_time
+
+    s = _connect(s_addr, port, start_time, duration)
+    s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    stats = ClientStats("rr")
+    hist = LatencyHistogram()
+    stats.hist = hist
+    stats.connected()
+
+    payload = _create_payload(msg_size, echo_ascii)
+    rcv_buf = memoryview(bytearray(msg_size))
+
+    def done_msg() -> None:
+        _print(
+            f"client: {stats.chunks_received} messages of {msg_size} bytes echoed ({stats.bytes_received} bytes) in total, {stats.gbps(stats.bytes_received):.3f} Gbit/s"
+        )
+        hist.print("client")
+        stats.print_json()
+
+    while True:
+        with socket_timeout("client", s, start_time, duration, done_msg=done_msg):
+            t0 = time.perf_counter_ns()
+            s.sendall(payload)
+            stats.chunks_sent += 1
+            stats.bytes_sent += msg_size
+            n_rcv = 0
+            while n_rcv < msg_size:
+                n = s.recv_into(rcv_buf[n_rcv:])
+                if not n:
+                    done_msg()
+                    _print("client: connection closed by the server")
+                    sys.exit(1)
+                n_rcv += n
+            t1 = time.perf_counter_ns()
+
+        if rcv_buf != payload:
+            _print("client: unexpected response. Expect an echo of the data we sent")
+            sys.exit(1)
+        hist.add(t1 - t0)
+        stats.chunks_received += 1
+        stats.bytes_received += msg_size
+
+        sleep_timeout("client", start_time, duration, sleep, done_msg=done_msg)
+
+
+def run_client_udp(
+    *,
+    s_addr: str = DEFAULT_ADDR,
+    port: int = DEFAULT_PORT,
+    sleep: float = DEFAULT_SLEEP,
+    msg_size: int = DEFAULT_MSG_SIZE,
+    duration: float = DEFAULT_DURATION,
+    echo_ascii: bool = False,
+) -> None:
+    # Request/response over UDP. Each datagram starts with a sequence
+    # number. A datagram whose echo does not arrive within UDP_TIMEOUT
+    # counts as lost, an echo that arrives after that as reordered.
+
+    start_time = global_start_time
+
+    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    s.connect((s_addr, port))
+    _print(f"client: sending UDP to {s_addr}:{port}")
+
+    payload = memoryview(bytearray(_create_payload(msg_size, echo_ascii)))
+    # One byte more than we send, to notice echos of the wrong size.
+    rcv_buf = memoryview(bytearray(msg_size + 1))
+    stats = ClientStats("udp")
+    hist = LatencyHistogram()
+    stats.hist = hist
+
+    seq = 0
+    lost: set[int] = set()
+    reordered = 0
+
+    def finish(exit_code: int = 0) -> None:
+        # Tell the server that we are done.
+        for _ in range(3):
+            try:
+                s.send(b"")
+            except OSError:
+                pass
+        stats.lost = len(lost)
+        stats.reordered = reordered
+        _print(
+            f"client: {stats.chunks_received} datagrams echoed, {stats.lost} lost, {reordered} reordered ({stats.bytes_received} bytes) in total, {stats.gbps(stats.bytes_received):.3f} Gbit/s"
+        )
+        hist.print("client")
+        stats.print_json()
+        _print("client: duration expired. Quit")
+        sys.exit(exit_code)
+
+    def remaining() -> Optional[float]:
+        if duration <= 0.0:
+            return None
+        t = (start_time + duration) - time.monotonic()
+        if t <= 0.0:
+            finish()
+        return t
+
+    while True:
+        UDP_SEQ.pack_into(payload, 0, seq)
+        t0 = time.perf_counter_ns()
+        try:
+            s.send(payload)
+        except ConnectionRefusedError:
+            pass
+        if stats.connected_time is not None:
+            stats.chunks_sent += 1
+            stats.bytes_sent += msg_size
+        deadline = time.monotonic() + UDP_TIMEOUT
+        while True:
+            t = remaining()
+            wait = deadline - time.monotonic()
+            if t is not None:
+                wait = min(wait, t)
+            if wait <= 0.0:
+                n = -1
+            else:
+                s.settimeout(wait)
+                try:
+                    n = s.recv_into(rcv_buf)
+                except socket.timeout:
+                    n = -1
+                except ConnectionRefusedError:
+                    # ICMP port unreachable. The server is not (yet) up.
+                    n = -2
+            t1 = time.perf_counter_ns()
+
+            if n < 0:
+                if stats.connected_time is None:
+                    # Until the first echo arrives, we wait for the server
+                    # and don't count losses.
+                    if n == -2:
+                        time.sleep(0.5)
+                else:
+                    remaining()
+                    lost.add(seq)
+                break
+            if n < UDP_SEQ.size:
+                continue
+            rcv_seq = UDP_SEQ.unpack_from(rcv_buf)[0]
+            if rcv_seq != seq:
+                # The late echo of an earlier datagram, that we already
+                # counted as lost. Or a duplicate.
+                if rcv_seq in lost:
+                    lost.remove(rcv_seq)
+                    reordered += 1
+                continue
+            if rcv_buf[:n] != payload:
+                _print(
+                    "client: unexpected response. Expect an echo of the data we sent"
+                )
+                finish(exit_code=1)
+            if stats.connected_time is None:
+                stats.connected()
+                stats.chunks_sent += 1
+                stats.bytes_sent += msg_size
+                _print(f"client: got first echo from {s_addr}:{port}")
+            hist.add(t1 - t0)
+            stats.chunks_received += 1
+            stats.bytes_received += msg_size
+            break
+
+        if stats.connected_time is not None:
+            seq += 1
+        sleep_timeout("client", start_time, duration, sleep, done_msg=finish)
+
+
 def run_exec(
     exec_url: str,
     exec_args: list[str],
@@ -312,7 +952,7 @@ def run_exec(
 
 
 def parse_args() -> argparse.Namespace:
-    parser = argparse.ArgumentParser(description="Simple TCP echo server/client")
+    parser = argparse.ArgumentParser(description="Simple TCP/UDP echo server/client")
     parser.add_argument(
         "-p",
         "--port",
@@ -336,8 +976,8 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument(
         "--sleep",
         type=float,
-        help="How many second to sleep between client send or server receive (default: {DEFAULT_SLEEP})",
-        default=DEFAULT_SLEEP,
+        help=f"How many second to sleep between client send or server receive (default: {DEFAULT_SLEEP} for the client, {DEFAULT_SERVER_SLEEP} for the server)",
+        default=None,
     )
     parser.add_argument(
         "--bufsize",
@@ -355,7 +995,7 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument(
         "--num-clients",
         type=int,
-        help=f"For the server, how many clients are accepted (server can only handle one client at a time) (default: {DEFAULT_NUM_CLIENTS})",
+        help=f"For the server, how many clients are accepted. They are served concurrently. 0 means unlimited (default: {DEFAULT_NUM_CLIENTS})",
         default=DEFAULT_NUM_CLIENTS,  # noqa: E225
     )
     parser.add_argument(
@@ -370,6 +1010,43 @@ def parse_args() -> argparse.Namespace:
         default=False,
         help="For the echo random data, only generate printable ASCII characters",
     )
+    parser.add_argument(
+        "--proto",
+        choices=["tcp", "udp"],
+        default=DEFAULT_PROTO,
+        help=f'The protocol. With "udp", the client sends one datagram of "--msg-size" bytes at a time and waits for its echo, counting lost and reordered datagrams (default: {DEFAULT_PROTO})',
+    )
+    parser.add_argument(
+        "--rr",
+        action="store_true",
+        help='For the TCP client, request/response mode. Send messages of "--msg-size" bytes and wait for each echo. The round trip latency is reported at exit',
+    )
+    parser.add_argument(
+        "--msg-size",
+        type=int,
+        help=f'The message size for "--rr" and "--proto udp". For UDP, at least 8 bytes for the sequence number (default: {DEFAULT_MSG_SIZE})',
+        default=DEFAULT_MSG_SIZE,
+    )
+    parser.add_argument(
+        "--throughput",
+        action="store_true",
+        help='For the client, send full chunks back to back and check the echo in parallel, to measure the throughput. Ignores "--sleep"',
+    )
+    parser.add_argument(
+        "--sendfile",
+        action="store_true",
+        help='With "--throughput", send the chunks with sendfile() from a temporary file',
+    )
+    parser.add_argument(
+        "--zerocopy",
+        action="store_true",
+        help='With "--throughput", send the chunks with MSG_ZEROCOPY',
+    )
+    parser.add_argument(
+        "--json",
+        action="store_true",
+        help="For the client, print the result as JSON on stdout at exit. The log messages go to stderr instead",
+    )
     parser.add_argument(
         "--exec",
         default=None,
@@ -410,11 +1087,31 @@ def parse_args() -> argparse.Namespace:
         help='If "--exec" is set, specify the command line argument passed to the script. Similar to "--exec-args", but this is a single command line argument used as-is. Can be specified multiple times and combined with "--exec-args", in which all case entries are concatenated.',
     )
 
-    return parser.parse_args()
+    args = parser.parse_args()
+
+    if args.sleep is None:
+        args.sleep = DEFAULT_SERVER_SLEEP if args.server else DEFAULT_SLEEP
+
+    if args.proto == "udp":
+        if not (UDP_SEQ.size <= args.msg_size <= UDP_MAX_SIZE):
+            parser.error(
+                f"--msg-size must be between {UDP_SEQ.size} and {UDP_MAX_SIZE} for UDP"
+            )
+        if args.throughput:
+            parser.error("--throughput is not supported for UDP")
+    elif args.msg_size < 1:
+        parser.error("--msg-size must be positive")
+    if args.rr and args.throughput:
+        parser.error("--rr and --throughput are mutually exclusive")
+
+    return args
 
 
 def main() -> None:
+    global json_output
+
     args = parse_args()
+    json_output = args.json and not args.server
     if args.exec:
         run_exec(
             exec_url=args.exec,
@@ -425,6 +1122,14 @@ def main() -> None:
             port=args.port,
             duration=args.duration,
         )
+    elif args.server and args.proto == "udp":
+        run_server_udp(
+            s_addr=args.addr,
+            port=args.port,
+            bufsize=max(args.bufsize, UDP_MAX_SIZE),
+            duration=args.duration,
+            num_clients=args.num_clients,
+        )
     elif args.server:
         run_server(
             s_addr=args.addr,
@@ -435,6 +1140,34 @@ def main() -> None:
             num_clients=args.num_clients,
             verbose=args.verbose,
         )
+    elif args.proto == "udp":
+        run_client_udp(
+            s_addr=args.addr,
+            port=args.port,
+            sleep=args.sleep,
+            msg_size=args.msg_size,
+            duration=args.duration,
+            echo_ascii=args.echo_ascii,
+        )
+    elif args.rr:
+        run_client_rr(
+            s_addr=args.addr,
+            port=args.port,
+            sleep=args.sleep,
+            msg_size=args.msg_size,
+            duration=args.duration,
+            echo_ascii=args.echo_ascii,
+        )
+    elif args.throughput:
+        run_client_throughput(
+            s_addr=args.addr,
+            port=args.port,
+            bufsize=args.bufsize,
+            duration=args.duration,
+            echo_ascii=args.echo_ascii,
+            use_sendfile=args.sendfile,
+            use_zerocopy=args.zerocopy,
+        )
     else:
         run_client(
             s_addr=args.addr,
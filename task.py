@@ -1,4 +1,6 @@
+import dataclasses
 import enum
+import hashlib
 import json
 import logging
 import os
@@ -6,6 +8,7 @@ import shlex
 import threading
 import time
 import typing
+import uuid
 import yaml
 import functools
 
@@ -20,14 +23,21 @@ from typing import TypeVar
 
 from ktoolbox import common
 from ktoolbox import host
-from ktoolbox import kjinja2
 from ktoolbox import netdev
 from ktoolbox.k8sClient import K8sClient
 
+import k8sApiClient
+import manifestRender
+import podReadiness
 import testConfig
 import tftbase
 
+from k8sApiClient import K8sApiClient
+from k8sApiClient import K8sApiError
+from manifestBatch import ManifestBatch
+from manifestRender import RenderedManifest
 from pluginbase import Plugin
+from podPool import PodPoolEntry
 from testSettings import TestSettings
 from tftbase import BaseOutput
 from tftbase import ClusterMode
@@ -246,6 +256,23 @@ class TaskOperation:
         return result
 
 
+class _LineSplitter:
+    def __init__(self, callback: Callable[[str], None]) -> None:
+        self._callback = callback
+        self._buf = b""
+
+    def feed(self, data: bytes) -> None:
+        self._buf += data
+        *lines, self._buf = self._buf.split(b"\n")
+        for line in lines:
+            self._callback(line.decode(errors="replace"))
+
+    def flush(self) -> None:
+        if self._buf:
+            buf, self._buf = self._buf, b""
+            self._callback(buf.decode(errors="replace"))
+
+
 class Task(ABC):
     def __init__(
         self,
@@ -258,6 +285,11 @@ class Task(ABC):
         self.task_role = task_role
         self.in_file_template = ""
         self.pod_name = ""
+        self._pod_manifest: Optional[RenderedManifest] = None
+        self._pod_manifest_hash = ""
+        self._pod_batched = False
+        self._manifests: list[RenderedManifest] = []
+        self._manifests_batch: Optional[ManifestBatch] = None
         self._setup_operation: Optional[TaskOperation] = None
         self._task_operation: Optional[TaskOperation] = None
         self._result: Optional[BaseOutput] = None
@@ -300,6 +332,13 @@ class Task(ABC):
     def get_duration(self) -> int:
         return self.ts.cfg_descr.get_tft().duration
 
+    def get_exec_timeout(self) -> float:
+        # How long an exec via the API waits for the server to send
+        # something. A command may run for the whole test without printing
+        # anything, so allow for as long as the task is waited for (see
+        # finish_task()), plus the time to start the command.
+        return self.get_duration() * 1.5 + 30
+
     @property
     def out_file_yaml(self) -> str:
         if not self.in_file_template or not self.pod_name:
@@ -384,11 +423,13 @@ class Task(ABC):
         return []
 
     def render_pod_file(self, log_info: str) -> None:
-        self.render_file(
+        manifest = self.render_file(
             log_info,
             self.in_file_template,
             self.out_file_yaml,
         )
+        self._pod_manifest = manifest
+        self._pod_manifest_hash = hashlib.sha256(manifest.rendered.encode()).hexdigest()
 
     def render_file(
         self,
@@ -396,28 +437,22 @@ class Task(ABC):
         in_file_template: str,
         out_file_yaml: str,
         template_args: Optional[dict[str, str | list[str]]] = None,
-    ) -> None:
+    ) -> RenderedManifest:
         if template_args is None:
             template_args = self.get_template_args()
         logger.info(
             f'Generate {log_info} "{out_file_yaml}" (from "{in_file_template}", for {self.log_name})'
         )
 
-        rendered = kjinja2.render_file(
+        manifest = manifestRender.render(
             in_file_template,
             template_args,
-            out_file=out_file_yaml,
+            out_file_yaml=out_file_yaml,
         )
 
-        try:
-            rendered_dict = yaml.safe_load(rendered)
-        except Exception as e:
-            logger.error(
-                f'"{in_file_template}" rendered as {repr(rendered)} is not valid YAML: {e}'
-            )
-            raise
-
-        logger.debug(f'"{in_file_template}" contains: {json.dumps(rendered_dict)}')
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f'"{in_file_template}" contains: {json.dumps(manifest.obj)}')
+        return manifest
 
     def initialize(self) -> None:
         pass
@@ -426,6 +461,10 @@ class Task(ABC):
     def client(self) -> K8sClient:
         return self.tc.client(tenant=self.tenant)
 
+    @property
+    def api_client(self) -> Optional[K8sApiClient]:
+        return self.tc.api_client(tenant=self.tenant)
+
     def _get_run_oc_namespace(
         self,
         namespace: Optional[str] | common._MISSING_TYPE = common.MISSING,
@@ -461,16 +500,55 @@ class Task(ABC):
         die_on_error: bool = False,
         pod_name: Optional[str] = None,
         namespace: Optional[str] | common._MISSING_TYPE = common.MISSING,
+        on_stdout_line: Optional[Callable[[str], None]] = None,
     ) -> host.Result:
+        # With "on_stdout_line", the lines of stdout are passed on while the
+        # command still runs. With the oc fallback, only once it completed.
         if pod_name is None:
             pod_name = self.pod_name
-        return self.client.oc_exec(
+        namespace = self._get_run_oc_namespace(namespace)
+
+        api_client = self.api_client
+        if api_client is not None:
+            argv = ["/bin/sh", "-c", cmd] if isinstance(cmd, str) else list(cmd)
+            splitter = _LineSplitter(on_stdout_line) if on_stdout_line else None
+            try:
+                r = api_client.exec(
+                    pod_name,
+                    argv,
+                    namespace=namespace,
+                    timeout=self.get_exec_timeout(),
+                    on_stdout=splitter.feed if splitter else None,
+                )
+            except (K8sApiError, OSError) as e:
+                # The command did not start. Retry with oc below.
+                logger.warning(f"exec in pod {pod_name} via API failed: {e}")
+            else:
+                if splitter is not None:
+                    splitter.flush()
+                res = host.Result(out=r.out, err=r.err, returncode=r.returncode)
+                if not res.success:
+                    if die_on_error:
+                        raise RuntimeError(
+                            f"exec {shlex.join(argv)} in pod {pod_name} failed: {res.debug_msg()}"
+                        )
+                    if not may_fail:
+                        logger.warning(
+                            f"exec {shlex.join(argv)} in pod {pod_name} failed: {res.debug_msg()}"
+                        )
+                return res
+
+        res = self.client.oc_exec(
             cmd,
             pod_name=pod_name,
             may_fail=may_fail,
             die_on_error=die_on_error,
-            namespace=self._get_run_oc_namespace(namespace),
+            namespace=namespace,
         )
+        if on_stdout_line is not None:
+            for line in res.out.splitlines():
+                on_stdout_line(line)
+        return res
 
     def run_oc_get(
         self,
@@ -480,15 +558,114 @@ class Task(ABC):
         die_on_error: bool = False,
         namespace: Optional[str] | common._MISSING_TYPE = common.MISSING,
     ) -> typing.Optional[dict[str, typing.Any]]:
+        namespace = self._get_run_oc_namespace(namespace)
+
+        api_client = self.api_client
+        resource, _, name = what.partition("/")
+        if api_client is not None and name and resource in k8sApiClient.RESOURCES:
+            try:
+                obj = api_client.get(resource, name, namespace=namespace)
+            except (K8sApiError, OSError) as e:
+                logger.warning(f"get {what} via API failed: {e}")
+            else:
+                if obj is not None or not die_on_error:
+                    return obj
+                # Not found. Let oc fail the proper way.
+
         return self.client.oc_get(
             what,
             may_fail=may_fail,
             die_on_error=die_on_error,
-            namespace=self._get_run_oc_namespace(namespace),
+            namespace=namespace,
+        )
+
+    def apply_manifest(self, manifest: RenderedManifest) -> Optional[dict[str, Any]]:
+        # Returns the applied object, as the API server returned it. With the
+        # oc fallback, we don't get the object and return None.
+        api_client = self.api_client
+        if api_client is not None:
+            try:
+                objs = [
+                    api_client.apply(d, namespace=self.get_namespace())
+                    for d in manifest.docs
+                ]
+            except (K8sApiError, OSError, ValueError) as e:
+                logger.warning(f"apply {manifest.out_file_yaml} via API failed: {e}")
+            else:
+                return objs[-1] if objs else None
+
+        self.run_oc(f"apply -f {manifest.dump()}", die_on_error=True)
+        return None
+
+    def wait_pod_ready(
+        self,
+        *,
+        timeout: float,
+        pod_name: Optional[str] = None,
+        uid: Optional[str] = None,
+    ) -> bool:
+        if pod_name is None:
+            pod_name = self.pod_name
+        waiter = self.tc.pod_readiness_waiter(
+            tenant=self.tenant,
+            namespace=self.get_namespace(),
+        )
+        if waiter is not None:
+            try:
+                pod = waiter.wait_ready(pod_name, timeout=timeout, uid=uid)
+            except podReadiness.PodReadinessWaiterDied:
+                pass
+            else:
+                return pod is not None
+
+        r = self.run_oc(
+            f"wait --for=condition=ready pod/{pod_name} --timeout={int(timeout)}s",
+            may_fail=True,
+        )
+        return r.success
+
+    def delete_pod(self, pod_name: str) -> None:
+        # Delete the pod and wait until it is gone, so that it can be created
+        # anew right away.
+        api_client = self.api_client
+        if api_client is not None:
+            namespace = self.get_namespace()
+            try:
+                if api_client.delete("pod", pod_name, namespace=namespace):
+                    end_time = time.monotonic() + 600
+                    while api_client.get("pod", pod_name, namespace=namespace):
+                        if time.monotonic() > end_time:
+                            raise RuntimeError(f"Pod {pod_name} did not go away")
+                        time.sleep(0.5)
+                return
+            except (K8sApiError, OSError) as e:
+                logger.warning(f"delete pod {pod_name} via API failed: {e}")
+
+        self.run_oc(f"delete pod {pod_name} --ignore-not-found")
+
+    def get_pod(self, *, may_fail: bool = False) -> Optional[dict[str, Any]]:
+        # Prefer the pod as last seen by the readiness watch. That saves a
+        # round trip for each pod.
+        waiter = self.tc.pod_readiness_waiter(
+            tenant=self.tenant,
+            namespace=self.get_namespace(),
+        )
+        if waiter is not None:
+            try:
+                pod = waiter.get_pod(self.pod_name)
+            except podReadiness.PodReadinessWaiterDied:
+                pass
+            else:
+                if may_fail or podReadiness.pod_is_ready(pod):
+                    return pod
+        return self.run_oc_get(
+            f"pod/{self.pod_name}",
+            may_fail=may_fail,
+            die_on_error=not may_fail,
         )
 
     def get_pod_ip(self) -> str:
-        y = self.run_oc_get(f"pod/{self.pod_name}", die_on_error=True)
+        y = self.get_pod()
         pod_ip = None
         try:
             if y:
@@ -512,104 +689,107 @@ class Task(ABC):
         return pod_ip
 
     def get_secondary_ip(self) -> str:
-        jsonpath = "{.metadata.annotations.k8s\\.ovn\\.org\\/pod-networks}"
-        r = self.run_oc(
-            f"get pod {self.pod_name} -o jsonpath='{jsonpath}'", die_on_error=True
-        )
+        pod = self.get_pod()
+        if pod is None:
+            raise RuntimeError(f"Failure to get pod {self.pod_name}")
 
-        y = yaml.safe_load(r.out)
+        y = yaml.safe_load(pod["metadata"]["annotations"]["k8s.ovn.org/pod-networks"])
         nad = self.ts.connection.effective_secondary_network_nad
         ip_address_with_cidr = typing.cast(str, y[nad]["ip_address"])
         ip_address = ip_address_with_cidr.split("/")[0] if ip_address_with_cidr else ""
         logger.info(f"Secondary IP: {ip_address}")
         return ip_address
 
-    def create_cluster_ip_service(self) -> str:
+    def render_cluster_ip_service(self) -> RenderedManifest:
+        # Services and multi-network-policies are named after the port. That
+        # way, instances that run at the same time don't overwrite each other's
+        # objects.
+        port = self._get_template_args_port()
         in_file_template = tftbase.get_manifest("svc-cluster-ip.yaml.j2")
-        out_file_yaml = tftbase.get_manifest_renderpath("svc-cluster-ip.yaml")
+        out_file_yaml = tftbase.get_manifest_renderpath(f"svc-cluster-ip-{port}.yaml")
 
-        self.render_file("Cluster IP Service", in_file_template, out_file_yaml)
-        self.run_oc(
-            f"apply -f {out_file_yaml}",
-            check_success=lambda r: r.success or "already exists" in r.err,
-            die_on_error=True,
-        )
-        return self.run_oc(
-            "get service tft-clusterip-service -o=jsonpath='{.spec.clusterIP}'",
-            die_on_error=True,
-        ).out
+        return self.render_file("Cluster IP Service", in_file_template, out_file_yaml)
 
-    def create_node_port_service(self, nodeport: int) -> str:
+    def render_node_port_service(self, nodeport: int) -> RenderedManifest:
+        port = self._get_template_args_port()
         in_file_template = tftbase.get_manifest("svc-node-port.yaml.j2")
-        out_file_yaml = tftbase.get_manifest_renderpath("svc-node-port.yaml")
+        out_file_yaml = tftbase.get_manifest_renderpath(f"svc-node-port-{port}.yaml")
 
         template_args = {
             **self.get_template_args(),
             "nodeport_svc_port": f"{nodeport}",
         }
 
-        self.render_file(
+        return self.render_file(
             "Node Port Service", in_file_template, out_file_yaml, template_args
         )
-        self.run_oc(
-            f"apply -f {out_file_yaml}",
-            check_success=lambda r: r.success or "already exists" in r.err,
-            die_on_error=True,
-        )
-        return self.run_oc(
-            "get service tft-nodeport-service -o=jsonpath='{.spec.clusterIP}'",
-            die_on_error=True,
-        ).out
 
-    def create_ingress_multi_network_policy(self, ingressPort: int) -> str:
+    def render_ingress_multi_network_policy(self, ingressPort: int) -> RenderedManifest:
         in_file_template = tftbase.get_manifest("allow-ingress-mnp.yaml.j2")
-        out_file_yaml = tftbase.get_manifest_renderpath("allow-ingress-mnp.yaml")
+        out_file_yaml = tftbase.get_manifest_renderpath(
+            f"allow-ingress-mnp-{ingressPort}.yaml"
+        )
 
         template_args = {
             **self.get_template_args(),
             "ingress_port": f"{ingressPort}",
         }
 
-        self.render_file(
+        return self.render_file(
             "Ingress Multi Network Policy",
             in_file_template,
             out_file_yaml,
             template_args,
         )
-        self.run_oc(
-            f"apply -f {out_file_yaml}",
-            check_success=lambda r: r.success or "already exists" in r.err,
-            die_on_error=True,
-        )
-        return self.run_oc(
-            "get multi-networkpolicies allow-ingress-mnp",
-            die_on_error=True,
-        ).out
 
-    def create_egress_multi_network_policy(self, egressPort: int) -> str:
+    def render_egress_multi_network_policy(self, egressPort: int) -> RenderedManifest:
         in_file_template = tftbase.get_manifest("allow-egress-mnp.yaml.j2")
-        out_file_yaml = tftbase.get_manifest_renderpath("allow-egress-mnp.yaml")
+        out_file_yaml = tftbase.get_manifest_renderpath(
+            f"allow-egress-mnp-{egressPort}.yaml"
+        )
 
         template_args = {
             **self.get_template_args(),
             "egress_port": f"{egressPort}",
         }
 
-        self.render_file(
+        return self.render_file(
             "Egress Multi Network Policy",
             in_file_template,
             out_file_yaml,
             template_args,
         )
-        self.run_oc(
-            f"apply -f {out_file_yaml}",
-            check_success=lambda r: r.success or "already exists" in r.err,
-            die_on_error=True,
-        )
-        return self.run_oc(
-            "get multi-networkpolicies allow-egress-mnp",
-            die_on_error=True,
-        ).out
+
+    def prepare_manifests(self, batch: ManifestBatch) -> None:
+        # Called after initialize(). Add the rendered manifests of the task
+        # to "batch", so that all objects of the test case get created in
+        # one go. setup_pod() then only waits for the pod.
+        for manifest in self._manifests:
+            batch.add(manifest, tenant=self.tenant, namespace=self.get_namespace())
+        self._manifests_batch = batch
+
+        if self._pod_manifest is None:
+            return
+        with self.ts.pod_pool.pod_lock(self.pod_name):
+            if self._pod_needs_create():
+                batch.add(
+                    self._pod_manifest,
+                    tenant=self.tenant,
+                    namespace=self.get_namespace(),
+                )
+                self._pod_batched = True
+
+    def get_applied_manifest(
+        self,
+        manifest: Optional[RenderedManifest],
+    ) -> dict[str, Any]:
+        if manifest is None:
+            raise RuntimeError("manifest was not rendered")
+        batch = self._manifests_batch
+        obj = batch.get_applied(manifest) if batch is not None else None
+        if obj is None:
+            raise RuntimeError(f"{manifest.out_file_yaml} was not applied")
+        return obj
 
     def start_setup(self) -> None:
         assert self._setup_operation is None
@@ -628,20 +808,88 @@ class Task(ABC):
         self._setup_operation = None
         to.finish(timeout=5)
 
-    def setup_pod(self) -> None:
+    def _pod_pool_entry(self) -> PodPoolEntry:
+        return PodPoolEntry(
+            pod_name=self.pod_name,
+            node_name=self.node_name,
+            manifest_hash=self._pod_manifest_hash,
+            port=self._get_template_args_port(),
+        )
+
+    def _pod_needs_create(self) -> bool:
+        # Must be called with the pod lock held. Returns False, if there is
+        # a warm pod in the pool that we can reuse. Otherwise, get rid of
+        # pods that are in the way.
+        pod_pool = self.ts.pod_pool
+        entry = self._pod_pool_entry()
+
+        for e in pod_pool.take_conflicting(entry):
+            logger.info(f"Deleting Pod {e.pod_name} which also uses port {e.port}.")
+            self.delete_pod(e.pod_name)
+
+        if pod_pool.lookup(self.pod_name) == entry:
+            return False
+
         # Check if pod already exists
-        v = self.run_oc_get(f"pod/{self.pod_name}", may_fail=True)
-        if v is None:
-            logger.info(f"Creating Pod {self.pod_name}.")
-            self.run_oc(f"apply -f {self.out_file_yaml}", die_on_error=True)
-        else:
-            logger.info(f"Pod {self.pod_name} already exists.")
+        if self.get_pod(may_fail=True) is not None:
+            # Either the pod is from an earlier test with a different
+            # manifest, or we don't know where it came from. Replace it.
+            logger.info(f"Pod {self.pod_name} already exists. Recreate it.")
+            self.delete_pod(self.pod_name)
+        pod_pool.remove(self.pod_name)
+        return True
 
-        logger.info(f"Waiting for Pod {self.pod_name} to become ready.")
-        self.run_oc(
-            f"wait --for=condition=ready pod/{self.pod_name} --timeout=10m",
-            die_on_error=True,
-        )
+    def setup_pod(self) -> None:
+        pod_pool = self.ts.pod_pool
+
+        with pod_pool.pod_lock(self.pod_name):
+            obj: Optional[dict[str, Any]]
+            if self._pod_batched:
+                self._pod_batched = False
+                logger.info(f"Created Pod {self.pod_name}.")
+                obj = self.get_applied_manifest(self._pod_manifest)
+            else:
+                if not self._pod_needs_create():
+                    logger.info(f"Reusing Pod {self.pod_name}.")
+                    # The pod might have been deleted from outside. Don't wait
+                    # for a pod that is gone.
+                    if self.get_pod(may_fail=True) is not None:
+                        if self.wait_pod_ready(timeout=600):
+                            return
+                    logger.info(f"Pod {self.pod_name} is gone. Recreate it.")
+                    pod_pool.remove(self.pod_name)
+
+                logger.info(f"Creating Pod {self.pod_name}.")
+                assert self._pod_manifest is not None
+                obj = self.apply_manifest(self._pod_manifest)
+
+            logger.info(f"Waiting for Pod {self.pod_name} to become ready.")
+            uid = obj["metadata"].get("uid") if obj else None
+            if not self.wait_pod_ready(timeout=600, uid=uid):
+                raise RuntimeError(f"Pod {self.pod_name} did not become ready")
+            pod_pool.add(dataclasses.replace(self._pod_pool_entry(), uid=uid or ""))
+
+    def pod_resources(self) -> frozenset[str]:
+        # What the pod of the task occupies while it exists: its name, and
+        # its port. The services select the server pod by port, so creating
+        # a pod for a port evicts the other pods of that port (see
+        # PodPool.take_conflicting()). This is known right after the task
+        # was created, initialize() is not necessary.
+        if not self.in_file_template or not self.pod_name:
+            return frozenset()
+        resources = {f"pod/{self.pod_name}"}
+        port = self._get_template_args_port()
+        if port:
+            resources.add(f"port/{port}")
+        return frozenset(resources)
+
+    def prewarm_pod(self) -> None:
+        # Create the pod ahead of time, so that the test case finds it in the
+        # pod pool later. The caller must make sure that the pod_resources()
+        # are not used by the test case that currently runs.
+        if self._pod_manifest is None:
+            return
+        self.setup_pod()
 
     def start_task(self) -> None:
         assert self._task_operation is None
@@ -715,6 +963,29 @@ class Task(ABC):
             vf_rep_for_pciaddr=vf_rep_for_pciaddr,
         )
 
+    def pod_get_pciaddr(self, *, pod_name: str, ifname: str) -> Optional[str]:
+        def _fetch() -> Optional[str]:
+            lst = self.pod_get_device_infos(pod_name=pod_name, ifname=ifname)
+            if not lst:
+                return None
+            dev_info = common.iter_get_first(lst, unique=True)
+            if dev_info is None:
+                return None
+            return dev_info.get("pciaddr")
+
+        # Only pods in the pod pool are cached. Without the UID (with the oc
+        # fallback), the pool forgets the cached values when the pod is
+        # removed from it.
+        entry = self.ts.pod_pool.lookup(pod_name)
+        if entry is None:
+            return _fetch()
+        return self.ts.pod_pool.vf_rep_cache.get_pciaddr(
+            pod_name,
+            entry.uid,
+            ifname,
+            _fetch,
+        )
+
     def pod_get_vf_rep(
         self,
         *,
@@ -722,15 +993,8 @@ class Task(ABC):
         ifname: str,
         host_pod_name: str,
     ) -> Optional[str]:
-
-        lst_1 = self.pod_get_device_infos(pod_name=pod_name, ifname=ifname)
-        pciaddr_1: Optional[str] = None
-        if lst_1:
-            dev_info_1 = common.iter_get_first(lst_1, unique=True)
-            if dev_info_1 is not None:
-                pciaddr_1 = dev_info_1.get("pciaddr")
-
-        if pciaddr_1 is None:
+        pciaddr = self.pod_get_pciaddr(pod_name=pod_name, ifname=ifname)
+        if pciaddr is None:
             return None
 
         if logger.isEnabledFor(logging.DEBUG):
@@ -742,16 +1006,40 @@ class Task(ABC):
                 pod_name=host_pod_name,
             )
 
-        lst_2 = self.pod_get_device_infos(
-            pod_name=host_pod_name,
-            vf_rep_for_pciaddr=pciaddr_1,
+        def _fetch() -> Optional[str]:
+            r = self.run_oc_exec(
+                "ktoolbox-netdev get_device_infos",
+                pod_name=host_pod_name,
+            )
+            return r.out if r.success else None
+
+        def _resolve(devices: str, pciaddr: str) -> Optional[str]:
+            lst = netdev.device_infos_parse_lst(devices, vf_rep_for_pciaddr=pciaddr)
+            if not lst:
+                return None
+            dev_info = common.iter_get_first(lst, unique=True)
+            if not dev_info:
+                return None
+            return dev_info.get("ifname")
+
+        # The device listing of the node is shared by all pods on the node.
+        # Resolve the representors of the other pods on the node (with a
+        # known PCI address) in the same go, so that their lookup needs no
+        # exec later.
+        host_entry = self.ts.pod_pool.lookup(host_pod_name)
+        if host_entry is None:
+            devices = _fetch()
+            return _resolve(devices, pciaddr) if devices is not None else None
+        return self.ts.pod_pool.vf_rep_cache.get_vf_rep(
+            host_entry.node_name,
+            pciaddr,
+            _fetch,
+            _resolve,
+            other_pciaddrs=self.ts.pod_pool.pciaddrs_on_node(
+                host_entry.node_name,
+                ifname,
+            ),
         )
-        if lst_2:
-            dev_info_2 = common.iter_get_first(lst_2, unique=True)
-            if dev_info_2:
-                return dev_info_2.get("ifname")
-
-        return None
 
 
 class ServerTask(Task, ABC):
@@ -766,7 +1054,7 @@ class ServerTask(Task, ABC):
         connection_mode = ts.connection_mode
         pod_type = ts.server_pod_type
         node_name_sanitized = self.node_name_sanitized
-        port = 5201 + self.index
+        port = 5201 + ts.port_offset + self.index
 
         if connection_mode == ConnectionMode.EXTERNAL_IP:
             in_file_template = ""
@@ -800,6 +1088,8 @@ class ServerTask(Task, ABC):
         self.connection_mode = ts.connection_mode
         self.in_file_template = in_file_template
         self.pod_name = pod_name
+        self._svc_cluster_ip: Optional[RenderedManifest] = None
+        self._svc_node_port: Optional[RenderedManifest] = None
 
     def _get_template_args_port(self) -> str:
         return str(self.port)
@@ -810,12 +1100,27 @@ class ServerTask(Task, ABC):
         if self.in_file_template != "":
             self.render_pod_file("Server Pod Yaml")
 
-            self.cluster_ip_addr = self.create_cluster_ip_service()
-            self.nodeport_ip_addr = self.create_node_port_service(self.port + 25000)
+            self._svc_cluster_ip = self.render_cluster_ip_service()
+            self._svc_node_port = self.render_node_port_service(self.port + 25000)
+            self._manifests.extend((self._svc_cluster_ip, self._svc_node_port))
 
         if self.connection_mode == ConnectionMode.MULTI_NETWORK:
-            self.create_ingress_multi_network_policy(self.port)
-            self.create_egress_multi_network_policy(self.port)
+            self._manifests.extend(
+                (
+                    self.render_ingress_multi_network_policy(self.port),
+                    self.render_egress_multi_network_policy(self.port),
+                )
+            )
+
+    @property
+    def cluster_ip_addr(self) -> str:
+        obj = self.get_applied_manifest(self._svc_cluster_ip)
+        return typing.cast(str, obj["spec"]["clusterIP"])
+
+    @property
+    def nodeport_ip_addr(self) -> str:
+        obj = self.get_applied_manifest(self._svc_node_port)
+        return typing.cast(str, obj["spec"]["clusterIP"])
 
     def _get_template_args_args(self) -> list[str]:
         if not self.exec_persistent:
@@ -825,22 +1130,13 @@ class ServerTask(Task, ABC):
     def confirm_server_alive(self) -> None:
         if self.connection_mode == ConnectionMode.EXTERNAL_IP:
             # Podman scenario
-            end_time = time.monotonic() + 60
-            while time.monotonic() < end_time:
-                r = self.lh.run(
-                    f"podman ps --filter status=running --filter name={self.pod_name} --format '{{{{.Names}}}}'"
-                )
-                if self.pod_name in r.out:
-                    break
-                time.sleep(5)
+            alive = podReadiness.podman_wait_running(self.pod_name, timeout=60)
         else:
             # Kubernetes/OpenShift scenario
-            r = self.run_oc(
-                f"wait --for=condition=ready pod/{self.pod_name} --timeout=1m"
-            )
-        if not r:
-            logger.error(f"Failed to start server {self.pod_name}: {r.err}")
-            raise RuntimeError(f"Failed to start server {self.pod_name}: {r.err}")
+            alive = self.wait_pod_ready(timeout=60)
+        if not alive:
+            logger.error(f"Failed to start server {self.pod_name}")
+            raise RuntimeError(f"Failed to start server {self.pod_name}")
 
         self.ts.event_server_alive.set()
 
@@ -958,6 +1254,58 @@ class ClientTask(Task, ABC):
         super().initialize()
         self.render_pod_file("Client Pod Yaml")
 
+    def _create_json_task_operation(
+        self,
+        cmd: str,
+        *,
+        parse: Callable[[str], dict[str, Any]],
+        get_bitrate: Callable[[dict[str, Any]], tftbase.Bitrate],
+        check_result: Optional[Callable[[dict[str, Any]], Optional[str]]] = None,
+    ) -> TaskOperation:
+        # For the tools that print their result as one JSON object on the
+        # last line (see tftbase.parse_json_last_line()). They print it also
+        # when they fail. parse() parses the output and check_result() can
+        # return why a parsed result is a failure.
+
+        def _thread_action() -> BaseOutput:
+            self.ts.clmo_barrier.wait()
+            r = self.run_oc_exec(cmd)
+            self.ts.event_client_finished.set()
+
+            success = True
+            msg: Optional[str] = None
+            result: dict[str, Any] = {}
+            bitrate_gbps = tftbase.Bitrate.NA
+
+            try:
+                result = parse(r.out)
+            except ValueError:
+                success = False
+                msg = f'Command "{cmd}" did not print a valid result: {r.debug_msg()}'
+            else:
+                bitrate_gbps = get_bitrate(result)
+                error = check_result(result) if check_result is not None else None
+                if error is not None:
+                    success = False
+                    msg = f'Command "{cmd}" {error}: {r.debug_msg()}'
+                elif not r.success:
+                    success = False
+                    msg = f'Command "{cmd}" failed: {r.debug_msg()}'
+
+            return tftbase.FlowTestOutput(
+                success=success,
+                msg=msg,
+                tft_metadata=self.ts.get_test_metadata(),
+                command=cmd,
+                result=result,
+                bitrate_gbps=bitrate_gbps,
+            )
+
+        return TaskOperation(
+            log_name=self.log_name,
+            thread_action=_thread_action,
+        )
+
     def get_target_ip(self) -> str:
         if self.connection_mode == ConnectionMode.CLUSTER_IP:
             logger.debug(
@@ -1001,15 +1349,69 @@ class ClientTask(Task, ABC):
         )
 
 
+def tools_pod_name(node_name_sanitized: str) -> str:
+    return f"tools-pod-{node_name_sanitized}"
+
+
+def sampler_loop_cmd(
+    sample_cmd: str,
+    *,
+    interval: float,
+    stop_file: str,
+    max_duration: int,
+) -> str:
+    # A shell loop that runs "sample_cmd" every "interval" seconds, until
+    # "stop_file" exists or "max_duration" seconds passed. There is always a
+    # sample at the start and one after the stop file appeared.
+    stop_file = shlex.quote(stop_file)
+    return (
+        f"end=$(( $(date +%s) + {max_duration} )) ; "
+        "while : ; do "
+        f"{sample_cmd} ; "
+        f'if [ -e {stop_file} ] || [ "$(date +%s)" -ge "$end" ] ; then break ; fi ; '
+        f"sleep {interval} ; "
+        "done ; "
+        f"rm -f {stop_file}"
+    )
+
+
 class PluginTask(Task, ABC):
     @property
     @abstractmethod
     def plugin(self) -> Plugin:
         pass
 
+    def use_tools_pod(self) -> None:
+        # All plugins run their commands in the same tools pod of the node.
+        # They render the same manifest for it. The manifest batch applies it
+        # only once and the pod pool keeps it for the rest of the test run.
+        self.pod_name = tools_pod_name(self.node_name_sanitized)
+        self.in_file_template = tftbase.get_manifest("tools-pod.yaml.j2")
+
     def get_plugin_metadata(self) -> tftbase.PluginMetadata:
         return tftbase.PluginMetadata(
             plugin_name=self.plugin.PLUGIN_NAME,
             node_name=self.node_name,
             pod_name=self.pod_name,
         )
+
+    def run_sampler(
+        self,
+        create_cmd: Callable[[str, int], str],
+    ) -> tuple[str, host.Result]:
+        # Run a sampler in the pod until the client finished. "create_cmd"
+        # gets the stop file and the maximum duration for the command (see
+        # sampler_loop_cmd()). The sampler stops on its own in case we fail
+        # to create the stop file. Returns the command and its result.
+        stop_file = f"/tmp/tft-{self.plugin.PLUGIN_NAME}-{uuid.uuid4().hex}"
+        cmd = create_cmd(stop_file, 2 * self.get_duration() + 60)
+
+        def _stop_sampler() -> None:
+            self.ts.event_client_finished.wait()
+            self.run_oc_exec(f"touch {shlex.quote(stop_file)}")
+
+        stopper = threading.Thread(target=_stop_sampler, daemon=True)
+        stopper.start()
+        r = self.run_oc_exec(cmd)
+        stopper.join()
+        return cmd, r
@@ -24,12 +24,15 @@ from ktoolbox.common import StructParseParseContext
 from ktoolbox.common import strict_dataclass
 from ktoolbox.k8sClient import K8sClient
 
+from k8sApiClient import K8sApiClient
 from pluginbase import Plugin
+from podReadiness import PodReadinessWaiter
 from testType import TestTypeHandler
 from tftbase import ClusterMode
 from tftbase import PodType
 from tftbase import TestCaseType
 from tftbase import TestType
+from tftbase import get_tft_k8s_api
 
 
 logger = common.ExtendedLogger("tft." + __name__)
@@ -173,7 +176,7 @@ class ConfNodeBase(_ConfBaseConnectionItem, abc.ABC):
 
     def _validate(self, test_type: TestType) -> None:
         if self.args is not None:
-            if test_type not in (TestType.SIMPLE,):
+            if test_type not in (TestType.SIMPLE, TestType.HTTP):
                 raise self.value_error(
                     f"not supported with test type {repr(test_type.name)}",
                     key="args",
@@ -242,6 +245,11 @@ class ConfConnection(StructParseBaseNamed):
     test_type: TestType
     test_type_handler: TestTypeHandler
     instances: int
+    instances_parallel: bool
+    parallel_streams: int
+    zerocopy: bool
+    cpu_affinity: Optional[str]
+    window_size: Optional[str]
     server: tuple[ConfNodeServer, ...]
     client: tuple[ConfNodeClient, ...]
     plugins: tuple[ConfPlugin, ...]
@@ -270,10 +278,15 @@ class ConfConnection(StructParseBaseNamed):
             extra, "secondary_network_nad", self.secondary_network_nad
         )
         common.dict_add_optional(extra, "resource_name", self.resource_name)
+        common.dict_add_optional(extra, "cpu_affinity", self.cpu_affinity)
+        common.dict_add_optional(extra, "window_size", self.window_size)
         return {
             **super().serialize(),
             "type": self.test_type.name,
             "instances": self.instances,
+            "instances_parallel": self.instances_parallel,
+            "parallel_streams": self.parallel_streams,
+            "zerocopy": self.zerocopy,
             "server": [s.serialize() for s in self.server],
             "client": [c.serialize() for c in self.client],
             "plugins": [p.serialize() for p in self.plugins],
@@ -322,6 +335,32 @@ class ConfConnection(StructParseBaseNamed):
                 check=lambda val: val > 0,
             )
 
+            instances_parallel = common.structparse_pop_bool(
+                varg.for_key("instances_parallel"),
+                default=False,
+            )
+
+            parallel_streams = common.structparse_pop_int(
+                varg.for_key("parallel_streams"),
+                default=1,
+                check=lambda val: val > 0,
+            )
+
+            zerocopy = common.structparse_pop_bool(
+                varg.for_key("zerocopy"),
+                default=False,
+            )
+
+            cpu_affinity = common.structparse_pop_str(
+                varg.for_key("cpu_affinity"),
+                default=None,
+            )
+
+            window_size = common.structparse_pop_str(
+                varg.for_key("window_size"),
+                default=None,
+            )
+
             server = common.structparse_pop_objlist(
                 varg.for_key("server"),
                 construct=ConfNodeServer.parse,
@@ -363,6 +402,19 @@ class ConfConnection(StructParseBaseNamed):
         for c in client:
             c._validate(test_type)
 
+        if test_type not in (TestType.IPERF_TCP, TestType.IPERF_UDP):
+            for key, is_set in (
+                ("parallel_streams", parallel_streams != 1),
+                ("zerocopy", zerocopy),
+                ("cpu_affinity", cpu_affinity is not None),
+                ("window_size", window_size is not None),
+            ):
+                if is_set:
+                    raise pctx.value_error(
+                        f"not supported with test type {repr(test_type.name)}",
+                        key=key,
+                    )
+
         return ConfConnection(
             yamlidx=pctx.yamlidx,
             yamlpath=pctx.yamlpath,
@@ -370,6 +422,11 @@ class ConfConnection(StructParseBaseNamed):
             test_type=test_type,
             test_type_handler=test_type_handler,
             instances=instances,
+            instances_parallel=instances_parallel,
+            parallel_streams=parallel_streams,
+            zerocopy=zerocopy,
+            cpu_affinity=cpu_affinity,
+            window_size=window_size,
             server=server,
             client=client,
             plugins=plugins,
@@ -386,6 +443,8 @@ class ConfTest(StructParseBaseNamed):
     test_cases: tuple[TestCaseType, ...]
     duration: int
     privileged_pod: bool
+    max_parallel_connections: int
+    prepare_lookahead: int
     connections: tuple[ConfConnection, ...]
     logs: pathlib.Path
 
@@ -404,6 +463,8 @@ class ConfTest(StructParseBaseNamed):
             "test_cases": [t.name for t in self.test_cases],
             "duration": self.duration,
             "privileged_pod": self.privileged_pod,
+            "max_parallel_connections": self.max_parallel_connections,
+            "prepare_lookahead": self.prepare_lookahead,
             "connections": [c.serialize() for c in self.connections],
             "logs": str(self.logs),
         }
@@ -458,6 +519,18 @@ class ConfTest(StructParseBaseNamed):
                 default=False,
             )
 
+            max_parallel_connections = common.structparse_pop_int(
+                varg.for_key("max_parallel_connections"),
+                default=1,
+                check=lambda val: val > 0,
+            )
+
+            prepare_lookahead = common.structparse_pop_int(
+                varg.for_key("prepare_lookahead"),
+                default=0,
+                check=lambda val: val >= 0,
+            )
+
             connections = common.structparse_pop_objlist(
                 varg.for_key("connections"),
                 construct=lambda pctx2: ConfConnection.parse(
@@ -481,6 +554,8 @@ class ConfTest(StructParseBaseNamed):
             test_cases=tuple(test_cases),
             duration=duration,
             privileged_pod=privileged_pod,
+            max_parallel_connections=max_parallel_connections,
+            prepare_lookahead=prepare_lookahead,
             connections=connections,
             logs=pathlib.Path(logs),
         )
@@ -590,6 +665,8 @@ class TestConfig:
     _kubeconfig_pair: Optional[tuple[str, Optional[str]]]
     _client_tenant: Optional[K8sClient]
     _client_infra: Optional[K8sClient]
+    _api_clients: dict[bool, Optional[K8sApiClient]]
+    _pod_readiness_waiters: dict[tuple[bool, str], PodReadinessWaiter]
     _lock: threading.Lock
     evaluator_config: Optional[str]
     output_base: Optional[str]
@@ -694,6 +771,8 @@ class TestConfig:
         self._lock = threading.Lock()
         self._client_tenant = None
         self._client_infra = None
+        self._api_clients = {}
+        self._pod_readiness_waiters = {}
 
         if not output_base:
             output_base = None
@@ -764,6 +843,51 @@ class TestConfig:
 
             return client
 
+    def api_client(self, *, tenant: bool) -> Optional[K8sApiClient]:
+        # The in-process API client, if enabled and if it supports the
+        # KUBECONFIG. Otherwise None, and the caller uses client() instead.
+        if not get_tft_k8s_api():
+            return None
+        with self._lock:
+            if tenant in self._api_clients:
+                return self._api_clients[tenant]
+            kubeconfig, kubeconfig_infra = self._get_kubeconfigs_with_lock()
+            if not tenant:
+                if kubeconfig_infra is None:
+                    raise RuntimeError("TestConfig has no infra client")
+                kubeconfig = kubeconfig_infra
+            api_client: Optional[K8sApiClient]
+            try:
+                api_client = K8sApiClient.from_kubeconfig(kubeconfig)
+            except Exception as e:
+                logger.warning(
+                    f"Cannot use the Kubernetes API directly with {repr(kubeconfig)}, use oc instead: {e}"
+                )
+                api_client = None
+            self._api_clients[tenant] = api_client
+            return api_client
+
+    def pod_readiness_waiter(
+        self,
+        *,
+        tenant: bool,
+        namespace: str,
+    ) -> Optional[PodReadinessWaiter]:
+        # One waiter (with one watch) per namespace. None, if we don't use
+        # the API client or the watch died.
+        api_client = self.api_client(tenant=tenant)
+        if api_client is None:
+            return None
+        with self._lock:
+            key = (tenant, namespace)
+            waiter = self._pod_readiness_waiters.get(key)
+            if waiter is None:
+                waiter = PodReadinessWaiter(api_client, namespace)
+                self._pod_readiness_waiters[key] = waiter
+        if waiter.dead:
+            return None
+        return waiter
+
     @property
     def client_tenant(self) -> K8sClient:
         return self.client(tenant=True)
@@ -7,6 +7,7 @@ from ktoolbox import common
 import testConfig
 import tftbase
 
+from podPool import PodPool
 from tftbase import PodInfo
 from tftbase import TestMetadata
 
@@ -19,6 +20,7 @@ class TestSettings:
     cfg_descr: testConfig.ConfigDescriptor
     instance_index: int
     reverse: bool
+    pod_pool: PodPool
 
     event_server_alive: threading.Event = dataclasses.field(
         init=False, default_factory=threading.Event
@@ -70,25 +72,30 @@ class TestSettings:
             b = getattr(self, "_clmo_barrier", None)
             if b is None:
                 raise RuntimeError(
-                    "Cannot access the client-monitor barrier before calling initialize_clmo_barrier()"
+                    "Cannot access the client-monitor barrier before calling initialize_clmo_barrier() or attach_clmo_barrier()"
                 )
             return typing.cast(threading.Barrier, b)
 
     def initialize_clmo_barrier(self, parties: int) -> None:
+        self.attach_clmo_barrier(threading.Barrier(parties=parties))
+
+    def attach_clmo_barrier(self, barrier: threading.Barrier) -> None:
+        # Instances that run in parallel share one barrier, so that all their
+        # clients and monitors get released together.
         with self._lock:
             if hasattr(self, "_clmo_barrier"):
-                raise RuntimeError("initialize_clmo_barrier() can only be called once")
-
-            b = threading.Barrier(parties=parties)
+                raise RuntimeError(
+                    "initialize_clmo_barrier() or attach_clmo_barrier() can only be called once"
+                )
 
             # TestSettings is for the most part an immutable, frozen object.
             # Here we lie about it. We do initialize the _clmo_barrier only
-            # during initialize_clmo_barrier().
+            # during initialize_clmo_barrier() or attach_clmo_barrier().
             #
             # Note that clmo_barrier will raise an exception if called before
             # initializing it. So you will only ever see one instance of the
             # barrier that never changes. That almost counts as "immutable".
-            object.__setattr__(self, "_clmo_barrier", b)
+            object.__setattr__(self, "_clmo_barrier", barrier)
 
     @property
     def connection(self) -> testConfig.ConfConnection:
@@ -118,6 +125,16 @@ class TestSettings:
         # TODO: Add task indexing
         return self.instance_index
 
+    @property
+    def port_offset(self) -> int:
+        # Services, node ports and multi-network-policies are named after the
+        # port, and they are cluster wide. Also, the pods are kept around for
+        # reuse, but only one pod per port. Give each connection its own
+        # range of ports, so they can run in parallel and keep their pods.
+        tft = self.cfg_descr.get_tft()
+        connections_idx = self.cfg_descr.connections_idx
+        return sum(c.instances for c in tft.connections[:connections_idx])
+
     @property
     def server_pod_type(self) -> tftbase.PodType:
         return self.test_case_id.info.get_server_pod_type(self.node_server.pod_type)
@@ -1,9 +1,11 @@
-import time
+import shlex
 
+from collections.abc import Mapping
 from dataclasses import dataclass
+from typing import Any
+from typing import Optional
 
 from ktoolbox import common
-from ktoolbox import host
 
 import task
 import tftbase
@@ -13,11 +15,39 @@ from task import ServerTask
 from task import TaskOperation
 from testSettings import TestSettings
 from testType import TestTypeHandler
-from tftbase import BaseOutput
 from tftbase import FlowTestOutput
 from tftbase import TestType
 
 
+logger = common.ExtendedLogger("tft." + __name__)
+
+
+CMD_HTTP_LOAD = "http-load"
+
+
+def http_load_parse(out: str) -> dict[str, Any]:
+    return tftbase.parse_json_last_line(
+        out,
+        numeric_keys=("requests", "errors", "bytes_per_second", "requests_per_second"),
+    )
+
+
+def http_load_gbps(result: Mapping[str, Any]) -> tftbase.Bitrate:
+    # The client downloads the payloads, the bitrate is in the receive
+    # direction.
+    return tftbase.Bitrate(rx=float(result["bytes_per_second"]) * 8 / 1e9)
+
+
+def http_load_check(result: Mapping[str, Any]) -> Optional[str]:
+    # The load generator also prints its result when it fails (for example,
+    # because some requests failed).
+    if not result["requests"]:
+        return "completed no requests"
+    if result["errors"]:
+        return f"had {result['errors']} failed requests"
+    return None
+
+
 @dataclass(frozen=True)
 class TestTypeHandlerHttp(TestTypeHandler):
     def __init__(self) -> None:
@@ -35,12 +65,13 @@ TestTypeHandler.register_test_type(TestTypeHandlerHttp())
 class HttpServer(task.ServerTask):
     def cmd_line_args(self, *, for_template: bool = False) -> list[str]:
         return [
-            "python3",
-            "-m",
-            "http.server",
-            "-d",
-            "/etc/kubernetes-traffic-flow-tests",
+            CMD_HTTP_LOAD,
+            "--server",
+            "--addr",
+            "0.0.0.0",
+            "--port",
             f"{self.port}",
+            *(self.ts.cfg_descr.get_server().args or ()),
         ]
 
     def _create_setup_operation_get_cancel_action_cmd(self) -> str:
@@ -48,43 +79,33 @@ class HttpServer(task.ServerTask):
 
 
 class HttpClient(task.ClientTask):
+    def cmd_line_args(self) -> list[str]:
+        return [
+            CMD_HTTP_LOAD,
+            "--addr",
+            f"{self.get_target_ip()}",
+            "--port",
+            f"{self.port}",
+            "--duration",
+            f"{self.get_duration()}",
+            *(self.ts.cfg_descr.get_client().args or ()),
+        ]
+
     def _create_task_operation(self) -> TaskOperation:
-        server_ip = self.get_target_ip()
-        cmd = f"curl --fail -s http://{server_ip}:{self.port}/data"
-
-        def _thread_action() -> BaseOutput:
-            self.ts.clmo_barrier.wait()
-
-            def _check_success(r: host.Result) -> bool:
-                return r.success and r.match(
-                    out="kubernetes-traffic-flow-tests\n",
-                    err="",
-                )
-
-            sleep_time = 0.2
-            end_timestamp = time.monotonic() + self.get_duration() - sleep_time
-
-            while True:
-                r = self.run_oc_exec(cmd)
-                if not _check_success(r):
-                    break
-                if time.monotonic() >= end_timestamp:
-                    break
-                time.sleep(sleep_time)
-
-            self.ts.event_client_finished.set()
-
-            return FlowTestOutput(
-                success=_check_success(r),
-                tft_metadata=self.ts.get_test_metadata(),
-                command=cmd,
-                result={
-                    "result": common.dataclass_to_dict(r),
-                },
-                bitrate_gbps=tftbase.Bitrate.NA,
-            )
-
-        return TaskOperation(
-            log_name=self.log_name,
-            thread_action=_thread_action,
+        return self._create_json_task_operation(
+            shlex.join(self.cmd_line_args()),
+            parse=http_load_parse,
+            get_bitrate=http_load_gbps,
+            check_result=http_load_check,
         )
+
+    def _aggregate_output_log_success(
+        self,
+        result: tftbase.AggregatableOutput,
+    ) -> None:
+        assert isinstance(result, FlowTestOutput)
+        msg = f"\n  Requests: {result.result['requests_per_second']:.1f} per sec ({result.result['bytes_per_second'] / 1e6:.2f} MBytes/sec)"
+        latency = result.latency_us
+        if latency is not None:
+            msg += f"\n  Latency: {latency.log_str}"
+        logger.info(msg)
@@ -1,5 +1,8 @@
 import json
+import re
+import shlex
 import task
+import threading
 
 from collections.abc import Mapping
 from dataclasses import dataclass
@@ -28,9 +31,103 @@ IPERF_EXE = "iperf3"
 IPERF_UDP_OPT = "-u -b 25G"
 IPERF_REV_OPT = "-R"
 
+# iperf3 supports "--json-stream" since version 3.17.
+IPERF_JSON_STREAM_VERSION = (3, 17)
+
+_json_stream_supported_lock = threading.Lock()
+_json_stream_supported: dict[str, bool] = {}
+
+
+def _parse_json_stream(out: str) -> dict[str, Any]:
+    # "--json-stream" prints one event per line. Assemble them to the
+    # document that "--json" would print.
+    result: dict[str, Any] = {}
+    intervals: list[Any] = []
+    for line in out.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        ev = json.loads(line)
+        event = ev.get("event")
+        if event == "interval":
+            intervals.append(ev.get("data"))
+        elif event in ("start", "end", "error"):
+            result[event] = ev.get("data")
+    if intervals or "start" in result:
+        result["intervals"] = intervals
+    return result
+
+
+def parse_output(out: str) -> Any:
+    # Parse the output of either "--json" or "--json-stream".
+    try:
+        result = json.loads(out)
+    except json.JSONDecodeError:
+        return _parse_json_stream(out)
+    if isinstance(result, dict) and "event" in result:
+        return _parse_json_stream(out)
+    return result
+
+
+def interval_bitrates_gbps(data: Mapping[str, Any]) -> list[float]:
+    # The bitrate of each (non-omitted) interval, by default one per second.
+    lst: list[float] = []
+    for interval in data.get("intervals") or ():
+        s = interval.get("sum") or {}
+        if s.get("omitted"):
+            continue
+        lst.append(float(s["bits_per_second"]) / 1e9)
+    return lst
+
+
+def interval_stats(bitrates: list[float]) -> dict[str, float]:
+    if not bitrates:
+        return {}
+    return {
+        "min": min(bitrates),
+        "p50": tftbase.percentile(bitrates, 50),
+        "p99": tftbase.percentile(bitrates, 99),
+    }
+
+
+def stream_bitrates_gbps(data: Mapping[str, Any]) -> list[Bitrate]:
+    # The bitrate of each stream (with "-P"). "sum_sent"/"sum_received" are
+    # the aggregate of all of them.
+    lst: list[Bitrate] = []
+    for stream in data["end"].get("streams") or ():
+        if "udp" in stream:
+            gbps = float(stream["udp"]["bits_per_second"]) / 1e9
+            lst.append(Bitrate(tx=gbps, rx=gbps))
+        else:
+            lst.append(
+                Bitrate(
+                    tx=float(stream["sender"]["bits_per_second"]) / 1e9,
+                    rx=float(stream["receiver"]["bits_per_second"]) / 1e9,
+                )
+            )
+    return lst
+
+
+def _log_stream_bitrates(data: Mapping[str, Any]) -> None:
+    lst = data.get("stream_bitrate_gbps")
+    if lst and len(lst) > 1:
+        streams = " ".join(f"{b['rx']:.2f}" for b in lst)
+        logger.info(
+            f"  Streams: {len(lst)}, RX Gbits/sec: {streams}, Fairness: {data['stream_fairness']:.3f}"
+        )
+
+
+def _log_interval_stats(data: Mapping[str, Any]) -> None:
+    stats = data.get("interval_bitrate_stats")
+    if stats:
+        logger.info(
+            f"  Interval Bitrate: min={stats['min']:.2f} p50={stats['p50']:.2f} p99={stats['p99']:.2f} Gbits/sec"
+        )
+
 
 class ResultTcp:
     def __init__(self, data: Mapping[str, Any]):
+        self.data = data
         sum_sent: Mapping[str, Any] = data["end"]["sum_sent"]
         sum_received: Mapping[str, Any] = data["end"]["sum_received"]
 
@@ -54,10 +151,13 @@ class ResultTcp:
             f"  [REC]   0.00-{self.sum_received_seconds:.2f} sec   {self.transfer_received:.2f} GBytes  {self.bitrate_received:.2f} Gbits/sec receiver\n"
             f"  MSS = {self.mss}"
         )
+        _log_stream_bitrates(self.data)
+        _log_interval_stats(self.data)
 
 
 class ResultUdp:
     def __init__(self, data: Mapping[str, Any]):
+        self.data = data
         sum_data: Mapping[str, Any] = data["end"]["sum"]
 
         self.total_gigabytes = float(sum_data["bytes"]) / (1024**3)
@@ -79,6 +179,8 @@ class ResultUdp:
             f"  Total Lost Packets: {self.total_lost_packets}\n"
             f"  Total Lost Percent: {self.total_lost_percent:.2f}%"
         )
+        _log_stream_bitrates(self.data)
+        _log_interval_stats(self.data)
 
 
 def _calculate_gbps(test_type: TestType, result: Mapping[str, Any]) -> Bitrate:
@@ -127,19 +229,60 @@ class IperfServer(task.ServerTask):
 
 
 class IperfClient(task.ClientTask):
+    def _json_stream_supported(self) -> bool:
+        # All pods run the same image. Only ask the first one.
+        image = tftbase.get_tft_test_image()
+        with _json_stream_supported_lock:
+            supported = _json_stream_supported.get(image)
+            if supported is None:
+                r = self.run_oc_exec(f"{IPERF_EXE} --version", may_fail=True)
+                m = re.search(r"iperf (\d+)\.(\d+)", r.out)
+                version = (int(m.group(1)), int(m.group(2))) if m else (0, 0)
+                supported = version >= IPERF_JSON_STREAM_VERSION
+                logger.info(
+                    f"{IPERF_EXE} {'supports' if supported else 'does not support'} --json-stream ({r.out.strip()!r})"
+                )
+                _json_stream_supported[image] = supported
+            return supported
+
+    def _log_interval(self, line: str) -> None:
+        # Show the progress while iperf still runs.
+        try:
+            ev = json.loads(line)
+            if ev.get("event") != "interval":
+                return
+            s = ev["data"]["sum"]
+            logger.info(
+                f"{self.pod_name}: {float(s['start']):.1f}-{float(s['end']):.1f} sec {float(s['bits_per_second']) / 1e9:.2f} Gbits/sec"
+            )
+        except Exception:
+            pass
+
     def _create_task_operation(self) -> TaskOperation:
         server_ip = self.get_target_ip()
-        cmd = (
-            f"{IPERF_EXE} -c {server_ip} -p {self.port} --json -t {self.get_duration()}"
-        )
+        json_stream = self._json_stream_supported()
+        json_opt = "--json-stream" if json_stream else "--json"
+        cmd = f"{IPERF_EXE} -c {server_ip} -p {self.port} {json_opt} -t {self.get_duration()}"
         if self.test_type == TestType.IPERF_UDP:
             cmd += f" {IPERF_UDP_OPT}"
         if self.reverse:
             cmd += f" {IPERF_REV_OPT}"
+        connection = self.ts.connection
+        if connection.parallel_streams > 1:
+            cmd += f" -P {connection.parallel_streams}"
+        if connection.zerocopy:
+            cmd += " -Z"
+        if connection.cpu_affinity is not None:
+            cmd += f" -A {shlex.quote(connection.cpu_affinity)}"
+        if connection.window_size is not None:
+            cmd += f" -w {shlex.quote(connection.window_size)}"
 
         def _thread_action() -> BaseOutput:
             self.ts.clmo_barrier.wait()
-            r = self.run_oc_exec(cmd)
+            r = self.run_oc_exec(
+                cmd,
+                on_stdout_line=self._log_interval if json_stream else None,
+            )
             self.ts.event_client_finished.set()
 
             success = True
@@ -152,7 +295,7 @@ class IperfClient(task.ClientTask):
 
             if success:
                 try:
-                    result = json.loads(r.out)
+                    result = parse_output(r.out)
                 except Exception:
                     success = False
                     msg = f'Output of "{cmd}" is not valid JSON: {r.debug_msg()}'
@@ -177,6 +320,27 @@ class IperfClient(task.ClientTask):
                     success = False
                     msg = f'Output of "{cmd}" does not contain expected data: {r.debug_msg()}'
 
+            if success:
+                try:
+                    bitrates = interval_bitrates_gbps(result)
+                except Exception:
+                    bitrates = []
+                if bitrates:
+                    result["interval_bitrate_gbps"] = bitrates
+                    result["interval_bitrate_stats"] = interval_stats(bitrates)
+
+                try:
+                    streams = stream_bitrates_gbps(result)
+                except Exception:
+                    streams = []
+                if streams:
+                    result["stream_bitrate_gbps"] = [
+                        {"tx": b.tx, "rx": b.rx} for b in streams
+                    ]
+                    result["stream_fairness"] = tftbase.jain_fairness(
+                        [b.rx for b in streams if b.rx is not None]
+                    )
+
             return FlowTestOutput(
                 success=success,
                 msg=msg,
@@ -1,7 +1,12 @@
+import dataclasses
+
+from collections.abc import Mapping
 from dataclasses import dataclass
 from typing import Any
 from typing import Optional
 
+from ktoolbox import common
+
 import task
 import tftbase
 
@@ -12,55 +17,146 @@ from testSettings import TestSettings
 from testType import TestTypeHandler
 from tftbase import BaseOutput
 from tftbase import FlowTestOutput
+from tftbase import Latency
 from tftbase import TestType
 
 
+logger = common.ExtendedLogger("tft." + __name__)
+
+
 NETPERF_SERVER_EXE = "netserver"
 NETPERF_CLIENT_EXE = "netperf"
 
+# The omni output selectors, printed as "KEY=value" lines with "-k". CPU
+# utilization and service demand come from "-c -C" and are measured by
+# netperf/netserver themselves.
+NETPERF_SELECTORS = (
+    "THROUGHPUT",
+    "THROUGHPUT_UNITS",
+    "ELAPSED_TIME",
+    "LOCAL_CPU_UTIL",
+    "REMOTE_CPU_UTIL",
+    "LOCAL_SD",
+    "REMOTE_SD",
+    "SD_UNITS",
+    "LOCAL_TRANSPORT_RETRANS",
+    "REMOTE_TRANSPORT_RETRANS",
+)
 
-def netperf_parse(testname: Any, data: str) -> dict[str, float]:
+NETPERF_STREAM_SELECTORS = (
+    *NETPERF_SELECTORS,
+    "LOCAL_SEND_SIZE",
+    "LOCAL_SEND_CALLS",
+)
 
-    # Let's accept both the testname as string and as TestType enum.
-    s_testname = str(testname)
-    if s_testname.startswith("TestType."):
-        s_testname = s_testname[len("TestType.") :]
-    if s_testname.startswith("NETPERF_"):
-        s_testname = s_testname[len("NETPERF_") :]
+# For the request/response tests, the latencies are in microseconds and the
+# throughput is in transactions per second. netperf only measures the
+# latencies with the global "-j" option. Otherwise, it reports them as -1.
+NETPERF_LATENCY_SELECTORS = (
+    "MIN_LATENCY",
+    "P50_LATENCY",
+    "P90_LATENCY",
+    "P99_LATENCY",
+    "MAX_LATENCY",
+    "STDDEV_LATENCY",
+)
+
+NETPERF_RR_SELECTORS = (
+    *NETPERF_SELECTORS,
+    "REQUEST_SIZE",
+    "RESPONSE_SIZE",
+    *NETPERF_LATENCY_SELECTORS,
+)
+
+_THROUGHPUT_UNITS_GBPS = {
+    "10^9bits/s": 1.0,
+    "10^6bits/s": 1e-3,
+    "10^3bits/s": 1e-6,
+}
+
+
+def _netperf_test_name(test_type: TestType) -> str:
+    return test_type.name[len("NETPERF_") :]
+
+
+def netperf_selectors(test_type: TestType) -> tuple[str, ...]:
+    if test_type == TestType.NETPERF_TCP_STREAM:
+        return NETPERF_STREAM_SELECTORS
+    return NETPERF_RR_SELECTORS
 
-    if s_testname == "TCP_RR":
-        headers = [
-            "Socket Send Bytes",
-            "Size Receive Bytes",
-            "Request Size Bytes",
-            "Response Size Bytes",
-            "Elapsed Time Seconds",
-            "Transaction Rate Per Second",
-        ]
-    elif s_testname == "TCP_STREAM":
-        headers = [
-            "Receive Socket Size Bytes",
-            "Send Socket Size Bytes",
-            "Send Message Size Bytes",
-            "Elapsed Time Seconds",
-            "Throughput 10^6bits/sec",
-        ]
-    else:
-        raise TypeError(f'invalid testname "{testname}"')
 
-    lines = data.split("\n")
+def netperf_options(test_type: TestType) -> str:
+    # "-j" costs extra timing of each transaction. Only the request/response
+    # tests report the latency, so only they ask for it.
+    if test_type == TestType.NETPERF_TCP_STREAM:
+        return "-c -C -P 0"
+    return "-c -C -P 0 -j"
 
-    values: Optional[list[float]] = None
-    if len(lines) >= 7:
-        slist = [s.strip() for s in lines[6].split()]
+
+def netperf_parse(
+    data: str,
+    *,
+    required: tuple[str, ...] = ("THROUGHPUT",),
+) -> dict[str, Any]:
+    # Parse the "KEY=value" lines of "-k" output. Numeric values become
+    # floats, others (like units) are kept as strings. Unknown or missing
+    # keys don't matter, except for the "required" ones.
+    result: dict[str, Any] = {}
+    for line in data.splitlines():
+        key, sep, value = line.partition("=")
+        key = key.strip()
+        if not sep or not key:
+            continue
+        value = value.strip()
         try:
-            values = [float(s) for s in slist]
+            result[key] = float(value)
         except ValueError:
-            pass
-    if not values or len(values) != len(headers):
-        raise ValueError("Cannot parse netperf output for tcp-stream: {repr(data)}")
+            result[key] = value
+    for key in required:
+        if not isinstance(result.get(key), float):
+            raise ValueError(
+                f"Cannot parse netperf output (missing {key}): {repr(data)}"
+            )
+    return result
+
+
+def netperf_gbps(parsed_data: Mapping[str, Any]) -> float:
+    units = parsed_data.get("THROUGHPUT_UNITS")
+    factor = _THROUGHPUT_UNITS_GBPS.get(str(units))
+    if factor is None:
+        raise ValueError(f"Unexpected netperf throughput units {repr(units)}")
+    return float(parsed_data["THROUGHPUT"]) * factor
+
+
+def netperf_latency(parsed_data: Mapping[str, Any]) -> Latency:
+    # A negative latency is not a measurement, but means that netperf did
+    # not measure it.
+    values = {key: float(parsed_data[key]) for key in NETPERF_LATENCY_SELECTORS}
+    for key, v in values.items():
+        if v < 0:
+            raise ValueError(f"netperf did not measure the latency (no {key})")
+    return Latency(
+        min=values["MIN_LATENCY"],
+        p50=values["P50_LATENCY"],
+        p90=values["P90_LATENCY"],
+        p99=values["P99_LATENCY"],
+        max=values["MAX_LATENCY"],
+        stddev=values["STDDEV_LATENCY"],
+    )
 
-    return dict(zip(headers, values))
+
+def _format_cpu(parsed_data: Mapping[str, Any]) -> str:
+    def _get(key: str) -> Any:
+        v = parsed_data.get(key)
+        if isinstance(v, float) and v >= 0:
+            return f"{v:.2f}"
+        return "n/a"
+
+    return (
+        f"  CPU: local={_get('LOCAL_CPU_UTIL')}% remote={_get('REMOTE_CPU_UTIL')}%\n"
+        f"  Service Demand: local={_get('LOCAL_SD')} remote={_get('REMOTE_SD')} {parsed_data.get('SD_UNITS', '')}\n"
+        f"  Retransmissions: local={_get('LOCAL_TRANSPORT_RETRANS')} remote={_get('REMOTE_TRANSPORT_RETRANS')}"
+    )
 
 
 @dataclass(frozen=True)
@@ -73,6 +169,7 @@ class TestTypeHandlerNetPerf(TestTypeHandler):
 
 TestTypeHandler.register_test_type(TestTypeHandlerNetPerf(TestType.NETPERF_TCP_STREAM))
 TestTypeHandler.register_test_type(TestTypeHandlerNetPerf(TestType.NETPERF_TCP_RR))
+TestTypeHandler.register_test_type(TestTypeHandlerNetPerf(TestType.NETPERF_TCP_CRR))
 
 
 class NetPerfServer(task.ServerTask):
@@ -93,10 +190,12 @@ class NetPerfClient(task.ClientTask):
         assert not self.reverse
 
         server_ip = self.get_target_ip()
-        if self.test_type == TestType.NETPERF_TCP_STREAM:
-            cmd = f"{NETPERF_CLIENT_EXE} -H {server_ip} -p {self.port} -t TCP_STREAM -l {self.get_duration()}"
-        else:
-            cmd = f"{NETPERF_CLIENT_EXE} -H {server_ip} -p {self.port} -t TCP_RR -l {self.get_duration()}"
+        is_rr = self.test_type != TestType.NETPERF_TCP_STREAM
+        selectors = netperf_selectors(self.test_type)
+        cmd = (
+            f"{NETPERF_CLIENT_EXE} -H {server_ip} -p {self.port} -t {_netperf_test_name(self.test_type)} -l {self.get_duration()}"
+            f" {netperf_options(self.test_type)} -- -k {','.join(selectors)}"
+        )
 
         def _thread_action() -> BaseOutput:
             self.ts.clmo_barrier.wait()
@@ -104,36 +203,45 @@ class NetPerfClient(task.ClientTask):
             self.ts.event_client_finished.set()
 
             success_result = False
-            parsed_data: dict[str, float] = {}
+            msg: Optional[str] = None
+            parsed_data: dict[str, Any] = {}
             bitrate_gbps = tftbase.Bitrate.NA
 
-            if r.success:
-                data = r.out
+            if not r.success:
+                msg = f'Command "{cmd}" failed: {r.debug_msg()}'
+            else:
                 try:
-                    parsed_data = netperf_parse(self.test_type, data)
+                    parsed_data = netperf_parse(r.out)
                 except ValueError:
-                    pass
+                    msg = (
+                        f'Command "{cmd}" did not print a valid result: {r.debug_msg()}'
+                    )
                 else:
                     success_result = True
 
             if success_result:
-                if self.test_type == TestType.NETPERF_TCP_STREAM:
+                if not is_rr:
                     try:
-                        x = float(parsed_data["Throughput 10^6bits/sec"])
-                    except Exception:
+                        x = netperf_gbps(parsed_data)
+                    except (ValueError, KeyError) as e:
                         success_result = False
+                        msg = f'Output of "{cmd}" has no throughput ({e}): {r.debug_msg()}'
                     else:
-                        bitrate_gbps = tftbase.Bitrate(tx=x / 1000.0)
+                        bitrate_gbps = tftbase.Bitrate(tx=x)
                 else:
+                    # A transaction rate is no bitrate. Request/response tests
+                    # are judged by their latency.
                     try:
-                        x = float(parsed_data["Transaction Rate Per Second"])
-                    except Exception:
+                        latency = netperf_latency(parsed_data)
+                    except (ValueError, KeyError) as e:
                         success_result = False
+                        msg = f'Output of "{cmd}" has no latency ({e}): {r.debug_msg()}'
                     else:
-                        bitrate_gbps = tftbase.Bitrate(tx=x / 1000.0)
+                        parsed_data["latency_us"] = dataclasses.asdict(latency)
 
             return FlowTestOutput(
                 success=success_result,
+                msg=msg,
                 tft_metadata=self.ts.get_test_metadata(),
                 command=cmd,
                 result=parsed_data,
@@ -144,3 +252,21 @@ class NetPerfClient(task.ClientTask):
             log_name=self.log_name,
             thread_action=_thread_action,
         )
+
+    def _aggregate_output_log_success(
+        self,
+        result: tftbase.AggregatableOutput,
+    ) -> None:
+        assert isinstance(result, FlowTestOutput)
+        latency = result.latency_us
+        if latency is None:
+            logger.info(
+                f"\n  Throughput: {result.bitrate_gbps.tx:.2f} Gbits/sec\n"
+                f"{_format_cpu(result.result)}"
+            )
+            return
+        logger.info(
+            f"\n  Transactions: {result.result['THROUGHPUT']:.2f} per sec\n"
+            f"  Latency: min={latency.min:.1f} p50={latency.p50:.1f} p90={latency.p90:.1f} p99={latency.p99:.1f} max={latency.max:.1f} stddev={latency.stddev:.1f} usec\n"
+            f"{_format_cpu(result.result)}"
+        )
@@ -1,6 +1,8 @@
 import shlex
 
+from collections.abc import Mapping
 from dataclasses import dataclass
+from typing import Any
 
 from ktoolbox import common
 
@@ -12,11 +14,13 @@ from task import ServerTask
 from task import TaskOperation
 from testSettings import TestSettings
 from testType import TestTypeHandler
-from tftbase import BaseOutput
 from tftbase import FlowTestOutput
 from tftbase import TestType
 
 
+logger = common.ExtendedLogger("tft." + __name__)
+
+
 @dataclass(frozen=True)
 class TestTypeHandlerSimple(TestTypeHandler):
     def __init__(self) -> None:
@@ -33,6 +37,25 @@ TestTypeHandler.register_test_type(TestTypeHandlerSimple())
 CMD_SIMPLE_TCP_SERVER_CLIENT = "simple-tcp-server-client"
 
 
+def simple_parse(out: str) -> dict[str, Any]:
+    return tftbase.parse_json_last_line(
+        out,
+        numeric_keys=("bytes_sent", "bytes_received", "duration", "tx_gbps", "rx_gbps"),
+    )
+
+
+def simple_gbps(result: Mapping[str, Any]) -> tftbase.Bitrate:
+    # Only "--throughput" sends back to back. The other modes pace the client
+    # with "--sleep" and random or small chunk sizes, so their bitrate says
+    # nothing about the datapath and is not evaluated.
+    if result.get("mode") != "throughput":
+        return tftbase.Bitrate.NA
+    return tftbase.Bitrate(
+        tx=float(result["tx_gbps"]),
+        rx=float(result["rx_gbps"]),
+    )
+
+
 class SimpleServer(task.ServerTask):
     def cmd_line_args(self, *, for_template: bool = False) -> list[str]:
         return [
@@ -59,28 +82,24 @@ class SimpleClient(task.ClientTask):
             f"{self.port}",
             "--duration",
             f"{self.get_duration()}",
+            "--json",
             *(self.ts.cfg_descr.get_client().args or ()),
         ]
 
     def _create_task_operation(self) -> TaskOperation:
-        cmd = shlex.join(self.cmd_line_args())
-
-        def _thread_action() -> BaseOutput:
-            self.ts.clmo_barrier.wait()
-            r = self.run_oc_exec(cmd)
-            self.ts.event_client_finished.set()
-
-            return FlowTestOutput(
-                success=r.success,
-                tft_metadata=self.ts.get_test_metadata(),
-                command=cmd,
-                result={
-                    "result": common.dataclass_to_dict(r),
-                },
-                bitrate_gbps=tftbase.Bitrate.NA,
-            )
-
-        return TaskOperation(
-            log_name=self.log_name,
-            thread_action=_thread_action,
+        return self._create_json_task_operation(
+            shlex.join(self.cmd_line_args()),
+            parse=simple_parse,
+            get_bitrate=simple_gbps,
         )
+
+    def _aggregate_output_log_success(
+        self,
+        result: tftbase.AggregatableOutput,
+    ) -> None:
+        assert isinstance(result, FlowTestOutput)
+        msg = f"\n  Echoed: {result.result['bytes_received']} bytes in {result.result['duration']:.1f} sec"
+        latency = result.latency_us
+        if latency is not None:
+            msg += f"\n  Latency: {latency.log_str}"
+        logger.info(msg)
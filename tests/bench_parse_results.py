@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+
+# Benchmark parsing result files, as generate_eval_config.py does for many
+# historical logs. The valid tests/input*.json fixtures are scaled up and
+# parsed with the generic common.dataclass_from_dict() and with the
+# specialized decoders of TftResults.parse() (with and without validation).
+#
+#   python3 tests/bench_parse_results.py [--scale N] [--repeat N]
+
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+
+from typing import Any
+from typing import Callable
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from ktoolbox import common  # noqa: E402
+
+import tftbase  # noqa: E402
+
+
+test_dir = os.path.dirname(os.path.abspath(__file__))
+
+
+def load_fixtures() -> list[Any]:
+    entries: list[Any] = []
+    for filename in sorted(glob.glob(os.path.join(test_dir, "input*.json"))):
+        with open(filename) as f:
+            data = json.load(f)
+        try:
+            tftbase.TftResults.parse(data)
+        except RuntimeError:
+            # Some fixtures are invalid on purpose.
+            continue
+        entries.extend(data[tftbase.TftResults.TFT_TESTS])
+    return entries
+
+
+def parse_generic(data: dict[str, Any]) -> list[tftbase.TftResult]:
+    return [
+        common.dataclass_from_dict(tftbase.TftResult, d)
+        for d in data[tftbase.TftResults.TFT_TESTS]
+    ]
+
+
+def bench(fcn: Callable[[], Any], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fcn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark parsing result files")
+    parser.add_argument(
+        "--scale",
+        type=int,
+        default=100,
+        help="How often to repeat the fixture entries (default: 100)",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=5,
+        help="Take the best of that many runs (default: 5)",
+    )
+    args = parser.parse_args()
+
+    entries = load_fixtures() * args.scale
+    data = {tftbase.TftResults.TFT_TESTS: entries}
+
+    expected = parse_generic(data)
+    assert list(tftbase.TftResults.parse(data)) == expected
+    assert list(tftbase.TftResults.parse(data, validate=False)) == expected
+
+    print(f"Parsing {len(entries)} results (best of {args.repeat})")
+    t_generic = bench(lambda: parse_generic(data), args.repeat)
+    for name, t in (
+        ("dataclass_from_dict", t_generic),
+        (
+            "decoder",
+            bench(lambda: tftbase.TftResults.parse(data), args.repeat),
+        ),
+        (
+            "decoder (validate=False)",
+            bench(lambda: tftbase.TftResults.parse(data, validate=False), args.repeat),
+        ),
+    ):
+        print(
+            f"  {name:<26} {t * 1000:9.1f} ms  {t / len(entries) * 1e6:7.1f} us/result  x{t_generic / t:.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+import os
+import sys
+import threading
+import time
+import yaml
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import connectionScheduler  # noqa: E402
+import testConfig  # noqa: E402
+import testSettings  # noqa: E402
+import trafficFlowTests  # noqa: E402
+
+from podPool import PodPool  # noqa: E402
+from tftbase import TestCaseType  # noqa: E402
+
+
+def _create_cfg_descr(test_case: TestCaseType) -> testConfig.ConfigDescriptor:
+    full_config = yaml.safe_load(
+        f"""
+tft:
+  - test_cases: {test_case.name}
+    max_parallel_connections: 4
+    connections:
+      - server:
+          - name: node1
+        client:
+          - name: node2
+      - server:
+          - name: node3
+        client:
+          - name: node4
+      - server:
+          - name: node2
+        client:
+          - name: node5
+"""
+    )
+    tc = testConfig.TestConfig(
+        full_config=full_config,
+        kubeconfigs=("/root/kubeconfig.x1", None),
+    )
+    return testConfig.ConfigDescriptor(tc, tft_idx=0, test_cases_idx=0)
+
+
+def _resources(test_case: TestCaseType) -> list[frozenset[str]]:
+    cfg_descr = _create_cfg_descr(test_case)
+    return [
+        connectionScheduler.connection_resources(c)
+        for c in cfg_descr.describe_all_connections()
+    ]
+
+
+def test_connection_resources() -> None:
+    resources = _resources(TestCaseType.POD_TO_POD_DIFF_NODE)
+    assert resources == [
+        frozenset(["node/node1", "node/node2"]),
+        frozenset(["node/node3", "node/node4"]),
+        frozenset(["node/node2", "node/node5"]),
+    ]
+    assert connectionScheduler.conflict_graph(resources) == [{2}, set(), {0}]
+
+    # On the same node, the server runs on the client node.
+    resources = _resources(TestCaseType.POD_TO_POD_SAME_NODE)
+    assert resources == [
+        frozenset(["node/node2"]),
+        frozenset(["node/node4"]),
+        frozenset(["node/node5"]),
+    ]
+    assert connectionScheduler.conflict_graph(resources) == [set(), set(), set()]
+
+    resources = _resources(TestCaseType.POD_TO_EXTERNAL)
+    assert all("external-perf-server" in r for r in resources)
+    assert connectionScheduler.conflict_graph(resources) == [{1, 2}, {0, 2}, {0, 1}]
+
+
+def test_port_offset() -> None:
+    cfg_descr = _create_cfg_descr(TestCaseType.POD_TO_POD_DIFF_NODE)
+    offsets = [
+        testSettings.TestSettings(
+            cfg_descr=c,
+            instance_index=0,
+            reverse=False,
+            pod_pool=PodPool(),
+        ).port_offset
+        for c in cfg_descr.describe_all_connections()
+    ]
+    assert offsets == [0, 1, 2]
+
+
+def test_run_scheduled() -> None:
+    lock = threading.Lock()
+    active: set[int] = set()
+    max_active = 0
+    conflicts: list[tuple[int, int]] = []
+
+    resources = [
+        frozenset(["a", "b"]),
+        frozenset(["c"]),
+        frozenset(["b"]),
+        frozenset(["d"]),
+        frozenset(["e"]),
+    ]
+    graph = connectionScheduler.conflict_graph(resources)
+
+    def _run(idx: int) -> str:
+        nonlocal max_active
+        with lock:
+            for other in active:
+                if other in graph[idx]:
+                    conflicts.append((idx, other))
+            active.add(idx)
+            max_active = max(max_active, len(active))
+        time.sleep(0.05)
+        with lock:
+            active.remove(idx)
+        return f"result-{idx}"
+
+    results = connectionScheduler.run_scheduled(
+        _run,
+        resources=resources,
+        max_parallel=3,
+    )
+    assert results == [f"result-{idx}" for idx in range(5)]
+    assert conflicts == []
+    assert max_active == 3
+
+    results = connectionScheduler.run_scheduled(
+        _run,
+        resources=resources,
+        max_parallel=1,
+    )
+    assert results == [f"result-{idx}" for idx in range(5)]
+
+
+def test_run_pipelined() -> None:
+    lock = threading.Lock()
+    events: list[str] = []
+    prepared: dict[int, frozenset[str]] = {}
+
+    resources = [
+        frozenset(["a"]),
+        frozenset(["b"]),
+        frozenset(["a"]),
+        frozenset(["c"]),
+    ]
+
+    def _run(idx: int) -> str:
+        with lock:
+            events.append(f"run-{idx}")
+        time.sleep(0.05)
+        return f"result-{idx}"
+
+    def _prepare(idx: int, busy: frozenset[str]) -> None:
+        with lock:
+            events.append(f"prepare-{idx}")
+            prepared[idx] = busy
+        if idx == 3:
+            raise RuntimeError("failure is only logged")
+
+    results = connectionScheduler.run_pipelined(
+        _run,
+        prepare=_prepare,
+        resources=resources,
+        lookahead=2,
+    )
+    assert results == [f"result-{idx}" for idx in range(4)]
+    # Each index is prepared once, and always before it runs. prepare() gets
+    # the resources of the index that runs meanwhile. Index 2 is prepared
+    # while index 0 runs, even if they share "a".
+    assert prepared == {
+        1: frozenset(["a"]),
+        2: frozenset(["a"]),
+        3: frozenset(["b"]),
+    }
+    for idx in (1, 2, 3):
+        assert events.index(f"prepare-{idx}") < events.index(f"run-{idx}")
+
+    events.clear()
+    results = connectionScheduler.run_pipelined(
+        _run,
+        prepare=_prepare,
+        resources=resources,
+        lookahead=0,
+    )
+    assert results == [f"result-{idx}" for idx in range(4)]
+    assert events == [f"run-{idx}" for idx in range(4)]
+
+
+def test_run_pipelined_test_cases() -> None:
+    # All test cases of a test run use the same connections, so they share
+    # the ports and the tools pods. Pods that differ are still prepared
+    # ahead.
+    full_config = yaml.safe_load(
+        """
+tft:
+  - test_cases:
+      - POD_TO_POD_DIFF_NODE
+      - POD_TO_HOST_DIFF_NODE
+      - HOST_TO_POD_DIFF_NODE
+    prepare_lookahead: 1
+    connections:
+      - server:
+          - name: node1
+        client:
+          - name: node2
+        plugins:
+          - measure_cpu
+"""
+    )
+    tc = testConfig.TestConfig(
+        full_config=full_config,
+        kubeconfigs=("/root/kubeconfig.x1", None),
+    )
+    cfg_descr = testConfig.ConfigDescriptor(tc, tft_idx=0)
+    cfg_descrs = list(cfg_descr.describe_all_test_cases())
+    pod_pool = PodPool()
+
+    resources = [trafficFlowTests.test_case_resources(c, pod_pool) for c in cfg_descrs]
+    assert resources[0] == frozenset(
+        [
+            "pod/normal-pod-node1-server-5201",
+            "pod/normal-pod-node2-client-5201",
+            "pod/tools-pod-node1",
+            "pod/tools-pod-node2",
+            "port/5201",
+        ]
+    )
+    assert all(resources[0] & r for r in resources)
+
+    events: list[str] = []
+    prewarmed: list[set[str]] = [set() for _ in cfg_descrs]
+
+    def _prepare(idx: int, busy: frozenset[str]) -> None:
+        events.append(f"prepare-{idx}")
+        for t in trafficFlowTests.create_test_case_tasks(cfg_descrs[idx], pod_pool):
+            if not t.pod_resources() & busy:
+                prewarmed[idx].add(t.pod_name)
+
+    def _run(idx: int) -> int:
+        events.append(f"run-{idx}")
+        return idx
+
+    results = connectionScheduler.run_pipelined(
+        _run,
+        prepare=_prepare,
+        resources=resources,
+        lookahead=cfg_descr.get_tft().prepare_lookahead,
+    )
+    assert results == [0, 1, 2]
+    assert sorted(events) == ["prepare-1", "prepare-2", "run-0", "run-1", "run-2"]
+    for idx in (1, 2):
+        assert events.index(f"prepare-{idx}") < events.index(f"run-{idx}")
+
+    # The server uses the same port as the running one, and the client of
+    # test case 1 is the same pod as in test case 0. The host client of test
+    # case 2 gets created ahead.
+    assert prewarmed == [set(), set(), {"host-pod-node2-client-5201"}]
@@ -14,6 +14,8 @@ from typing import Optional
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
+from ktoolbox import common  # noqa: E402
+
 import evalConfig  # noqa: E402
 import evaluator  # noqa: E402
 import testType  # noqa: E402
@@ -249,6 +251,113 @@ def test_output_list_parse(
         assert res.returncode in (0, 1)
 
 
+@pytest.mark.parametrize("test_input_file", TEST_CONFIG_FILES)
+def test_results_decoder(test_input_file: TestConfigFile) -> None:
+    filenames = [test_input_file.filename]
+    if test_input_file.expected_outputfile is not None:
+        filenames.append(_test_file(test_input_file.expected_outputfile))
+
+    for filename in filenames:
+        with open(filename) as f:
+            data = json.load(f)
+
+        if not test_input_file.is_valid:
+            for validate in (True, False):
+                with pytest.raises(RuntimeError):
+                    tftbase.TftResults.parse(data, validate=validate)
+            continue
+
+        expected = tuple(
+            common.dataclass_from_dict(tftbase.TftResult, d)
+            for d in data[tftbase.TftResults.TFT_TESTS]
+        )
+        assert tftbase.TftResults.parse(data).lst == expected
+        assert tftbase.TftResults.parse(data, validate=False).lst == expected
+
+        lazy = tftbase.TftResults.parse_from_file(filename, lazy=True)
+        assert not lazy.lst[0].flow_test.result.is_loaded  # type: ignore
+        assert lazy.lst == expected
+
+        data[tftbase.TftResults.TFT_TESTS][0]["flow_test"]["unknown"] = 1
+        with pytest.raises(RuntimeError):
+            tftbase.TftResults.parse(data)
+
+
+def test_results_decoder_fields() -> None:
+    with open(_test_file("input1.json")) as f:
+        data = json.load(f)
+    expected = tftbase.TftResults.parse(data)
+    flow_test = data[tftbase.TftResults.TFT_TESTS][0]["flow_test"]
+
+    # Files written before an optional field existed get its default.
+    for key in ("success", "msg", "eval_result"):
+        flow_test.pop(key, None)
+    for validate in (True, False):
+        results = tftbase.TftResults.parse(data, validate=validate)
+        assert results.lst[0].flow_test.success is True
+        assert results.lst[0].flow_test.msg is None
+        assert results.lst[0].flow_test.eval_result is None
+        assert results.lst[1:] == expected.lst[1:]
+
+    server = flow_test["tft_metadata"]["server"]
+    del server["name"]
+    for validate in (True, False):
+        with pytest.raises(
+            RuntimeError,
+            match=r"tft-tests\[0\]\.flow_test\.tft_metadata\.server\.name: missing key",
+        ):
+            tftbase.TftResults.parse(data, validate=validate)
+    server["name"] = "worker-1"
+
+    # Wrong types are reported with the path of the key.
+    server["index"] = "0"
+    with pytest.raises(
+        RuntimeError,
+        match=r"tft-tests\[0\]\.flow_test\.tft_metadata\.server: invalid PodInfo",
+    ):
+        tftbase.TftResults.parse(data)
+    server["index"] = 0
+
+    flow_test["bitrate_gbps"] = [1.0, 2.0]
+    for validate in (True, False):
+        with pytest.raises(
+            RuntimeError,
+            match=r"tft-tests\[0\]\.flow_test\.bitrate_gbps: Bitrate expects a dictionary",
+        ):
+            tftbase.TftResults.parse(data, validate=validate)
+
+
+def test_results_journal(tmp_path: pathlib.Path) -> None:
+    expected = tftbase.TftResults.parse_from_file(_test_file("input1.json"))
+    assert len(expected) >= 2
+
+    journal_file = tmp_path / "results.jsonl"
+    with tftbase.TftResultsWriter(journal_file) as writer:
+        for tft_result in expected:
+            writer.write(tft_result)
+
+    results = tftbase.TftResults.parse_from_file(journal_file)
+    assert results.lst == expected.lst
+    assert results.filename == str(journal_file)
+
+    outputfile = str(tmp_path / "outputfile.json")
+    _run_evaluator(str(journal_file), outputfile)
+    _assert_filecmp(outputfile, _test_file("input1-RESULTS"))
+
+    # A crash while writing the last line loses only that result.
+    with open(journal_file) as f:
+        lines = f.read().splitlines()
+    with open(journal_file, "w") as f:
+        f.write("\n".join(lines[:-1]) + "\n" + lines[-1][:20])
+    results = tftbase.TftResults.parse_from_file(journal_file)
+    assert results.lst == expected.lst[:-1]
+
+    with open(journal_file, "w") as f:
+        f.write(lines[0][:20] + "\n" + "\n".join(lines[1:]) + "\n")
+    with pytest.raises(RuntimeError):
+        tftbase.TftResults.parse_from_file(journal_file)
+
+
 def test_evaluator_1(tmp_path: pathlib.Path) -> None:
     def _assert_is_empty(evaluator: Evaluator) -> None:
         assert isinstance(evaluator, Evaluator)
@@ -356,3 +465,70 @@ def test_eval_config_yaml(tmp_path: pathlib.Path) -> None:
         tmp_file,
     )
     _assert_filecmp(tmp_file, EVAL_CONFIG_FILE)
+
+
+def test_evaluator_latency() -> None:
+    pod = tftbase.PodInfo(
+        name="pod", pod_type=tftbase.PodType.NORMAL, is_tenant=True, index=0
+    )
+    flow_test = tftbase.FlowTestOutput(
+        command="command",
+        result={
+            "latency_us": {
+                "min": 12.0,
+                "p50": 25.0,
+                "p90": 31.5,
+                "p99": 58.0,
+                "max": 1021.0,
+                "stddev": 9.25,
+            },
+        },
+        tft_metadata=tftbase.TestMetadata(
+            tft_idx=0,
+            test_cases_idx=0,
+            connections_idx=0,
+            reverse=False,
+            test_case_id=TestCaseType.POD_TO_POD_SAME_NODE,
+            test_type=TestType.NETPERF_TCP_RR,
+            server=pod,
+            client=pod,
+        ),
+        bitrate_gbps=tftbase.Bitrate.NA,
+    )
+    assert flow_test.latency_us is not None
+    assert flow_test.latency_us.p99 == 58.0
+
+    def _eval(threshold: float) -> tftbase.FlowTestOutput:
+        c = evalConfig.Config.parse(
+            {
+                "NETPERF_TCP_RR": [
+                    {
+                        "id": "POD_TO_POD_SAME_NODE",
+                        "Normal": {"latency_threshold_p99": threshold},
+                    },
+                ],
+            }
+        )
+        assert c == evalConfig.Config.parse(c.serialize())
+        return Evaluator(c).eval_flow_test_output(flow_test)
+
+    assert _eval(60).eval_success
+    assert _eval(50).eval_msg == (
+        "Run succeeded but p99 latency 58.0us is above threshold 50.0us"
+    )
+
+    # With a threshold, a missing or malformed latency fails the evaluation.
+    flow_test = dataclasses.replace(flow_test, result={})
+    assert flow_test.latency_us is None
+    assert _eval(60).eval_msg == (
+        "Run succeeded but p99 latency threshold 60.0us cannot be checked: no latency was recorded"
+    )
+
+    flow_test = dataclasses.replace(flow_test, result={"latency_us": {"p99": 58.0}})
+    with pytest.raises(ValueError):
+        flow_test.latency_us
+    msg = _eval(60).eval_msg
+    assert msg is not None
+    assert msg.startswith(
+        "Run succeeded but p99 latency threshold 60.0us cannot be checked: invalid latency_us"
+    )
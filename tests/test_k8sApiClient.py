@@ -0,0 +1,408 @@
+import base64
+import http.server
+import json
+import os
+import pathlib
+import pytest
+import shutil
+import ssl
+import struct
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+
+from collections.abc import Generator
+from typing import Any
+from typing import Optional
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import k8sApiClient  # noqa: E402
+
+from k8sApiClient import K8sApiClient  # noqa: E402
+from k8sApiClient import K8sApiError  # noqa: E402
+
+
+def _ws_frame(opcode: int, payload: bytes) -> bytes:
+    # Server frames are not masked.
+    n = len(payload)
+    if n < 126:
+        return struct.pack("!BB", 0x80 | opcode, n) + payload
+    if n < 65536:
+        return struct.pack("!BBH", 0x80 | opcode, 126, n) + payload
+    return struct.pack("!BBQ", 0x80 | opcode, 127, n) + payload
+
+
+class FakeApiServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self) -> None:
+        super().__init__(("127.0.0.1", 0), FakeApiHandler)
+        self.objects: dict[str, dict[str, Any]] = {}
+        self.num_connections = 0
+        self.sessions_reused: list[Optional[bool]] = []
+        self.scheme = "http"
+        self.lock = threading.Lock()
+        # Close the connection after each response, without telling the
+        # client (like an idle timeout of the server).
+        self.close_idle = False
+        self.patch_delay = 0.0
+        self.num_patches = 0
+
+    @property
+    def url(self) -> str:
+        return f"{self.scheme}://127.0.0.1:{self.server_address[1]}"
+
+
+class FakeApiHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: FakeApiServer
+
+    def setup(self) -> None:
+        super().setup()
+        with self.server.lock:
+            self.server.num_connections += 1
+            if isinstance(self.request, ssl.SSLSocket):
+                self.server.sessions_reused.append(self.request.session_reused)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def _send_json(self, status: int, obj: Any) -> None:
+        data = json.dumps(obj).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+        if self.server.close_idle:
+            self.close_connection = True
+
+    def _send_not_found(self) -> None:
+        self._send_json(
+            404,
+            {"kind": "Status", "status": "Failure", "message": "not found"},
+        )
+
+    def _parse(self) -> tuple[str, dict[str, list[str]]]:
+        url = urllib.parse.urlsplit(self.path)
+        return url.path, urllib.parse.parse_qs(url.query)
+
+    def _list(self, path: str, query: dict[str, list[str]]) -> list[str]:
+        selector = query.get("labelSelector", [""])[0]
+        return [
+            p
+            for p, obj in self.server.objects.items()
+            if p.startswith(path + "/")
+            and (not selector or selector in obj["metadata"].get("labels", {}))
+        ]
+
+    def do_GET(self) -> None:
+        path, query = self._parse()
+        if path.endswith("/exec"):
+            self._do_exec(query["command"])
+            return
+        with self.server.lock:
+            if path in self.server.objects:
+                self._send_json(200, self.server.objects[path])
+                return
+            paths = self._list(path, query)
+            if paths or path.endswith("s"):
+                items = [self.server.objects[p] for p in paths]
+                self._send_json(200, {"kind": "List", "items": items})
+                return
+        self._send_not_found()
+
+    def do_PATCH(self) -> None:
+        path, query = self._parse()
+        assert self.headers["Content-Type"] == "application/apply-patch+yaml"
+        assert query["fieldManager"] == ["tft"]
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        obj = json.loads(body)
+        with self.server.lock:
+            self.server.num_patches += 1
+        time.sleep(self.server.patch_delay)
+        if obj["kind"] == "Service":
+            obj.setdefault("spec", {})["clusterIP"] = "172.30.0.10"
+        with self.server.lock:
+            self.server.objects[path] = obj
+        self._send_json(200, obj)
+
+    def do_DELETE(self) -> None:
+        path, query = self._parse()
+        with self.server.lock:
+            if path in self.server.objects:
+                obj = self.server.objects.pop(path)
+                self._send_json(200, obj)
+                return
+            if path.endswith("s"):
+                for p in self._list(path, query):
+                    del self.server.objects[p]
+                self._send_json(200, {"kind": "List", "items": []})
+                return
+        self._send_not_found()
+
+    def _do_exec(self, command: list[str]) -> None:
+        assert self.headers["Upgrade"] == "websocket"
+        assert self.headers["Sec-WebSocket-Protocol"] == "v4.channel.k8s.io"
+        self.send_response(101)
+        self.send_header("Upgrade", "websocket")
+        self.send_header("Connection", "Upgrade")
+        self.send_header("Sec-WebSocket-Protocol", "v4.channel.k8s.io")
+        self.end_headers()
+
+        cmd = command[-1]
+        frames = [
+            _ws_frame(0x2, b"\x01"),
+            _ws_frame(0x9, b"ping"),
+            _ws_frame(0x2, b"\x01" + f"out: {cmd}\n".encode()),
+            _ws_frame(0x2, b"\x02" + b"err\n"),
+            _ws_frame(0x2, b"\x01" + b"x" * 70000),
+        ]
+        if cmd.startswith("exit "):
+            status = {
+                "status": "Failure",
+                "reason": "NonZeroExitCode",
+                "details": {"causes": [{"reason": "ExitCode", "message": cmd[5:]}]},
+            }
+        else:
+            status = {"status": "Success"}
+        frames.append(_ws_frame(0x2, b"\x03" + json.dumps(status).encode()))
+        frames.append(_ws_frame(0x8, struct.pack("!H", 1000)))
+        self.wfile.write(b"".join(frames))
+        self.wfile.flush()
+        self.close_connection = True
+
+
+@pytest.fixture
+def fake_api_server() -> Generator[FakeApiServer, None, None]:
+    server = FakeApiServer()
+    th = threading.Thread(target=server.serve_forever, daemon=True)
+    th.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def _write_kubeconfig(
+    tmp_path: pathlib.Path,
+    server: str,
+    ca_data: bytes = b"not-used-for-http",
+) -> str:
+    filename = str(tmp_path / "kubeconfig")
+    ca = base64.b64encode(ca_data).decode()
+    with open(filename, "w") as f:
+        f.write(
+            f"""
+apiVersion: v1
+kind: Config
+current-context: ctx
+contexts:
+  - name: ctx
+    context:
+      cluster: c1
+      user: u1
+clusters:
+  - name: c1
+    cluster:
+      server: {server}
+      certificate-authority-data: {ca}
+users:
+  - name: u1
+    user:
+      token: sha256~secret
+"""
+        )
+    return filename
+
+
+def test_kubeconfig(tmp_path: pathlib.Path) -> None:
+    filename = _write_kubeconfig(tmp_path, "https://api.example.com:6443")
+    config = k8sApiClient.ApiServerConfig.from_kubeconfig(filename)
+    assert config.server == "https://api.example.com:6443"
+    assert config.ca_data == b"not-used-for-http"
+    assert config.token == "sha256~secret"
+    assert config.client_cert_data is None
+
+    with open(filename, "a") as f:
+        f.write("      exec:\n        command: some-plugin\n")
+    with pytest.raises(ValueError, match="unsupported authentication"):
+        k8sApiClient.ApiServerConfig.from_kubeconfig(filename)
+
+
+def test_resource_path() -> None:
+    assert (
+        k8sApiClient.resource_path("pod", namespace="default", name="p1")
+        == "/api/v1/namespaces/default/pods/p1"
+    )
+    assert (
+        k8sApiClient.resource_path("multi-networkpolicies", namespace="ns")
+        == "/apis/k8s.cni.cncf.io/v1beta1/namespaces/ns/multi-networkpolicies"
+    )
+    with pytest.raises(ValueError):
+        k8sApiClient.resource_path("deployment", namespace="ns")
+
+
+def test_api_client(fake_api_server: FakeApiServer, tmp_path: pathlib.Path) -> None:
+    client = K8sApiClient.from_kubeconfig(
+        _write_kubeconfig(tmp_path, fake_api_server.url)
+    )
+
+    assert client.get("pod", "p1", namespace="default") is None
+
+    pod = {
+        "apiVersion": "v1",
+        "kind": "Pod",
+        "metadata": {"name": "p1", "labels": {"tft-tests": "0"}},
+    }
+    assert client.apply(pod, namespace="default") == pod
+    assert client.get("pod", "p1", namespace="default") == pod
+
+    svc = client.apply(
+        {
+            "apiVersion": "v1",
+            "kind": "Service",
+            "metadata": {"name": "s1", "namespace": "default"},
+        }
+    )
+    assert svc["spec"]["clusterIP"] == "172.30.0.10"
+
+    mnp = {
+        "apiVersion": "k8s.cni.cncf.io/v1beta1",
+        "kind": "MultiNetworkPolicy",
+        "metadata": {"name": "m1", "labels": {"tft-tests": "0"}},
+    }
+    client.apply(mnp, namespace="default")
+    assert (
+        "/apis/k8s.cni.cncf.io/v1beta1/namespaces/default/multi-networkpolicies/m1"
+        in fake_api_server.objects
+    )
+
+    pods = client.list_items("pods", namespace="default", label_selector="tft-tests")
+    assert pods == [pod]
+
+    # All requests so far went over the same keep-alive connection.
+    assert fake_api_server.num_connections == 1
+
+    svcs = [
+        {"apiVersion": "v1", "kind": "Service", "metadata": {"name": f"s{i}"}}
+        for i in range(2, 6)
+    ]
+    svcs_applied = client.apply_all(svcs, namespace="default")
+    assert [s["metadata"]["name"] for s in svcs_applied] == ["s2", "s3", "s4", "s5"]
+    assert all(s["spec"]["clusterIP"] for s in svcs_applied)
+    num_connections = fake_api_server.num_connections
+
+    # The concurrent requests of apply_all() left their connections in the
+    # pool.
+    client.get("pod", "p1", namespace="default")
+    assert fake_api_server.num_connections == num_connections
+
+    r = client.exec("p1", ["/bin/sh", "-c", "echo hi"], namespace="default")
+    assert r.success
+    assert r.out == "out: echo hi\n" + "x" * 70000
+    assert r.err == "err\n"
+
+    r = client.exec("p1", ["/bin/sh", "-c", "exit 3"], namespace="default")
+    assert not r.success
+    assert r.returncode == 3
+
+    assert client.delete("pod", "p1", namespace="default") is True
+    assert client.delete("pod", "p1", namespace="default") is False
+    client.delete_collection(
+        "multi-networkpolicies",
+        namespace="default",
+        label_selector="tft-tests",
+    )
+    assert client.list_items("multi-networkpolicies", namespace="default") == []
+
+    with pytest.raises(K8sApiError) as exc_info:
+        client.request("GET", "/api/v1/namespaces/default/pods/p1")
+    assert exc_info.value.status == 404
+
+    client.close()
+
+
+def test_api_client_retry(
+    fake_api_server: FakeApiServer,
+    tmp_path: pathlib.Path,
+) -> None:
+    config = k8sApiClient.ApiServerConfig.from_kubeconfig(
+        _write_kubeconfig(tmp_path, fake_api_server.url)
+    )
+    client = K8sApiClient(config, timeout=0.5)
+    pod = {"apiVersion": "v1", "kind": "Pod", "metadata": {"name": "p1"}}
+
+    # The server closed the idle connection. The client notices that before
+    # sending the request, and sends it once, with a new connection.
+    fake_api_server.close_idle = True
+    assert client.get("pod", "p1", namespace="default") is None
+    assert client.apply(pod, namespace="default") == pod
+    assert client.get("pod", "p1", namespace="default") == pod
+    assert fake_api_server.num_patches == 1
+    assert fake_api_server.num_connections == 3
+
+    # A request that timed out may still be in progress. It is not sent
+    # again.
+    fake_api_server.close_idle = False
+    assert client.get("pod", "p1", namespace="default") == pod
+    fake_api_server.patch_delay = 1.0
+    with pytest.raises(TimeoutError):
+        client.apply(pod, namespace="default")
+    assert fake_api_server.num_patches == 2
+
+    client.close()
+
+
+@pytest.mark.skipif(shutil.which("openssl") is None, reason="needs openssl")
+def test_exec_tls_session(
+    fake_api_server: FakeApiServer,
+    tmp_path: pathlib.Path,
+) -> None:
+    certfile = str(tmp_path / "server.crt")
+    keyfile = str(tmp_path / "server.key")
+    subprocess.run(
+        [
+            "openssl",
+            "req",
+            "-x509",
+            "-newkey",
+            "rsa:2048",
+            "-nodes",
+            "-days",
+            "1",
+            "-subj",
+            "/CN=127.0.0.1",
+            "-addext",
+            "subjectAltName=IP:127.0.0.1",
+            "-keyout",
+            keyfile,
+            "-out",
+            certfile,
+        ],
+        check=True,
+        capture_output=True,
+    )
+    ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    ctx.load_cert_chain(certfile, keyfile)
+    fake_api_server.socket = ctx.wrap_socket(fake_api_server.socket, server_side=True)
+    fake_api_server.scheme = "https"
+    with open(certfile, "rb") as f:
+        ca_data = f.read()
+
+    client = K8sApiClient.from_kubeconfig(
+        _write_kubeconfig(tmp_path, fake_api_server.url, ca_data)
+    )
+    for i in range(3):
+        r = client.exec("p1", ["/bin/sh", "-c", f"echo {i}"], namespace="default")
+        assert r.success
+        assert r.out.startswith(f"out: echo {i}\n")
+
+    # Each exec has its own connection, but only the first one does a full
+    # handshake.
+    assert fake_api_server.sessions_reused == [False, True, True]
+    client.close()
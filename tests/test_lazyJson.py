@@ -0,0 +1,117 @@
+import copy
+import json
+import os
+import pytest
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import lazyJson  # noqa: E402
+
+from lazyJson import LAZY  # noqa: E402
+from lazyJson import LazyDict  # noqa: E402
+
+
+SPEC = {
+    "tests": [
+        {
+            "flow_test": {"result": LAZY},
+            "plugins": [{"result": LAZY}],
+        },
+    ],
+}
+
+DOC = {
+    "tests": [
+        {
+            "flow_test": {
+                "name": 'a"b\\\\c',
+                "result": {"x": [1, {"y": "}\\n  }"}], "z": {}},
+            },
+            "plugins": [{"result": {}}, {"result": {"k": "v"}, "n": None}],
+        },
+        {"flow_test": {"result": 5}, "plugins": []},
+    ],
+    "other": [1.5, True],
+}
+
+
+@pytest.mark.parametrize("indent", [None, 1, 2, 4])
+def test_loads(indent: int) -> None:
+    text = json.dumps(DOC, indent=indent)
+    value = lazyJson.loads(text, SPEC)
+
+    r = value["tests"][0]["flow_test"]["result"]
+    assert isinstance(r, LazyDict)
+    assert not r.is_loaded
+    assert value == DOC
+    assert r.is_loaded
+
+    assert lazyJson.loads(text, {}) == DOC
+    assert lazyJson.loads(text, SPEC)["tests"][1]["flow_test"]["result"] == 5
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        json.dumps(DOC, separators=(",", ":")),
+        json.dumps(DOC, indent="\t"),
+        # Hand-edited: the closing braces are not aligned with the lines that
+        # open them.
+        '{\n  "result": {\n    "a": {\n      "b": 1\n  },\n    "c": 2\n  },\n  "d": 3\n}',
+        '{\n  "result": {\n    "a": 1},\n  "b": {\n  }\n}',
+        '{\n  "result": {\n    "a": [\n  ]},\n  "b": 2\n}',
+    ],
+)
+def test_loads_layout(text: str) -> None:
+    expected = json.loads(text)
+    spec = SPEC if "tests" in expected else {"result": LAZY}
+    assert lazyJson.loads(text, spec) == expected
+
+
+def test_loads_invalid() -> None:
+    for text in (
+        "",
+        '{"tests": [1,]}',
+        '{"tests": []} x',
+        '{"a" 1}',
+        '{"tests": [{"flow_test": {"result": {]}}]}',
+    ):
+        with pytest.raises(ValueError):
+            lazyJson.loads(text, SPEC)
+
+    # The lazy parts are only checked when they are used.
+    text = '{\n  "result": {\n    "a": \n  }\n}'
+    d = lazyJson.loads(text, {"result": LAZY})["result"]
+    with pytest.raises(ValueError):
+        d.get("a")
+
+
+def test_lazy_dict() -> None:
+    text = '{"a": 1, "b": [2]}'
+
+    d = LazyDict.from_span(text, 0, len(text))
+    assert isinstance(d, dict)
+    assert len(d) == 2
+
+    d = LazyDict.from_span(text, 0, len(text))
+    assert {**d} == {"a": 1, "b": [2]}
+    assert dict(LazyDict.from_span(text, 0, len(text))) == {"a": 1, "b": [2]}
+    assert list(LazyDict.from_span(text, 0, len(text))) == ["a", "b"]
+    assert "a" in LazyDict.from_span(text, 0, len(text))
+    assert LazyDict.from_span(text, 0, len(text)).get("b") == [2]
+    assert json.loads(json.dumps(LazyDict.from_span(text, 0, len(text)))) == {
+        "a": 1,
+        "b": [2],
+    }
+
+    d2 = copy.deepcopy(LazyDict.from_span(text, 0, len(text)))
+    assert type(d2) is dict
+    assert d2 == {"a": 1, "b": [2]}
+
+    d = LazyDict.from_span(text, 0, len(text))
+    d["c"] = 3
+    assert d == {"a": 1, "b": [2], "c": 3}
+
+    assert LazyDict({"a": 1}) == {"a": 1}
+    assert LazyDict.from_span(text, 0, len(text)) != {}
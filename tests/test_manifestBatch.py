@@ -0,0 +1,119 @@
+import os
+import pathlib
+import sys
+
+from typing import Optional
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from k8sApiClient import K8sApiClient  # noqa: E402
+from manifestBatch import ManifestBatch  # noqa: E402
+from manifestRender import RenderedManifest  # noqa: E402
+from test_k8sApiClient import FakeApiServer  # noqa: E402
+from test_k8sApiClient import _write_kubeconfig  # noqa: E402
+from test_k8sApiClient import fake_api_server  # noqa: E402, F401
+
+
+class ApiTestConfig:
+    # The part of TestConfig that ManifestBatch uses.
+
+    def __init__(self, api_client: Optional[K8sApiClient]) -> None:
+        self._api_client = api_client
+
+    def api_client(self, *, tenant: bool) -> Optional[K8sApiClient]:
+        return self._api_client
+
+
+def test_manifest_batch(
+    fake_api_server: FakeApiServer,  # noqa: F811
+    tmp_path: pathlib.Path,
+) -> None:
+    api_client = K8sApiClient.from_kubeconfig(
+        _write_kubeconfig(tmp_path, fake_api_server.url)
+    )
+
+    svc = RenderedManifest(
+        out_file_yaml=str(tmp_path / "svc.yaml"),
+        rendered="",
+        docs=(
+            {
+                "apiVersion": "v1",
+                "kind": "Service",
+                "metadata": {"name": "tft-clusterip-service-5201"},
+            },
+        ),
+    )
+    pods = RenderedManifest(
+        out_file_yaml=str(tmp_path / "pods.yaml"),
+        rendered="",
+        docs=tuple(
+            {"apiVersion": "v1", "kind": "Pod", "metadata": {"name": name}}
+            for name in ("p1", "p2")
+        ),
+    )
+    other = RenderedManifest(
+        out_file_yaml=str(tmp_path / "other.yaml"),
+        rendered="",
+        docs=(),
+    )
+
+    batch = ManifestBatch(ApiTestConfig(api_client))  # type: ignore
+    batch.add(svc, tenant=True, namespace="default")
+    batch.add(pods, tenant=True, namespace="default")
+    assert batch.get_applied(svc) is None
+
+    batch.apply()
+
+    obj = batch.get_applied(svc)
+    assert obj is not None
+    assert obj["spec"]["clusterIP"] == "172.30.0.10"
+    pod = batch.get_applied(pods)
+    assert pod is not None
+    assert pod["metadata"]["name"] == "p2"
+    assert sorted(fake_api_server.objects) == [
+        "/api/v1/namespaces/default/pods/p1",
+        "/api/v1/namespaces/default/pods/p2",
+        "/api/v1/namespaces/default/services/tft-clusterip-service-5201",
+    ]
+    assert batch.get_applied(other) is None
+
+
+def test_manifest_batch_shared(
+    fake_api_server: FakeApiServer,  # noqa: F811
+    tmp_path: pathlib.Path,
+) -> None:
+    api_client = K8sApiClient.from_kubeconfig(
+        _write_kubeconfig(tmp_path, fake_api_server.url)
+    )
+
+    def _tools_pod() -> RenderedManifest:
+        # Each plugin task renders its own copy of the node's tools pod.
+        return RenderedManifest(
+            out_file_yaml=str(tmp_path / "tools-pod-worker-1.yaml"),
+            rendered="kind: Pod\n",
+            docs=(
+                {
+                    "apiVersion": "v1",
+                    "kind": "Pod",
+                    "metadata": {"name": "tools-pod-worker-1"},
+                },
+            ),
+        )
+
+    pod1 = _tools_pod()
+    pod2 = _tools_pod()
+
+    batch = ManifestBatch(ApiTestConfig(api_client))  # type: ignore
+    batch.add(pod1, tenant=True, namespace="default")
+    batch.add(pod2, tenant=True, namespace="default")
+    assert sum(len(docs) for docs in batch._docs.values()) == 1
+
+    batch.apply()
+
+    obj1 = batch.get_applied(pod1)
+    obj2 = batch.get_applied(pod2)
+    assert obj1 is not None
+    assert obj1 == obj2
+    assert sorted(fake_api_server.objects) == [
+        "/api/v1/namespaces/default/pods/tools-pod-worker-1",
+    ]
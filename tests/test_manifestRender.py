@@ -0,0 +1,63 @@
+import os
+import pathlib
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import manifestRender  # noqa: E402
+import tftbase  # noqa: E402
+
+
+def test_render(tmp_path: pathlib.Path) -> None:
+    in_file_template = str(tmp_path / "pod.yaml.j2")
+    with open(in_file_template, "w") as f:
+        f.write(
+            """apiVersion: v1
+kind: Pod
+metadata:
+  name: "{{ pod_name }}"
+spec:
+  containers:
+  - command: {{ command }}
+"""
+        )
+    out_file_yaml = str(tmp_path / "pod.yaml")
+
+    manifest = manifestRender.render(
+        in_file_template,
+        {"pod_name": "p1", "command": ["/usr/bin/sleep", "infinity"]},
+        out_file_yaml=out_file_yaml,
+    )
+    assert manifest.obj == {
+        "apiVersion": "v1",
+        "kind": "Pod",
+        "metadata": {"name": "p1"},
+        "spec": {"containers": [{"command": ["/usr/bin/sleep", "infinity"]}]},
+    }
+    assert manifest.docs == (manifest.obj,)
+    assert 'name: "p1"\n' in manifest.rendered
+    if not tftbase.get_tft_manifests_dump():
+        assert not os.path.exists(out_file_yaml)
+
+    assert manifest.dump() == out_file_yaml
+    with open(out_file_yaml) as f:
+        assert f.read() == manifest.rendered
+
+
+def test_template_cache(tmp_path: pathlib.Path) -> None:
+    cache = manifestRender.TemplateCache()
+    path = str(tmp_path / "t.yaml.j2")
+    with open(path, "w") as f:
+        f.write("a: {{ a }}\n")
+
+    t1 = cache.get(path)
+    assert cache.get(path) is t1
+    assert t1.render(a=1) == "a: 1\n"
+
+    with open(path, "w") as f:
+        f.write("b: {{ a }}\n")
+    os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 1000))
+
+    t2 = cache.get(path)
+    assert t2 is not t1
+    assert t2.render(a=2) == "b: 2\n"
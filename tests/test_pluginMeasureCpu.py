@@ -0,0 +1,77 @@
+import os
+import pytest
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pluginMeasureCpu  # noqa: E402
+
+
+# Two CPUs, three samples one second apart. cpu1 serves the NIC queue and
+# is saturated by softirq in the second interval.
+PROC_STAT_OUTPUT = """@ 1700000000.000000000
+cpu  1000 0 1000 18000 0 0 0 0 0 0
+cpu0 500 0 500 9000 0 0 0 0 0 0
+cpu1 500 0 500 9000 0 0 0 0 0 0
+                    CPU0       CPU1
+      NET_RX:        100       1000
+@ 1700000001.000000000
+cpu  1050 0 1030 18120 0 0 0 0 0 0
+cpu0 540 0 510 9050 0 0 0 0 0 0
+cpu1 510 0 520 9070 0 0 0 0 0 0
+                    CPU0       CPU1
+      NET_RX:        110       5000
+@ 1700000002.000000000
+cpu  1095 0 1045 18170 0 0 90 0 0 0
+cpu0 580 0 520 9100 0 0 0 0 0 0
+cpu1 515 0 525 9070 0 0 90 0 0 0
+                    CPU0       CPU1
+      NET_RX:        120      15000
+"""
+
+
+def test_proc_stat_parse() -> None:
+    samples = pluginMeasureCpu.proc_stat_parse(PROC_STAT_OUTPUT)
+    assert len(samples) == 3
+    assert samples[1].timestamp == 1700000001.0
+    assert samples[1].stat["cpu1"] == (510, 0, 520, 9070, 0, 0, 0, 0)
+    assert samples[2].net_rx == {"cpu0": 120, "cpu1": 15000}
+
+    with pytest.raises(ValueError):
+        pluginMeasureCpu.proc_stat_parse("cpu 1 2 3\n")
+
+
+def test_cpu_time_series() -> None:
+    samples = pluginMeasureCpu.proc_stat_parse(PROC_STAT_OUTPUT)
+    result = pluginMeasureCpu.cpu_time_series(samples)
+
+    assert result["cpu"] == "all"
+    assert result["percent_idle"] == 42.5
+    assert result["percent_usr"] == 23.75
+    assert result["percent_soft"] == 22.5
+    assert result["interval"] == 1.0
+    assert result["timestamps"] == [1.0, 2.0]
+
+    assert result["cores"]["cpu0"] == {
+        "user": [40.0, 40.0],
+        "sys": [10.0, 10.0],
+        "softirq": [0.0, 0.0],
+        "idle": [50.0, 50.0],
+    }
+    assert result["cores"]["cpu1"] == {
+        "user": [10.0, 5.0],
+        "sys": [20.0, 5.0],
+        "softirq": [0.0, 90.0],
+        "idle": [70.0, 0.0],
+    }
+    assert result["softirq_saturated"] == ["cpu1"]
+
+    assert [h["cpu"] for h in result["hottest"]] == ["cpu1", "cpu0"]
+    assert result["hottest"][0]["busy_avg"] == 65.0
+    assert result["hottest"][0]["busy_max"] == 100.0
+    assert result["hottest"][0]["softirq_avg"] == 45.0
+    assert result["hottest"][0]["softirq_max"] == 90.0
+    assert result["hottest"][0]["net_rx"] == 14000
+
+    with pytest.raises(ValueError):
+        pluginMeasureCpu.cpu_time_series(samples[:1])
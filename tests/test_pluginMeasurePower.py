@@ -1,9 +1,11 @@
 import os
+import pytest
 import sys
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 import pluginMeasurePower  # noqa: E402
+import tftbase  # noqa: E402
 
 
 def test_extract() -> None:
@@ -11,3 +13,60 @@ def test_extract() -> None:
 
     r = pluginMeasurePower._extract(out)
     assert r == 346
+
+
+SAMPLER_OUTPUT = """start 100.0
+100.5     Instantaneous power reading:                   300 Watts
+101.0     Instantaneous power reading:                   320 Watts
+101.5     Instantaneous power reading:                   400 Watts
+102.0     Instantaneous power reading:                   310 Watts
+102.5
+stop 102.0
+"""
+
+
+def test_power_sampler_parse() -> None:
+    samples = pluginMeasurePower.power_sampler_parse(SAMPLER_OUTPUT)
+    assert samples.start == 100.0
+    assert samples.stop == 102.0
+    assert samples.readings == ((100.5, 300), (101.0, 320), (101.5, 400), (102.0, 310))
+    assert samples.failed == ("102.5",)
+
+    with pytest.raises(ValueError):
+        pluginMeasurePower.power_sampler_parse("start 100.0\n")
+
+
+def test_power_stats() -> None:
+    samples = pluginMeasurePower.power_sampler_parse(SAMPLER_OUTPUT)
+    stats = pluginMeasurePower.power_stats(
+        samples.readings,
+        samples.start,
+        samples.stop,
+    )
+    # 300 W until 101.0 (also before the first reading), 320 W until 101.5,
+    # then 400 W. The reading at the stop time is outside the window.
+    assert stats["window"] == 2.0
+    assert stats["samples"] == 3
+    assert stats["energy_joules"] == 300 * 1.0 + 320 * 0.5 + 400 * 0.5
+    assert stats["average_watts"] == 330.0
+    assert stats["peak_watts"] == 400
+
+    # Readings before the window only provide the initial value.
+    stats = pluginMeasurePower.power_stats(samples.readings, 101.2, 101.7)
+    assert stats["energy_joules"] == pytest.approx(320 * 0.3 + 400 * 0.2)
+    assert stats["peak_watts"] == 400
+
+    with pytest.raises(ValueError):
+        pluginMeasurePower.power_stats((), 100.0, 102.0)
+    with pytest.raises(ValueError):
+        pluginMeasurePower.power_stats(samples.readings, 102.0, 102.0)
+
+
+def test_energy_per_gb() -> None:
+    # 400 W at 32 Gbit/s (4 GB/s) are 100 J/GB.
+    assert (
+        pluginMeasurePower.energy_per_gb(400.0, tftbase.Bitrate(tx=30.0, rx=32.0))
+        == 100.0
+    )
+    assert pluginMeasurePower.energy_per_gb(400.0, tftbase.Bitrate(tx=32.0)) == 100.0
+    assert pluginMeasurePower.energy_per_gb(400.0, tftbase.Bitrate.NA) is None
@@ -1,9 +1,11 @@
 import os
+import pytest
 import sys
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 import pluginValidateOffload  # noqa: E402
+import tftbase  # noqa: E402
 
 
 def test_ethtool_parse_stat() -> None:
@@ -1917,3 +1919,87 @@ def test_ethtool_parse_stat_2() -> None:
         "rx_start": 7,
         "rx_end": 7,
     }
+
+
+def test_vf_rep_rates() -> None:
+    out = """1700000000.0 100 200
+1700000000.5 110 200
+1700000001.0 1110 700
+1700000001.5 2110 700
+
+1700000002.0 2110 700
+"""
+    samples = pluginValidateOffload.vf_rep_sampler_parse(out)
+    assert samples == [
+        (1700000000.0, 100, 200),
+        (1700000000.5, 110, 200),
+        (1700000001.0, 1110, 700),
+        (1700000001.5, 2110, 700),
+        (1700000002.0, 2110, 700),
+    ]
+
+    rates = pluginValidateOffload.vf_rep_rates(samples)
+    assert rates["offsets"] == [0.5, 1.0, 1.5, 2.0]
+    assert rates["rx_pps"] == [20.0, 2000.0, 2000.0, 0.0]
+    assert rates["tx_pps"] == [0.0, 1000.0, 0.0, 0.0]
+    assert rates["rx_pps_max"] == 2000.0
+    assert rates["tx_pps_max"] == 1000.0
+    assert rates["slow_path"] == [[0.5, 1.5]]
+
+    with pytest.raises(ValueError):
+        pluginValidateOffload.vf_rep_rates(samples[:1])
+    with pytest.raises(ValueError):
+        pluginValidateOffload.vf_rep_sampler_parse("1700000000.0 100\n")
+
+    cmd = pluginValidateOffload.vf_rep_sampler_cmd("eth_rep0", "/tmp/stop", 60)
+    assert "/sys/class/net/eth_rep0/statistics" in cmd
+    assert "rm -f /tmp/stop" in cmd
+
+
+def test_eval_plugin_output_sampler_error() -> None:
+    pod = tftbase.PodInfo(
+        name="pod", pod_type=tftbase.PodType.SRIOV, is_tenant=True, index=0
+    )
+    md = tftbase.TestMetadata(
+        tft_idx=0,
+        test_cases_idx=0,
+        connections_idx=0,
+        reverse=False,
+        test_case_id=tftbase.TestCaseType.POD_TO_POD_SAME_NODE,
+        test_type=tftbase.TestType.IPERF_TCP,
+        server=pod,
+        client=pod,
+    )
+    plugin_output = tftbase.PluginOutput(
+        plugin_metadata=tftbase.PluginMetadata(
+            plugin_name="validate_offload",
+            node_name="node",
+            pod_name="tools-pod-node",
+        ),
+        command="ethtool -S eth_rep0",
+        result={"rx_start": 0, "rx_end": 10, "tx_start": 0, "tx_end": 10},
+    )
+    plugin = pluginValidateOffload.plugin
+
+    assert plugin.eval_plugin_output(md, plugin_output).eval_success
+
+    plugin_output = tftbase.PluginOutput(
+        plugin_metadata=plugin_output.plugin_metadata,
+        command=plugin_output.command,
+        result={**plugin_output.result, "vf_rep_sampler_error": "no samples"},
+    )
+    # The ethtool counters decide. The sampler error is only recorded.
+    evaluated = plugin.eval_plugin_output(md, plugin_output)
+    assert evaluated.eval_success
+    assert evaluated.result["vf_rep_sampler_error"] == "no samples"
+
+    plugin_output = tftbase.PluginOutput(
+        success=False,
+        msg="ethtool output cannot be parsed",
+        plugin_metadata=plugin_output.plugin_metadata,
+        command=plugin_output.command,
+        result={"vf_rep_sampler_error": "no samples"},
+    )
+    evaluated = plugin.eval_plugin_output(md, plugin_output)
+    assert not evaluated.eval_success
+    assert evaluated.eval_msg == "ethtool output cannot be parsed"
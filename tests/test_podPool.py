@@ -0,0 +1,98 @@
+import dataclasses
+import os
+import sys
+
+from typing import Optional
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from podPool import PodPool  # noqa: E402
+from podPool import PodPoolEntry  # noqa: E402
+
+
+def _entry(pod_name: str, port: str, manifest_hash: str = "h1") -> PodPoolEntry:
+    return PodPoolEntry(
+        pod_name=pod_name,
+        node_name="node1",
+        manifest_hash=manifest_hash,
+        port=port,
+    )
+
+
+def test_pod_pool() -> None:
+    pool = PodPool()
+
+    e1 = _entry("normal-pod-node1-server-5201", "5201")
+    e2 = _entry("normal-pod-node1-client-5201", "")
+    e3 = _entry("host-pod-node1-server-5201", "5201")
+
+    assert pool.take_conflicting(e1) == []
+    pool.add(e1)
+    pool.add(e2)
+    assert pool.lookup(e1.pod_name) == e1
+    assert pool.lookup(e1.pod_name) != _entry(e1.pod_name, "5201", "h2")
+    assert pool.lookup(e1.pod_name) == dataclasses.replace(e1, uid="uid1")
+
+    assert pool.take_conflicting(e2) == []
+    assert pool.take_conflicting(e1) == []
+    assert pool.take_conflicting(e3) == [e1]
+    assert pool.lookup(e1.pod_name) is None
+    pool.add(e3)
+
+    assert pool.pod_lock(e3.pod_name) is pool.pod_lock(e3.pod_name)
+
+    assert pool.remove(e2.pod_name) == e2
+    assert pool.remove(e2.pod_name) is None
+
+    assert pool.clear() == [e3]
+    assert pool.lookup(e3.pod_name) is None
+
+
+def test_pod_pool_forgets_vf_rep_cache() -> None:
+    # Without the UID (with the oc fallback), the PCI address is cached by
+    # the pod name, until the pod leaves the pool.
+    pool = PodPool()
+    cache = pool.vf_rep_cache
+    e1 = _entry("normal-pod-node1-server-5201", "5201")
+    e2 = _entry("host-pod-node1-server-5201", "5201")
+    pool.add(e1)
+
+    def _get(pciaddr: str) -> Optional[str]:
+        return cache.get_pciaddr(e1.pod_name, "", "eth0", lambda: pciaddr)
+
+    assert _get("0000:03:00.2") == "0000:03:00.2"
+    assert _get("other") == "0000:03:00.2"
+
+    pool.remove(e1.pod_name)
+    assert _get("0000:03:00.3") == "0000:03:00.3"
+
+    pool.add(e1)
+    assert pool.take_conflicting(e2) == [e1]
+    assert _get("0000:03:00.4") == "0000:03:00.4"
+
+
+def test_pod_pool_pciaddrs_on_node() -> None:
+    pool = PodPool()
+    cache = pool.vf_rep_cache
+    e1 = dataclasses.replace(_entry("normal-pod-node1-server-5201", "5201"), uid="u1")
+    e2 = _entry("normal-pod-node1-client-5202", "")
+    e3 = dataclasses.replace(
+        e2, pod_name="normal-pod-node2-client-5203", node_name="node2"
+    )
+    e4 = _entry("host-pod-node1-client-5204", "")
+    for e in (e1, e2, e3, e4):
+        pool.add(e)
+
+    assert pool.pciaddrs_on_node("node1", "eth0") == []
+
+    # Only pods with a known PCI address, looked up by UID.
+    cache.get_pciaddr(e1.pod_name, "u1", "eth0", lambda: "0000:03:00.2")
+    cache.get_pciaddr(e2.pod_name, "", "eth0", lambda: "0000:03:00.3")
+    cache.get_pciaddr(e3.pod_name, "", "eth0", lambda: "0000:03:00.4")
+    cache.get_pciaddr(e1.pod_name, "u0", "eth0", lambda: "0000:03:00.5")
+    assert pool.pciaddrs_on_node("node1", "eth0") == ["0000:03:00.2", "0000:03:00.3"]
+    assert pool.pciaddrs_on_node("node1", "eth1") == []
+    assert pool.pciaddrs_on_node("node2", "eth0") == ["0000:03:00.4"]
+
+    pool.remove(e2.pod_name)
+    assert pool.pciaddrs_on_node("node1", "eth0") == ["0000:03:00.2"]
@@ -0,0 +1,175 @@
+import http.client
+import os
+import pytest
+import queue
+import sys
+import threading
+
+from collections.abc import Generator
+from typing import Any
+from typing import Optional
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import podReadiness  # noqa: E402
+
+
+def _pod(name: str, *, ready: bool, uid: str = "uid1") -> dict[str, Any]:
+    return {
+        "metadata": {"name": name, "uid": uid, "resourceVersion": "2"},
+        "status": {
+            "conditions": [
+                {"type": "Initialized", "status": "True"},
+                {"type": "Ready", "status": "True" if ready else "False"},
+            ]
+        },
+    }
+
+
+class WatchApiClient:
+    # Lists "initial" and then yields the events put into "events".
+
+    def __init__(self, initial: list[dict[str, Any]]) -> None:
+        self.initial = initial
+        self.events: queue.Queue[Optional[dict[str, Any] | Exception]] = queue.Queue()
+        self.num_lists = 0
+
+    def list_items_with_version(
+        self,
+        resource: str,
+        **kwargs: Any,
+    ) -> tuple[list[dict[str, Any]], str]:
+        assert resource == "pods"
+        self.num_lists += 1
+        return self.initial, "1"
+
+    def watch(
+        self,
+        resource: str,
+        **kwargs: Any,
+    ) -> Generator[dict[str, Any], None, None]:
+        assert kwargs["resource_version"]
+        while True:
+            event = self.events.get()
+            if event is None:
+                return
+            if isinstance(event, Exception):
+                raise event
+            yield event
+
+
+def test_pod_is_ready() -> None:
+    assert not podReadiness.pod_is_ready(None)
+    assert not podReadiness.pod_is_ready({})
+    assert not podReadiness.pod_is_ready(_pod("p1", ready=False))
+    assert podReadiness.pod_is_ready(_pod("p1", ready=True))
+
+    pod = _pod("p1", ready=True)
+    pod["metadata"]["deletionTimestamp"] = "2024-01-01T00:00:00Z"
+    assert not podReadiness.pod_is_ready(pod)
+
+
+def test_pod_readiness_waiter() -> None:
+    api_client = WatchApiClient([_pod("p1", ready=True), _pod("p2", ready=False)])
+    waiter = podReadiness.PodReadinessWaiter(
+        api_client,  # type: ignore
+        "ns",
+    )
+
+    assert waiter.wait_ready("p1", timeout=5) == _pod("p1", ready=True)
+    assert waiter.wait_ready("p2", timeout=0.1) is None
+    assert waiter.get_pod("p2") == _pod("p2", ready=False)
+
+    result: list[Optional[dict[str, Any]]] = []
+    th = threading.Thread(
+        target=lambda: result.append(waiter.wait_ready("p2", timeout=10)),
+    )
+    th.start()
+    api_client.events.put({"type": "BOOKMARK", "object": {"metadata": {}}})
+    api_client.events.put({"type": "MODIFIED", "object": _pod("p2", ready=True)})
+    th.join()
+    assert result == [_pod("p2", ready=True)]
+
+    # The old "p1" is still ready, but we wait for the one with the new uid.
+    th = threading.Thread(
+        target=lambda: result.append(waiter.wait_ready("p1", timeout=10, uid="uid2")),
+    )
+    th.start()
+    api_client.events.put({"type": "DELETED", "object": _pod("p1", ready=True)})
+    api_client.events.put(
+        {"type": "ADDED", "object": _pod("p1", ready=False, uid="uid2")}
+    )
+    api_client.events.put(
+        {"type": "MODIFIED", "object": _pod("p1", ready=True, uid="uid2")}
+    )
+    th.join()
+    assert result[-1] == _pod("p1", ready=True, uid="uid2")
+
+    # An ERROR event (e.g. "410 Gone") makes us list again.
+    api_client.initial = []
+    api_client.events.put({"type": "ERROR", "object": {"code": 410}})
+    for _ in range(100):
+        if waiter.get_pod("p1") is None:
+            break
+        threading.Event().wait(0.05)
+    assert waiter.get_pod("p1") is None
+    assert api_client.num_lists == 2
+
+
+def test_pod_readiness_waiter_recreated_between_resyncs() -> None:
+    api_client = WatchApiClient([_pod("p1", ready=True)])
+    waiter = podReadiness.PodReadinessWaiter(
+        api_client,  # type: ignore
+        "ns",
+    )
+
+    assert waiter.wait_ready("p1", timeout=5) == _pod("p1", ready=True)
+
+    # The pod got deleted and recreated while the watch was down. The next
+    # list only shows the new, ready pod.
+    api_client.initial = [_pod("p1", ready=True, uid="uid2")]
+    api_client.events.put({"type": "ERROR", "object": {"code": 410}})
+    assert waiter.wait_ready("p1", timeout=5, uid="uid2") == _pod(
+        "p1", ready=True, uid="uid2"
+    )
+    assert api_client.num_lists == 2
+
+
+def test_pod_readiness_waiter_died() -> None:
+    api_client = WatchApiClient([_pod("p1", ready=True)])
+    waiter = podReadiness.PodReadinessWaiter(
+        api_client,  # type: ignore
+        "ns",
+    )
+    assert waiter.wait_ready("p1", timeout=5) == _pod("p1", ready=True)
+
+    # A broken chunked stream makes us list again.
+    api_client.events.put(http.client.IncompleteRead(b""))
+    for _ in range(100):
+        if api_client.num_lists == 2:
+            break
+        threading.Event().wait(0.05)
+    assert api_client.num_lists == 2
+    assert not waiter.dead
+
+    # Anything unexpected kills the watch. Waiters don't wait for the
+    # timeout, but fail right away.
+    result: list[BaseException] = []
+
+    def _wait() -> None:
+        try:
+            waiter.wait_ready("p2", timeout=60)
+        except podReadiness.PodReadinessWaiterDied as e:
+            result.append(e)
+
+    th = threading.Thread(target=_wait)
+    th.start()
+    api_client.events.put(RuntimeError("unexpected"))
+    th.join(timeout=10)
+    assert not th.is_alive()
+    assert len(result) == 1
+    assert waiter.dead
+    with pytest.raises(podReadiness.PodReadinessWaiterDied):
+        waiter.get_pod("p1")
+    with pytest.raises(podReadiness.PodReadinessWaiterDied):
+        waiter.wait_ready("p1", timeout=60)
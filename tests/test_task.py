@@ -1,5 +1,7 @@
 import os
+import pathlib
 import pytest
+import subprocess
 import sys
 import threading
 
@@ -103,3 +105,31 @@ def test_task_operation_thread_with_collect_wrong() -> None:
     op.start()
     with pytest.raises(TypeError):
         op.finish()
+
+
+def test_sampler_loop_cmd(tmp_path: pathlib.Path) -> None:
+    stop_file = tmp_path / "stop"
+    cmd = task.sampler_loop_cmd(
+        "echo sample",
+        interval=0.01,
+        stop_file=str(stop_file),
+        max_duration=60,
+    )
+
+    # With the stop file already there, we get the sample at the start and
+    # the one after the stop file appeared.
+    stop_file.touch()
+    r = subprocess.run(cmd, shell=True, capture_output=True, text=True)
+    assert r.returncode == 0
+    assert r.stdout == "sample\n"
+    assert not stop_file.exists()
+
+    # Without a stop file, the maximum duration ends the loop.
+    cmd = task.sampler_loop_cmd(
+        "echo sample",
+        interval=0.01,
+        stop_file=str(stop_file),
+        max_duration=0,
+    )
+    r = subprocess.run(cmd, shell=True, capture_output=True, text=True)
+    assert r.stdout == "sample\n"
@@ -155,8 +155,16 @@ tft:
       - HOST_TO_POD_DIFF_NODE
       - HOST_TO_CLUSTER_IP_TO_POD_SAME_NODE - HOST_TO_CLUSTER_IP_TO_HOST_SAME_NODE
     privileged_pod: True
+    max_parallel_connections: 3
+    prepare_lookahead: 2
     connections:
      - name: con1
+       instances: 4
+       instances_parallel: true
+       parallel_streams: 8
+       zerocopy: true
+       cpu_affinity: "2,3"
+       window_size: 4M
        plugins:
          - name: measure_cpu
          - measure_power
@@ -199,6 +207,16 @@ kubeconfig_infra: /path/to/kubeconfig_infra
     assert tc.config.tft[0].connections[1].name == "con2"
     assert tc.config.tft[0].connections[1].client[0].name == "client1.example.com"
     assert tc.config.tft[0].connections[0].test_type == TestType.IPERF_TCP
+    assert tc.config.tft[0].connections[0].instances == 4
+    assert tc.config.tft[0].connections[0].instances_parallel is True
+    assert tc.config.tft[0].connections[1].instances_parallel is False
+    assert tc.config.tft[0].connections[0].parallel_streams == 8
+    assert tc.config.tft[0].connections[0].zerocopy is True
+    assert tc.config.tft[0].connections[0].cpu_affinity == "2,3"
+    assert tc.config.tft[0].connections[0].window_size == "4M"
+    assert tc.config.tft[0].connections[1].parallel_streams == 1
+    assert tc.config.tft[0].connections[1].zerocopy is False
+    assert tc.config.tft[0].connections[1].cpu_affinity is None
     assert tc.config.tft[0].connections[0].plugins[0].name == "measure_cpu"
     assert (
         tc.config.tft[0].connections[0].plugins[0].plugin.PLUGIN_NAME == "measure_cpu"
@@ -213,6 +231,8 @@ kubeconfig_infra: /path/to/kubeconfig_infra
     assert tc.config.tft[0].connections[1].server[0].privileged_pod is None
     assert tc.config.tft[0].get_output_file() == pathlib.Path("/tmp/result-000.json")
     assert tc.config.tft[0].privileged_pod is True
+    assert tc.config.tft[0].max_parallel_connections == 3
+    assert tc.config.tft[0].prepare_lookahead == 2
 
     _check_testConfig(tc)
 
@@ -241,6 +261,24 @@ kubeconfig_infra: /path/to/kubeconfig_infra
             output_base="/tmp/",
         )
 
+    # The iperf options are rejected for other test types.
+    with pytest.raises(
+        ValueError,
+        match=re.escape(
+            'invalid configuration: ".tft[0].connections[1].parallel_streams": not supported with test type'
+        ),
+    ):
+        testConfig.TestConfig(
+            full_config=yaml.safe_load(
+                full_config_str.replace(
+                    "       type: simple\n",
+                    "       type: simple\n       parallel_streams: 2\n",
+                ),
+            ),
+            kubeconfigs=None,
+            output_base="/tmp/",
+        )
+
     # A minimal yaml.
     full_config = yaml.safe_load(
         """
@@ -267,6 +305,8 @@ tft:
         common.enum_convert_list(TestCaseType, "*")
     )
     assert tc.config.tft[0].connections[0].name == "Connection Test 1/1"
+    assert tc.config.tft[0].max_parallel_connections == 1
+    assert tc.config.tft[0].prepare_lookahead == 0
     assert tc.config.tft[0].get_output_file() == pathlib.Path("/tmp/result2-000.json")
 
     _check_testConfig(tc)
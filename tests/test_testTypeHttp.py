@@ -0,0 +1,102 @@
+import importlib.util
+import json
+import os
+import pytest
+import socket
+import sys
+import threading
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import testTypeHttp  # noqa: E402
+import tftbase  # noqa: E402
+
+
+def _load_http_load() -> object:
+    filename = os.path.join(os.path.dirname(__file__), "..", "scripts", "http-load.py")
+    spec = importlib.util.spec_from_file_location("http_load", filename)
+    assert spec is not None and spec.loader is not None
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_http_load_parse() -> None:
+    out = (
+        json.dumps(
+            {
+                "requests": 100,
+                "errors": 0,
+                "bytes": 102400,
+                "requests_per_second": 50.0,
+                "bytes_per_second": 51200.0,
+                "latency_us": {
+                    "min": 100.0,
+                    "p50": 200.0,
+                    "p90": 300.0,
+                    "p99": 400.0,
+                    "max": 500.0,
+                    "stddev": 50.0,
+                },
+            }
+        )
+        + "\n"
+    )
+    result = testTypeHttp.http_load_parse(out)
+    assert result["requests"] == 100
+    assert testTypeHttp.http_load_gbps(result) == tftbase.Bitrate(rx=0.0004096)
+    assert testTypeHttp.http_load_check(result) is None
+    assert testTypeHttp.http_load_check({**result, "errors": 3}) == (
+        "had 3 failed requests"
+    )
+    assert testTypeHttp.http_load_check({**result, "requests": 0}) == (
+        "completed no requests"
+    )
+
+    with pytest.raises(ValueError):
+        testTypeHttp.http_load_parse("")
+    with pytest.raises(ValueError):
+        testTypeHttp.http_load_parse("[1, 2]\n")
+    with pytest.raises(ValueError):
+        testTypeHttp.http_load_parse('{"requests": 1}\n')
+
+
+def test_http_load() -> None:
+    http_load = _load_http_load()
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+
+    th = threading.Thread(
+        target=http_load.run_server,  # type: ignore
+        kwargs={"port": port, "workers": 1, "payload_size": 100, "duration": 3.0},
+    )
+    th.start()
+
+    result = http_load.run_client(port=port, duration=0.5, concurrency=2)  # type: ignore
+    assert result["requests"] > 0
+    assert result["errors"] == 0
+    assert result["bytes"] == 100 * result["requests"]
+    assert result["latency_us"]["p50"] <= result["latency_us"]["p99"]
+
+    result = http_load.run_client(  # type: ignore
+        port=port,
+        duration=0.5,
+        concurrency=2,
+        rate=20.0,
+        payload_size=3000,
+    )
+    assert 5 <= result["requests"] <= 12
+    assert result["bytes"] == 3000 * result["requests"]
+
+    th.join()
+
+
+def test_http_load_percentile() -> None:
+    # The script runs standalone in the pod and has its own copy of
+    # tftbase.percentile().
+    http_load = _load_http_load()
+    values = [float(v) for v in (7, 1, 4, 4, 9, 2, 13, 5)]
+    for q in (0, 50, 90, 99, 100):
+        assert http_load.percentile(values, q) == tftbase.percentile(values, q)  # type: ignore
@@ -0,0 +1,102 @@
+import json
+import os
+import sys
+
+from typing import Any
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import testTypeIperf  # noqa: E402
+
+from tftbase import Bitrate  # noqa: E402
+
+
+def _interval(start: int, gbps: float, *, omitted: bool = False) -> dict[str, Any]:
+    return {
+        "streams": [],
+        "sum": {
+            "start": start,
+            "end": start + 1,
+            "seconds": 1,
+            "bytes": int(gbps * 1e9 / 8),
+            "bits_per_second": gbps * 1e9,
+            "omitted": omitted,
+        },
+    }
+
+
+START = {"tcp_mss_default": 1448, "test_start": {"protocol": "TCP"}}
+END = {
+    "sum_sent": {"seconds": 3, "bytes": 3 * 10**9, "bits_per_second": 8e9},
+    "sum_received": {"seconds": 3, "bytes": 3 * 10**9, "bits_per_second": 7.9e9},
+}
+INTERVALS = [
+    _interval(0, 1.0, omitted=True),
+    _interval(0, 9.0),
+    _interval(1, 1.0),
+    _interval(2, 9.5),
+]
+
+
+def test_parse_output() -> None:
+    doc = {"start": START, "intervals": INTERVALS, "end": END}
+
+    assert testTypeIperf.parse_output(json.dumps(doc, indent=4)) == doc
+
+    stream = [
+        {"event": "start", "data": START},
+        *({"event": "interval", "data": i} for i in INTERVALS),
+        {"event": "end", "data": END},
+    ]
+    out = "".join(json.dumps(ev) + "\n" for ev in stream)
+    assert testTypeIperf.parse_output(out) == doc
+
+    out = json.dumps({"event": "error", "data": "unable to connect"}) + "\n"
+    assert testTypeIperf.parse_output(out) == {"error": "unable to connect"}
+
+
+def test_interval_stats() -> None:
+    doc = {"start": START, "intervals": INTERVALS, "end": END}
+
+    bitrates = testTypeIperf.interval_bitrates_gbps(doc)
+    assert bitrates == [9.0, 1.0, 9.5]
+    stats = testTypeIperf.interval_stats(bitrates)
+    assert stats["min"] == 1.0
+    assert stats["p50"] == 9.0
+    assert 9.0 < stats["p99"] < 9.5
+    assert testTypeIperf.interval_stats([]) == {}
+
+    # Older results without intervals still work.
+    result = testTypeIperf.ResultTcp({"start": START, "end": END})
+    assert result.bitrate == Bitrate(tx=8.0, rx=7.9)
+    assert testTypeIperf.interval_bitrates_gbps({"end": END}) == []
+
+
+def test_stream_bitrates() -> None:
+    def _stream(tx: float, rx: float) -> dict[str, Any]:
+        return {
+            "sender": {"bits_per_second": tx * 1e9, "sender": True},
+            "receiver": {"bits_per_second": rx * 1e9, "sender": False},
+        }
+
+    end = {**END, "streams": [_stream(4.0, 3.9), _stream(4.0, 4.0)]}
+    doc = {"start": START, "end": end}
+    assert testTypeIperf.stream_bitrates_gbps(doc) == [
+        Bitrate(tx=4.0, rx=3.9),
+        Bitrate(tx=4.0, rx=4.0),
+    ]
+    # The aggregate is still taken from "sum_sent" and "sum_received".
+    assert testTypeIperf.ResultTcp(doc).bitrate == Bitrate(tx=8.0, rx=7.9)
+
+    end = {
+        "sum": {},
+        "streams": [
+            {"udp": {"bits_per_second": 2e9}},
+            {"udp": {"bits_per_second": 1e9}},
+        ],
+    }
+    assert testTypeIperf.stream_bitrates_gbps({"end": end}) == [
+        Bitrate(tx=2.0, rx=2.0),
+        Bitrate(tx=1.0, rx=1.0),
+    ]
+    assert testTypeIperf.stream_bitrates_gbps({"end": END}) == []
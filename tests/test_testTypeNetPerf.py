@@ -10,68 +10,154 @@ import tftbase  # noqa: E402
 
 def test_netperf_parse_tcp_rr() -> None:
 
-    data = """MIGRATED TCP REQUEST/RESPONSE TEST from 0.0.0.0 (0.0.0.0) port 0 AF_INET to 10.131.0.169 () port 0 AF_INET : demo : first burst 0
-Local /Remote
-Socket Size   Request  Resp.   Elapsed  Trans.
-Send   Recv   Size     Size    Time     Rate         
-bytes  Bytes  bytes    bytes   secs.    per sec   
-
-16384  131072 1        1       30.00    43642.12   
-16384  131072
+    # The output of "netperf -t TCP_RR -c -C -P 0 -j -- -k ...".
+    data = """THROUGHPUT=39012.44
+THROUGHPUT_UNITS=Trans/s
+ELAPSED_TIME=30.00
+LOCAL_CPU_UTIL=4.53
+REMOTE_CPU_UTIL=5.01
+LOCAL_SD=9.291
+REMOTE_SD=10.270
+SD_UNITS=usec/Tran
+LOCAL_TRANSPORT_RETRANS=0
+REMOTE_TRANSPORT_RETRANS=-1
+REQUEST_SIZE=1
+RESPONSE_SIZE=1
+MIN_LATENCY=12
+P50_LATENCY=25
+P90_LATENCY=31
+P99_LATENCY=58
+MAX_LATENCY=1021
+STDDEV_LATENCY=9.25
 """
 
-    assert testTypeNetPerf.netperf_parse(tftbase.TestType.NETPERF_TCP_RR, data) == {
-        "Socket Send Bytes": 16384.0,
-        "Size Receive Bytes": 131072.0,
-        "Request Size Bytes": 1.0,
-        "Response Size Bytes": 1.0,
-        "Elapsed Time Seconds": 30.0,
-        "Transaction Rate Per Second": 43642.12,
-    }
-
-    data = """MIGRATED TCP REQUEST/RESPONSE TEST from 0.0.0.0 (0.0.0.0) port 0 AF_INET to 10.131.0.169 () port 0 AF_INET : demo : first burst 0
-Local /Remote
-Socket Size   Request  Resp.   Elapsed  Trans.
-Send   Recv   Size     Size    Time     Rate         
-bytes  Bytes  bytes    bytes   secs.    per sec   
-
-16384  131072 1     2   1       30.00    43642.12   
-16384  131072
+    parsed = testTypeNetPerf.netperf_parse(data)
+    assert parsed["THROUGHPUT"] == 39012.44
+    assert parsed["THROUGHPUT_UNITS"] == "Trans/s"
+    assert parsed["LOCAL_SD"] == 9.291
+    assert parsed["REMOTE_TRANSPORT_RETRANS"] == -1.0
+    assert set(parsed) == set(testTypeNetPerf.NETPERF_RR_SELECTORS)
+
+    latency = testTypeNetPerf.netperf_latency(parsed)
+    assert latency == tftbase.Latency(
+        min=12.0,
+        p50=25.0,
+        p90=31.0,
+        p99=58.0,
+        max=1021.0,
+        stddev=9.25,
+    )
+    assert latency.is_passing(None)
+    assert latency.is_passing(58)
+    assert not latency.is_passing(50)
+
+    # The order of the lines does not matter, unknown keys are kept.
+    parsed = testTypeNetPerf.netperf_parse("P99_LATENCY=58\nFOO=bar\nTHROUGHPUT=1.5\n")
+    assert parsed == {"P99_LATENCY": 58.0, "FOO": "bar", "THROUGHPUT": 1.5}
+    with pytest.raises(KeyError):
+        testTypeNetPerf.netperf_latency(parsed)
+
+
+def test_netperf_latency_not_measured() -> None:
+    # Without "-j", netperf reports the latencies as -1. That must not pass
+    # a latency threshold.
+    data = """THROUGHPUT=38876.02
+THROUGHPUT_UNITS=Trans/s
+ELAPSED_TIME=30.00
+LOCAL_CPU_UTIL=4.48
+REMOTE_CPU_UTIL=4.97
+LOCAL_SD=9.220
+REMOTE_SD=10.226
+SD_UNITS=usec/Tran
+LOCAL_TRANSPORT_RETRANS=0
+REMOTE_TRANSPORT_RETRANS=-1
+REQUEST_SIZE=1
+RESPONSE_SIZE=1
+MIN_LATENCY=-1
+P50_LATENCY=-1
+P90_LATENCY=-1
+P99_LATENCY=-1
+MAX_LATENCY=-1
+STDDEV_LATENCY=-1.00
 """
 
+    parsed = testTypeNetPerf.netperf_parse(data)
+    assert parsed["MIN_LATENCY"] == -1.0
+    with pytest.raises(ValueError, match="no MIN_LATENCY"):
+        testTypeNetPerf.netperf_latency(parsed)
+
+    parsed = {key: -1.0 for key in testTypeNetPerf.NETPERF_LATENCY_SELECTORS}
     with pytest.raises(ValueError):
-        testTypeNetPerf.netperf_parse("TCP_RR", data)
+        testTypeNetPerf.netperf_latency(parsed)
 
+    parsed["P50_LATENCY"] = 25.0
+    parsed["P99_LATENCY"] = 58.0
+    with pytest.raises(ValueError):
+        testTypeNetPerf.netperf_latency(parsed)
 
-def test_netperf_parse_tcp_stream() -> None:
 
-    data = """MIGRATED TCP STREAM TEST from 0.0.0.0 (0.0.0.0) port 0 AF_INET to 10.131.0.167 () port 0 AF_INET : demo
-Recv   Send    Send                          
-Socket Socket  Message  Elapsed              
-Size   Size    Size     Time     Throughput  
-bytes  bytes   bytes    secs.    10^6bits/sec  
+def test_netperf_parse_tcp_stream() -> None:
 
-131072  16384  16384    30.00    35710.68   
+    data = """THROUGHPUT=35710.68
+THROUGHPUT_UNITS=10^6bits/s
+ELAPSED_TIME=30.00
+LOCAL_CPU_UTIL=12.40
+REMOTE_CPU_UTIL=20.11
+LOCAL_SD=0.228
+REMOTE_SD=0.369
+SD_UNITS=usec/KB
+LOCAL_TRANSPORT_RETRANS=17
+REMOTE_TRANSPORT_RETRANS=0
+LOCAL_SEND_SIZE=16384
+LOCAL_SEND_CALLS=8173211
 """
 
-    assert testTypeNetPerf.netperf_parse("TCP_STREAM", data) == {
-        "Receive Socket Size Bytes": 131072.0,
-        "Send Socket Size Bytes": 16384.0,
-        "Send Message Size Bytes": 16384.0,
-        "Elapsed Time Seconds": 30.0,
-        "Throughput 10^6bits/sec": 35710.68,
-    }
-
-    with pytest.raises(TypeError):
-        testTypeNetPerf.netperf_parse("bogus-name", data)
+    parsed = testTypeNetPerf.netperf_parse(data)
+    assert set(parsed) == set(testTypeNetPerf.NETPERF_STREAM_SELECTORS)
+    assert parsed["LOCAL_TRANSPORT_RETRANS"] == 17.0
+    assert testTypeNetPerf.netperf_gbps(parsed) == pytest.approx(35.71068)
+    assert testTypeNetPerf.netperf_gbps(
+        {"THROUGHPUT": 9.5, "THROUGHPUT_UNITS": "10^9bits/s"}
+    ) == pytest.approx(9.5)
+    with pytest.raises(ValueError):
+        testTypeNetPerf.netperf_gbps({"THROUGHPUT": 9.5, "THROUGHPUT_UNITS": "KB/s"})
 
+    # The old human readable output is rejected.
     data = """MIGRATED TCP STREAM TEST from 0.0.0.0 (0.0.0.0) port 0 AF_INET to 10.131.0.167 () port 0 AF_INET : demo
 Recv   Send    Send                          
 Socket Socket  Message  Elapsed              
 Size   Size    Size     Time     Throughput  
 bytes  bytes   bytes    secs.    10^6bits/sec  
 
-16384  16384    30.00    35710.68   
+131072  16384  16384    30.00    35710.68   
 """
     with pytest.raises(ValueError):
-        testTypeNetPerf.netperf_parse("TCP_STREAM", data)
+        testTypeNetPerf.netperf_parse(data)
+
+    with pytest.raises(ValueError):
+        testTypeNetPerf.netperf_parse("THROUGHPUT=\nTHROUGHPUT_UNITS=10^6bits/s\n")
+
+
+def test_netperf_selectors() -> None:
+    assert (
+        testTypeNetPerf.netperf_selectors(tftbase.TestType.NETPERF_TCP_STREAM)
+        == testTypeNetPerf.NETPERF_STREAM_SELECTORS
+    )
+    for test_type in (
+        tftbase.TestType.NETPERF_TCP_RR,
+        tftbase.TestType.NETPERF_TCP_CRR,
+    ):
+        assert (
+            testTypeNetPerf.netperf_selectors(test_type)
+            == testTypeNetPerf.NETPERF_RR_SELECTORS
+        )
+
+
+def test_netperf_options() -> None:
+    options = testTypeNetPerf.netperf_options(tftbase.TestType.NETPERF_TCP_STREAM)
+    assert "-j" not in options.split()
+    for test_type in (
+        tftbase.TestType.NETPERF_TCP_RR,
+        tftbase.TestType.NETPERF_TCP_CRR,
+    ):
+        assert "-j" in testTypeNetPerf.netperf_options(test_type).split()
@@ -0,0 +1,185 @@
+import importlib.util
+import json
+import os
+import pytest
+import socket
+import subprocess
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import testTypeSimple  # noqa: E402
+import tftbase  # noqa: E402
+
+
+SCRIPT = os.path.join(
+    os.path.dirname(__file__), "..", "scripts", "simple-tcp-server-client.py"
+)
+
+
+def _load_simple_tcp_server_client() -> object:
+    spec = importlib.util.spec_from_file_location("simple_tcp_server_client", SCRIPT)
+    assert spec is not None and spec.loader is not None
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port: int = s.getsockname()[1]
+        return port
+
+
+def _run_echo(port: int, *args: str, server_args: tuple[str, ...] = ()) -> str:
+    with subprocess.Popen(
+        [
+            sys.executable,
+            SCRIPT,
+            "--server",
+            "--port",
+            str(port),
+            "--duration",
+            "20",
+            *server_args,
+        ],
+        stdout=subprocess.PIPE,
+        text=True,
+        env={**os.environ, "PYTHONUNBUFFERED": "1"},
+    ) as server:
+        # Wait until the server listens.
+        assert server.stdout is not None
+        assert "server: listen on " in server.stdout.readline()
+        r = subprocess.run(
+            [sys.executable, SCRIPT, "--port", str(port), *args],
+            stdout=subprocess.PIPE,
+            text=True,
+            timeout=20,
+        )
+        server.wait(timeout=20)
+    assert r.returncode == 0, r.stdout
+    return r.stdout
+
+
+def test_simple_parse() -> None:
+    out = (
+        json.dumps(
+            {
+                "mode": "echo",
+                "bytes_sent": 1000,
+                "bytes_received": 1000,
+                "chunks_sent": 10,
+                "chunks_received": 10,
+                "duration": 2.0,
+                "tx_gbps": 4e-06,
+                "rx_gbps": 4e-06,
+                "lost": None,
+                "reordered": None,
+                "latency_us": None,
+            }
+        )
+        + "\n"
+    )
+    result = testTypeSimple.simple_parse(out)
+    assert result["chunks_sent"] == 10
+    assert testTypeSimple.simple_gbps(result) == tftbase.Bitrate.NA
+    result["mode"] = "throughput"
+    assert testTypeSimple.simple_gbps(result) == tftbase.Bitrate(tx=4e-06, rx=4e-06)
+
+    with pytest.raises(ValueError):
+        testTypeSimple.simple_parse("")
+    with pytest.raises(ValueError):
+        testTypeSimple.simple_parse("[10:00:00.0000] client: connected\n")
+    with pytest.raises(ValueError):
+        testTypeSimple.simple_parse('{"bytes_sent": 1}\n')
+
+
+def test_simple_echo() -> None:
+    out = _run_echo(_free_port(), "--duration", "0.5", "--sleep", "0", "--json")
+    result = testTypeSimple.simple_parse(out)
+    assert result["mode"] == "echo"
+    assert result["bytes_received"] == result["bytes_sent"] > 0
+    assert result["chunks_received"] == result["chunks_sent"]
+    assert result["latency_us"] is None
+    assert testTypeSimple.simple_gbps(result) == tftbase.Bitrate.NA
+
+
+def test_simple_echo_throughput() -> None:
+    for args in ((), ("--sendfile",), ("--zerocopy",)):
+        out = _run_echo(
+            _free_port(), "--duration", "0.5", "--throughput", "--json", *args
+        )
+        result = testTypeSimple.simple_parse(out)
+        assert result["bytes_received"] == result["bytes_sent"] > 0
+        assert result["latency_us"] is None
+        bitrate = testTypeSimple.simple_gbps(result)
+        assert bitrate.rx is not None and bitrate.rx > 0.0
+        # The server does not sleep by default. Sleeping 1ms per chunk would
+        # limit it to at most 500 chunks in 0.5 seconds.
+        assert result["chunks_received"] > 600
+
+
+def test_simple_rr() -> None:
+    out = _run_echo(_free_port(), "--duration", "0.5", "--rr", "--msg-size", "100")
+    assert "client: round trip latency of " in out
+
+    out = _run_echo(
+        _free_port(), "--duration", "0.5", "--rr", "--msg-size", "100", "--json"
+    )
+    result = testTypeSimple.simple_parse(out)
+    assert result["mode"] == "rr"
+    assert result["bytes_received"] == 100 * result["chunks_received"]
+    assert result["latency_us"]["p50"] <= result["latency_us"]["p99"]
+
+
+def test_simple_udp() -> None:
+    out = _run_echo(
+        _free_port(),
+        "--duration",
+        "0.5",
+        "--proto",
+        "udp",
+        "--sleep",
+        "0",
+        "--json",
+        server_args=("--proto", "udp"),
+    )
+    result = testTypeSimple.simple_parse(out)
+    assert result["mode"] == "udp"
+    assert result["lost"] == 0
+    assert result["reordered"] == 0
+    assert result["chunks_received"] > 0
+    assert result["latency_us"] is not None
+
+
+def test_udp_peer() -> None:
+    mod = _load_simple_tcp_server_client()
+    p = mod.UdpPeer(1, ("127.0.0.1", 1234))  # type: ignore
+
+    for seq in (0, 1, 3, 4, 2, 2, 0, 7):
+        p.track(seq)
+    assert p.missing == {5, 6}
+    assert p.reordered == 1
+
+
+def test_latency_histogram() -> None:
+    mod = _load_simple_tcp_server_client()
+    hist = mod.LatencyHistogram()  # type: ignore
+
+    assert hist.summary_us() is None
+    for rtt_us in range(1, 101):
+        hist.add(rtt_us * 1000)
+    summary = hist.summary_us()
+    assert summary["min"] == 1.0
+    assert summary["p50"] == 50.5
+    assert summary["max"] == 100.0
+
+
+def test_percentile() -> None:
+    # The script runs standalone in the pod and has its own copy of
+    # tftbase.percentile().
+    mod = _load_simple_tcp_server_client()
+    values = [7, 1, 4, 4, 9, 2, 13, 5]
+    for q in (0, 50, 90, 99, 100):
+        assert mod.percentile(values, q) == tftbase.percentile(values, q)  # type: ignore
@@ -206,3 +206,53 @@ def test_str_sanitize() -> None:
     assert tftbase.str_sanitize("ends") == "ends-s"
     assert tftbase.str_sanitize("\u03c0") == "p--3c0--s"
     assert tftbase.str_sanitize("qs.gnrd.cAxs2.foo") == "qs-0gnrd-0c-axs2-0foo"
+
+
+def test_bitrate_aggregate() -> None:
+    Bitrate = tftbase.Bitrate
+
+    assert Bitrate.aggregate([]) == Bitrate.NA
+    assert Bitrate.aggregate([Bitrate.NA, Bitrate.NA]) == Bitrate.NA
+    assert Bitrate.aggregate([Bitrate(tx=1, rx=2)]) == Bitrate(tx=1.0, rx=2.0)
+    assert Bitrate.aggregate(
+        [
+            Bitrate(tx=1.5, rx=2),
+            Bitrate(tx=2.5),
+            Bitrate.NA,
+        ]
+    ) == Bitrate(tx=4.0, rx=2.0)
+
+
+def test_percentile() -> None:
+    assert tftbase.percentile([5.0], 99) == 5.0
+    assert tftbase.percentile([3.0, 1.0, 2.0], 0) == 1.0
+    assert tftbase.percentile([3.0, 1.0, 2.0], 50) == 2.0
+    assert tftbase.percentile([3.0, 1.0, 2.0], 100) == 3.0
+    assert tftbase.percentile([1.0, 2.0, 3.0, 4.0], 50) == 2.5
+    assert tftbase.percentile([float(i) for i in range(101)], 99) == 99.0
+    with pytest.raises(ValueError):
+        tftbase.percentile([], 50)
+
+
+def test_jain_fairness() -> None:
+    assert tftbase.jain_fairness([5.0]) == 1.0
+    assert tftbase.jain_fairness([3.0, 3.0, 3.0]) == 1.0
+    assert tftbase.jain_fairness([0.0, 0.0]) == 1.0
+    assert tftbase.jain_fairness([4.0, 0.0, 0.0, 0.0]) == 0.25
+    assert tftbase.jain_fairness([1.0, 3.0]) == 0.8
+    with pytest.raises(ValueError):
+        tftbase.jain_fairness([])
+
+
+def test_parse_json_last_line() -> None:
+    out = 'connected\n{"requests": 3, "unit": "x"}\n\n'
+    assert tftbase.parse_json_last_line(out) == {"requests": 3, "unit": "x"}
+    assert tftbase.parse_json_last_line(out, numeric_keys=["requests"])["unit"] == "x"
+    with pytest.raises(ValueError, match="lacks 'unit'"):
+        tftbase.parse_json_last_line(out, numeric_keys=["requests", "unit"])
+    with pytest.raises(ValueError):
+        tftbase.parse_json_last_line(" \n")
+    with pytest.raises(ValueError):
+        tftbase.parse_json_last_line('{"requests": 3}\nconnected\n')
+    with pytest.raises(ValueError):
+        tftbase.parse_json_last_line("[1, 2]\n")
@@ -0,0 +1,33 @@
+import os
+import pathlib
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import tftbase  # noqa: E402
+
+from trafficFlowTests import TrafficFlowTests  # noqa: E402
+
+
+test_dir = os.path.dirname(__file__)
+
+
+def test_save_partial_results(tmp_path: pathlib.Path) -> None:
+    expected = tftbase.TftResults.parse_from_file(os.path.join(test_dir, "input1.json"))
+
+    log_file = tmp_path / "2024-01-01_00-00-00.json"
+    journal_file = log_file.with_suffix(".jsonl")
+    with tftbase.TftResultsWriter(journal_file) as writer:
+        writer.write(expected.lst[0])
+
+    # A failed test run keeps the results that completed in the results
+    # file, and does not leave the journal behind.
+    TrafficFlowTests()._save_partial_results(journal_file, log_file)
+    assert not journal_file.exists()
+    results = tftbase.TftResults.parse_from_file(log_file)
+    assert results.lst == expected.lst[:1]
+    assert (tmp_path / "2024-01-01_00-00-00-RESULTS").exists()
+
+    # Without a journal, there is nothing to save.
+    TrafficFlowTests()._save_partial_results(journal_file, tmp_path / "other.json")
+    assert not (tmp_path / "other.json").exists()
@@ -0,0 +1,108 @@
+import os
+import sys
+
+from typing import Optional
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from vfRepCache import VfRepCache  # noqa: E402
+
+
+def test_vf_rep_cache_pciaddr() -> None:
+    cache = VfRepCache()
+    calls: list[str] = []
+
+    def _fetch(pciaddr: Optional[str]) -> Optional[str]:
+        calls.append("fetch")
+        return pciaddr
+
+    assert cache.get_pciaddr("pod1", "uid1", "eth0", lambda: _fetch(None)) is None
+    assert cache.get_pciaddr(
+        "pod1", "uid1", "eth0", lambda: _fetch("0000:03:00.2")
+    ) == ("0000:03:00.2")
+    assert cache.get_pciaddr("pod1", "uid1", "eth0", lambda: _fetch("other")) == (
+        "0000:03:00.2"
+    )
+    assert len(calls) == 2
+
+    # A recreated pod has a new UID.
+    assert cache.get_pciaddr(
+        "pod1", "uid2", "eth0", lambda: _fetch("0000:03:00.3")
+    ) == ("0000:03:00.3")
+    assert len(calls) == 3
+
+    cache.clear()
+    assert cache.get_pciaddr("pod1", "uid1", "eth0", lambda: _fetch(None)) is None
+
+
+def test_vf_rep_cache_vf_rep() -> None:
+    cache = VfRepCache()
+    listings = ["0000:03:00.2=rep0 0000:03:00.3=rep1", "0000:03:00.4=rep2"]
+    fetched: list[str] = []
+
+    def _fetch() -> Optional[str]:
+        if not listings:
+            return None
+        fetched.append(listings[0])
+        return listings.pop(0)
+
+    def _resolve(devices: str, pciaddr: str) -> Optional[str]:
+        return dict(d.split("=") for d in devices.split()).get(pciaddr)
+
+    # Two pods on the node are resolved with one listing.
+    assert cache.get_vf_rep("node1", "0000:03:00.2", _fetch, _resolve) == "rep0"
+    assert cache.get_vf_rep("node1", "0000:03:00.3", _fetch, _resolve) == "rep1"
+    assert cache.get_vf_rep("node1", "0000:03:00.3", _fetch, _resolve) == "rep1"
+    assert len(fetched) == 1
+
+    # Not in the cached listing. It is fetched once more.
+    assert cache.get_vf_rep("node1", "0000:03:00.4", _fetch, _resolve) == "rep2"
+    assert len(fetched) == 2
+
+    # Fetching fails, that is not cached.
+    assert cache.get_vf_rep("node1", "0000:03:00.9", _fetch, _resolve) is None
+    assert cache.get_vf_rep("node2", "0000:03:00.2", _fetch, _resolve) is None
+    listings.append("0000:03:00.2=rep5")
+    assert cache.get_vf_rep("node2", "0000:03:00.2", _fetch, _resolve) == "rep5"
+
+
+def test_vf_rep_cache_other_pciaddrs() -> None:
+    cache = VfRepCache()
+    fetched: list[str] = []
+
+    def _fetch() -> Optional[str]:
+        fetched.append("fetch")
+        return "0000:03:00.2=rep0 0000:03:00.3=rep1"
+
+    def _fail() -> Optional[str]:
+        return None
+
+    def _resolve(devices: str, pciaddr: str) -> Optional[str]:
+        return dict(d.split("=") for d in devices.split()).get(pciaddr)
+
+    # The representors of all pods on the node are resolved with one listing.
+    assert (
+        cache.get_vf_rep(
+            "node1",
+            "0000:03:00.2",
+            _fetch,
+            _resolve,
+            other_pciaddrs=("0000:03:00.2", "0000:03:00.3", "0000:03:00.9"),
+        )
+        == "rep0"
+    )
+    assert len(fetched) == 1
+    assert cache.get_vf_rep("node1", "0000:03:00.3", _fail, _resolve) == "rep1"
+
+    # Other PCI addresses that are not in the listing don't cause a fetch.
+    assert (
+        cache.get_vf_rep(
+            "node1",
+            "0000:03:00.3",
+            _fetch,
+            _resolve,
+            other_pciaddrs=("0000:03:00.9",),
+        )
+        == "rep1"
+    )
+    assert len(fetched) == 1
@@ -5,6 +5,7 @@ import math
 import os
 import re
 import shlex
+import threading
 import typing
 
 from dataclasses import dataclass
@@ -17,6 +18,8 @@ from ktoolbox import common
 from ktoolbox import host
 from ktoolbox.common import strict_dataclass
 
+import lazyJson
+
 
 logger = common.ExtendedLogger("tft." + __name__)
 
@@ -30,8 +33,14 @@ ENV_TFT_TEST_IMAGE_DEFAULT = (
     "ghcr.io/ovn-kubernetes/kubernetes-traffic-flow-tests:latest"
 )
 
+ENV_TFT_K8S_API = "TFT_K8S_API"
+
 ENV_TFT_MANIFESTS_OVERRIDES = "TFT_MANIFESTS_OVERRIDES"
 ENV_TFT_MANIFESTS_YAMLS = "TFT_MANIFESTS_YAMLS"
+ENV_TFT_MANIFESTS_DUMP = "TFT_MANIFESTS_DUMP"
+
+ENV_TFT_CPU_SAMPLE_INTERVAL = "TFT_CPU_SAMPLE_INTERVAL"
+ENV_TFT_CPU_SAMPLE_INTERVAL_DEFAULT = 1.0
 
 
 def get_environ(name: str) -> Optional[str]:
@@ -82,6 +91,14 @@ def get_tft_privileged_pod() -> Optional[bool]:
     return value
 
 
+@functools.cache
+def get_tft_k8s_api() -> bool:
+    d = get_environ(ENV_TFT_K8S_API)
+    value = common.str_to_bool(d, on_default=True)
+    logger.info(f"env: {ENV_TFT_K8S_API}={common.bool_to_str(value)}")
+    return value
+
+
 @functools.cache
 def get_tft_manifests_overrides() -> Optional[str]:
     d = get_environ(ENV_TFT_MANIFESTS_OVERRIDES)
@@ -116,6 +133,33 @@ def get_tft_manifests_yamls() -> str:
     return path
 
 
+@functools.cache
+def get_tft_manifests_dump() -> bool:
+    d = get_environ(ENV_TFT_MANIFESTS_DUMP)
+    value = common.str_to_bool(d, on_default=False)
+    logger.info(f"env: {ENV_TFT_MANIFESTS_DUMP}={common.bool_to_str(value)}")
+    return value
+
+
+@functools.cache
+def get_tft_cpu_sample_interval() -> float:
+    value = ENV_TFT_CPU_SAMPLE_INTERVAL_DEFAULT
+    d = get_environ(ENV_TFT_CPU_SAMPLE_INTERVAL)
+    if d:
+        try:
+            v = float(d)
+        except ValueError:
+            v = math.nan
+        if v > 0.0 and math.isfinite(v):
+            value = v
+        else:
+            logger.error(
+                f'env: invalid environment variable in {ENV_TFT_CPU_SAMPLE_INTERVAL}="{shlex.quote(d)}". Set to a positive number of seconds'
+            )
+    logger.info(f"env: {ENV_TFT_CPU_SAMPLE_INTERVAL}={value}")
+    return value
+
+
 TFT_TESTS = "tft-tests"
 
 
@@ -218,6 +262,50 @@ def eval_binary_opt_in(
     return a, b
 
 
+def percentile(values: typing.Sequence[float], q: float) -> float:
+    # The q-th percentile (0 <= q <= 100), interpolating linearly between
+    # the closest ranks.
+    if not values:
+        raise ValueError("percentile of empty sequence")
+    lst = sorted(values)
+    pos = (len(lst) - 1) * q / 100.0
+    idx = int(pos)
+    if idx + 1 >= len(lst):
+        return lst[-1]
+    return lst[idx] + (lst[idx + 1] - lst[idx]) * (pos - idx)
+
+
+def jain_fairness(values: typing.Sequence[float]) -> float:
+    # Jain's fairness index (sum x)^2 / (n * sum x^2). It is 1.0 if all values
+    # are equal and 1/n if only one of them is non-zero.
+    if not values:
+        raise ValueError("fairness of empty sequence")
+    sum_sq = sum(v * v for v in values)
+    if sum_sq == 0:
+        return 1.0
+    return sum(values) ** 2 / (len(values) * sum_sq)
+
+
+def parse_json_last_line(
+    out: str,
+    *,
+    numeric_keys: typing.Iterable[str] = (),
+) -> dict[str, Any]:
+    # The tools that run in the test pods (http-load, simple-tcp-server-client
+    # with "--json") print their result as one JSON object on the last line
+    # of stdout. The "numeric_keys" must be present with a number.
+    lines = [line for line in out.splitlines() if line.strip()]
+    if not lines:
+        raise ValueError("no output")
+    result = json.loads(lines[-1])
+    if not isinstance(result, dict):
+        raise ValueError(f"unexpected result {repr(result)}")
+    for key in numeric_keys:
+        if not isinstance(result.get(key), (int, float)):
+            raise ValueError(f"result lacks {repr(key)}")
+    return result
+
+
 class ClusterMode(Enum):
     SINGLE = 1
     DPU = 3
@@ -235,6 +323,7 @@ class TestType(Enum):
     NETPERF_TCP_STREAM = 4
     NETPERF_TCP_RR = 5
     SIMPLE = 6
+    NETPERF_TCP_CRR = 7
 
 
 class PodType(Enum):
@@ -345,10 +434,52 @@ class Bitrate:
             return "None"
         return bitrate.pretty_str
 
+    @staticmethod
+    def aggregate(bitrates: typing.Iterable["Bitrate"]) -> "Bitrate":
+        # Sum up the bitrates of flows that ran at the same time. A direction
+        # is only set, if any of the bitrates has a value for it.
+        def _sum(values: list[Optional[float]]) -> Optional[float]:
+            values2 = [v for v in values if v is not None]
+            if not values2:
+                return None
+            return sum(values2)
+
+        lst = list(bitrates)
+        return Bitrate(
+            tx=_sum([b.tx for b in lst]),
+            rx=_sum([b.rx for b in lst]),
+        )
+
 
 Bitrate.NA = Bitrate()
 
 
+@strict_dataclass
+@dataclass(frozen=True, kw_only=True)
+class Latency:
+    """The latency of request/response transactions, in microseconds."""
+
+    min: float
+    p50: float
+    p90: float
+    p99: float
+    max: float
+    stddev: float
+
+    def is_passing(self, threshold_p99: Optional[float]) -> bool:
+        if threshold_p99 is None:
+            return True
+        return self.p99 <= threshold_p99
+
+    @property
+    def pretty_str(self) -> str:
+        return f"[p50={self.p50},p99={self.p99},max={self.max}]"
+
+    @property
+    def log_str(self) -> str:
+        return f"p50={self.p50:.1f} p90={self.p90:.1f} p99={self.p99:.1f} max={self.max:.1f} usec"
+
+
 @strict_dataclass
 @dataclass(frozen=True, kw_only=True)
 class PodInfo:
@@ -433,6 +564,21 @@ class FlowTestOutput(AggregatableOutput):
     bitrate_gbps: Bitrate
     eval_result: Optional[EvalResult] = None
 
+    @property
+    def latency_us(self) -> Optional[Latency]:
+        # Only request/response tests have a latency. It is part of the
+        # free-form "result". A latency that is there but malformed raises
+        # a ValueError, it does not count as "no latency".
+        data = self.result.get("latency_us")
+        if data is None:
+            return None
+        if not isinstance(data, dict):
+            raise ValueError(f"invalid latency_us {data!r}")
+        try:
+            return Latency(**data)
+        except TypeError as e:
+            raise ValueError(f"invalid latency_us {data!r}: {e}")
+
     def clone(
         self,
         *,
@@ -479,6 +625,10 @@ class TftResultBuilder:
     _flow_test: Optional[FlowTestOutput] = None
     _plugins: list[PluginOutput] = dataclasses.field(default_factory=list)
 
+    @property
+    def flow_test(self) -> Optional[FlowTestOutput]:
+        return self._flow_test
+
     def set_flow_test(self, flow_test: FlowTestOutput) -> None:
         if self._flow_test is not None:
             raise RuntimeError("Cannot set multiple FlowTestOutput results")
@@ -526,6 +676,256 @@ class TftResult:
         return self.eval_flow_test_success and self.eval_plugins_success
 
 
+# The raw output of the flow test and the plugins is big and rarely needed.
+# See TftResults.parse_from_file().
+_LAZY_SPEC = {
+    "tft-tests": [
+        {
+            "flow_test": {"result": lazyJson.LAZY},
+            "plugins": [{"result": lazyJson.LAZY}],
+        },
+    ],
+}
+
+
+# Decoders for the serialized results. TftResults.parse() used
+# common.dataclass_from_dict(), which inspects the type hints of each nested
+# dataclass for every entry. With thousands of result files, that dominates.
+# These decoders know the layout of each type. Missing keys get the default
+# of the field, so that files from before a field was added still load.
+# Errors are ValueErrors with the path of the offending key. With
+# "validate", they reject unknown keys and construct the objects normally
+# (with the checks of @strict_dataclass). Otherwise, the objects are created
+# without any checks, which is only suitable for trusted files (that were
+# written by us).
+
+
+E = typing.TypeVar("E", bound=Enum)
+
+
+_decode_fields: dict[type, dict[str, "dataclasses.Field[Any]"]] = {}
+
+_MISSING = object()
+
+
+class _Decode(typing.Generic[T]):
+    __slots__ = ("cls", "data", "validate", "path", "_fields")
+
+    def __init__(self, cls: type[T], data: Any, validate: bool, path: str) -> None:
+        if not isinstance(data, dict):
+            raise ValueError(
+                f"{path}: {cls.__name__} expects a dictionary but got {data!r}"
+            )
+        fields = _decode_fields.get(cls)
+        if fields is None:
+            fields = {f.name: f for f in dataclasses.fields(typing.cast(Any, cls))}
+            _decode_fields[cls] = fields
+        self.cls = cls
+        self.data: dict[str, Any] = data
+        self.validate = validate
+        self.path = path
+        self._fields = fields
+
+    def key_path(self, key: str) -> str:
+        return f"{self.path}.{key}"
+
+    def __getitem__(self, key: str) -> Any:
+        value = self.data.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        field = self._fields[key]
+        if field.default is not dataclasses.MISSING:
+            return field.default
+        if field.default_factory is not dataclasses.MISSING:
+            return field.default_factory()
+        raise ValueError(f"{self.key_path(key)}: missing key")
+
+    def get(self, key: str, default: Any) -> Any:
+        return self.data.get(key, default)
+
+    def new(self, **kwargs: Any) -> T:
+        cls = self.cls
+        if not self.validate:
+            obj = object.__new__(cls)
+            obj.__dict__.update(kwargs)
+            return obj
+        unknown = self.data.keys() - self._fields.keys()
+        if unknown:
+            raise ValueError(f"{self.key_path(sorted(unknown)[0])}: unknown key")
+        # A lazy JSON object always decodes to a dict[str, Any]. Don't let the
+        # checks of @strict_dataclass load it.
+        lazy = {
+            k: v
+            for k, v in kwargs.items()
+            if isinstance(v, lazyJson.LazyDict) and not v.is_loaded
+        }
+        try:
+            # The constructor runs __post_init__() and the checks of
+            # @strict_dataclass.
+            obj = cls(**{**kwargs, **{k: {} for k in lazy}})
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"{self.path}: invalid {cls.__name__}: {e}")
+        for k, v in lazy.items():
+            object.__setattr__(obj, k, v)
+        return obj
+
+
+def _decode_enum(enum_type: type[E], value: Any, path: str) -> E:
+    if not isinstance(value, str):
+        raise ValueError(
+            f"{path}: {enum_type.__name__} expects a name but got {value!r}"
+        )
+    try:
+        return enum_type[value]
+    except KeyError:
+        raise ValueError(f"{path}: {value!r} is not a valid {enum_type.__name__}")
+
+
+def _decode_float(value: Any) -> Any:
+    if isinstance(value, int) and not isinstance(value, bool):
+        return float(value)
+    return value
+
+
+def _decode_pod_info(data: Any, validate: bool, path: str) -> PodInfo:
+    d = _Decode(PodInfo, data, validate, path)
+    return d.new(
+        name=d["name"],
+        pod_type=_decode_enum(PodType, d["pod_type"], d.key_path("pod_type")),
+        is_tenant=d["is_tenant"],
+        index=d["index"],
+    )
+
+
+def _decode_test_metadata(data: Any, validate: bool, path: str) -> TestMetadata:
+    d = _Decode(TestMetadata, data, validate, path)
+    return d.new(
+        tft_idx=d["tft_idx"],
+        test_cases_idx=d["test_cases_idx"],
+        connections_idx=d["connections_idx"],
+        test_case_id=_decode_enum(
+            TestCaseType, d["test_case_id"], d.key_path("test_case_id")
+        ),
+        test_type=_decode_enum(TestType, d["test_type"], d.key_path("test_type")),
+        reverse=d["reverse"],
+        server=_decode_pod_info(d["server"], validate, d.key_path("server")),
+        client=_decode_pod_info(d["client"], validate, d.key_path("client")),
+    )
+
+
+def _decode_bitrate(data: Any, validate: bool, path: str) -> Bitrate:
+    # Bitrate has its own __init__(), where both fields default to None.
+    d = _Decode(Bitrate, data, validate, path)
+    return d.new(
+        tx=_decode_float(d.get("tx", None)),
+        rx=_decode_float(d.get("rx", None)),
+    )
+
+
+def _decode_eval_result(data: Any, validate: bool, path: str) -> Optional[EvalResult]:
+    if data is None:
+        return None
+    d = _Decode(EvalResult, data, validate, path)
+    return d.new(
+        success=d["success"],
+        msg=d["msg"],
+        bitrate_threshold_rx=_decode_float(d["bitrate_threshold_rx"]),
+        bitrate_threshold_tx=_decode_float(d["bitrate_threshold_tx"]),
+    )
+
+
+def _decode_flow_test_output(data: Any, validate: bool, path: str) -> FlowTestOutput:
+    d = _Decode(FlowTestOutput, data, validate, path)
+    return d.new(
+        success=d["success"],
+        msg=d["msg"],
+        tft_metadata=_decode_test_metadata(
+            d["tft_metadata"], validate, d.key_path("tft_metadata")
+        ),
+        command=d["command"],
+        result=d["result"],
+        bitrate_gbps=_decode_bitrate(
+            d["bitrate_gbps"], validate, d.key_path("bitrate_gbps")
+        ),
+        eval_result=_decode_eval_result(
+            d["eval_result"], validate, d.key_path("eval_result")
+        ),
+    )
+
+
+def _decode_plugin_metadata(data: Any, validate: bool, path: str) -> PluginMetadata:
+    d = _Decode(PluginMetadata, data, validate, path)
+    return d.new(
+        plugin_name=d["plugin_name"],
+        node_name=d["node_name"],
+        pod_name=d["pod_name"],
+    )
+
+
+def _decode_plugin_output(data: Any, validate: bool, path: str) -> PluginOutput:
+    d = _Decode(PluginOutput, data, validate, path)
+    return d.new(
+        success=d["success"],
+        msg=d["msg"],
+        command=d["command"],
+        result=d["result"],
+        plugin_metadata=_decode_plugin_metadata(
+            d["plugin_metadata"], validate, d.key_path("plugin_metadata")
+        ),
+    )
+
+
+def _decode_tft_result(data: Any, validate: bool, path: str) -> TftResult:
+    d = _Decode(TftResult, data, validate, path)
+    plugins = d["plugins"]
+    if not isinstance(plugins, list):
+        raise ValueError(f"{d.key_path('plugins')}: expects a list but got {plugins!r}")
+    return d.new(
+        flow_test=_decode_flow_test_output(
+            d["flow_test"], validate, d.key_path("flow_test")
+        ),
+        plugins=tuple(
+            _decode_plugin_output(p, validate, f"{d.key_path('plugins')}[{idx}]")
+            for idx, p in enumerate(plugins)
+        ),
+    )
+
+
+class TftResultsWriter:
+    """Append-only journal of the results of a test run, in JSON Lines.
+
+    Each TftResult is written on its own line as soon as it is built, and
+    flushed to disk. If the test run crashes, the results up to then are
+    preserved. TftResults.parse_from_file() reads the journal too.
+    """
+
+    def __init__(self, filename: str | Path) -> None:
+        self.filename = str(filename)
+        self._lock = threading.Lock()
+        self._file: Optional[typing.IO[str]] = open(self.filename, "w")
+
+    def write(self, tft_result: "TftResult") -> None:
+        line = json.dumps(common.dataclass_to_dict(tft_result)) + "\n"
+        with self._lock:
+            if self._file is None:
+                raise RuntimeError(f"journal {self.filename} is already closed")
+            self._file.write(line)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def __enter__(self) -> "TftResultsWriter":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+
 @strict_dataclass
 @dataclass(frozen=True, kw_only=True)
 class TftResults:
@@ -562,7 +962,10 @@ class TftResults:
         data: Any,
         *,
         filename: Optional[str | Path] = None,
+        validate: bool = True,
     ) -> "TftResults":
+        # With "validate=False", the results are not type checked. Only use
+        # that for trusted input, that was written by tft.py.
 
         err = "data"
         if filename is not None:
@@ -588,9 +991,13 @@ class TftResults:
             )
 
         lst: list[TftResult] = []
-        for data_tft_test in data_tft_tests:
+        for idx, data_tft_test in enumerate(data_tft_tests):
             try:
-                result = common.dataclass_from_dict(TftResult, data_tft_test)
+                result = _decode_tft_result(
+                    data_tft_test,
+                    validate,
+                    f"{TftResults.TFT_TESTS}[{idx}]",
+                )
             except Exception as e:
                 raise RuntimeError(f"{err} has invalid data: {e}")
             lst.append(result)
@@ -610,19 +1017,66 @@ class TftResults:
         )
 
     @staticmethod
-    def parse_from_file(filename: str | Path) -> "TftResults":
+    def _parse_jsonl(text: str, *, filename: str | Path) -> Optional[list[Any]]:
+        # The journal of TftResultsWriter has one TftResult per line. If the
+        # test crashed while writing, the last line may be truncated.
+        lines = [line for line in text.splitlines() if line.strip()]
+        lst: list[Any] = []
+        for idx, line in enumerate(lines):
+            try:
+                data = json.loads(line)
+            except ValueError:
+                if idx > 0 and idx == len(lines) - 1:
+                    logger.warning(
+                        f"File {filename} has a truncated last line, which is ignored"
+                    )
+                    break
+                return None
+            if not isinstance(data, dict) or "flow_test" not in data:
+                return None
+            lst.append(data)
+        return lst
+
+    @staticmethod
+    def parse_from_file(
+        filename: str | Path,
+        *,
+        validate: bool = True,
+        lazy: bool = False,
+    ) -> "TftResults":
+        # Accepts both, the JSON file with all results and the JSON Lines
+        # journal written by TftResultsWriter.
+        #
+        # With "lazy", the raw "result" of the flow test and the plugins
+        # (which is most of the file) is only decoded when it is accessed.
+        # That suits users that only need the metadata, success and bitrate.
         try:
             f = open(filename, "r")
         except Exception as e:
             raise RuntimeError(f"cannot load file {filename}: {e}")
         try:
-            data = json.load(f)
-        except Exception:
-            raise RuntimeError(f"File {filename} does not contain valid JSON")
+            text = f.read()
+        except Exception as e:
+            raise RuntimeError(f"cannot load file {filename}: {e}")
         finally:
             f.close()
 
-        return TftResults.parse(data, filename=filename)
+        data: Any
+        try:
+            if lazy:
+                data = lazyJson.loads(text, _LAZY_SPEC)
+            else:
+                data = json.loads(text)
+        except ValueError:
+            data = None
+        if not isinstance(data, dict) or TftResults.TFT_TESTS not in data:
+            lst = TftResults._parse_jsonl(text, filename=filename)
+            if lst is not None:
+                data = {TftResults.TFT_TESTS: lst}
+            elif data is None:
+                raise RuntimeError(f"File {filename} does not contain valid JSON")
+
+        return TftResults.parse(data, filename=filename, validate=validate)
 
     def group_by_success(self) -> tuple["TftResults", "TftResults"]:
 
@@ -1,18 +1,28 @@
 import logging
+import os
+import shutil
 import task
+import threading
+import time
 
 from pathlib import Path
+from typing import Optional
 
 from ktoolbox import common
 from ktoolbox import host
 
+import connectionScheduler
 import testConfig
 import tftbase
 
 from evaluator import Evaluator
+from k8sApiClient import K8sApiError
+from manifestBatch import ManifestBatch
+from podPool import PodPool
 from task import Task
 from testConfig import ConfigDescriptor
 from testSettings import TestSettings
+from tftbase import Bitrate
 from tftbase import TftResult
 from tftbase import TftResults
 
@@ -20,7 +30,54 @@ from tftbase import TftResults
 logger = common.ExtendedLogger("tft." + __name__)
 
 
+def create_test_case_tasks(
+    cfg_descr: ConfigDescriptor,
+    pod_pool: PodPool,
+) -> list[Task]:
+    # The tasks of all instances of all connections of the test case, as they
+    # are created when the test case runs.
+    tasks: list[Task] = []
+    for cfg_descr2 in cfg_descr.describe_all_connections():
+        connection = cfg_descr2.get_connection()
+        for instance_index in range(connection.instances):
+            ts = TestSettings(
+                cfg_descr=cfg_descr2,
+                instance_index=instance_index,
+                reverse=False,
+                pod_pool=pod_pool,
+            )
+            s, c = connection.test_type_handler.create_server_client(ts)
+            tasks.extend((s, c))
+            for plugin in connection.plugins:
+                tasks.extend(
+                    plugin.plugin.enable(
+                        ts=ts,
+                        perf_server=s,
+                        perf_client=c,
+                        tenant=True,
+                    )
+                )
+    return tasks
+
+
+def test_case_resources(
+    cfg_descr: ConfigDescriptor,
+    pod_pool: PodPool,
+) -> frozenset[str]:
+    # The pod names and ports that the test case uses (see
+    # Task.pod_resources()).
+    return frozenset(
+        r
+        for t in create_test_case_tasks(cfg_descr, pod_pool)
+        for r in t.pod_resources()
+    )
+
+
 class TrafficFlowTests:
+    def __init__(self) -> None:
+        # The journal of the currently running test_run().
+        self._results_writer: Optional[tftbase.TftResultsWriter] = None
+
     def _configure_namespace(self, cfg_descr: ConfigDescriptor) -> None:
         namespace = cfg_descr.get_tft().namespace
         logger.info(f"Configuring namespace {namespace}")
@@ -31,21 +88,55 @@ class TrafficFlowTests:
             die_on_error=True,
         )
 
+    def _cleanup_testspace_api(self, cfg_descr: ConfigDescriptor) -> bool:
+        api_client = cfg_descr.tc.api_client(tenant=True)
+        if api_client is None:
+            return False
+        namespace = cfg_descr.get_tft().namespace
+        try:
+            for resource in ("services", "multi-networkpolicies", "pods"):
+                try:
+                    api_client.delete_collection(
+                        resource,
+                        namespace=namespace,
+                        label_selector=tftbase.TFT_TESTS,
+                    )
+                except K8sApiError as e:
+                    # Without multus, there are no multi-networkpolicies.
+                    if e.status != 404:
+                        raise
+            # Like "oc delete", wait for the pods to be gone. The next test
+            # might create pods with the same names.
+            end_time = time.monotonic() + 600
+            while api_client.list_items(
+                "pods",
+                namespace=namespace,
+                label_selector=tftbase.TFT_TESTS,
+            ):
+                if time.monotonic() > end_time:
+                    raise RuntimeError("Test pods did not go away")
+                time.sleep(0.5)
+        except (K8sApiError, OSError) as e:
+            logger.warning(f"Cleanup via API failed: {e}")
+            return False
+        return True
+
     def _cleanup_previous_testspace(self, cfg_descr: ConfigDescriptor) -> None:
         namespace = cfg_descr.get_tft().namespace
         client = cfg_descr.tc.client_tenant
         logger.info(
             f"Cleaning pods, services and multi-networkpolicies with label tft-tests in namespace {namespace}"
         )
-        client.oc("delete pods -l tft-tests", namespace=namespace)
-        client.oc("delete services -l tft-tests", namespace=namespace)
-        client.oc(
-            "delete multi-networkpolicies -l tft-tests",
-            namespace=namespace,
-            check_success=client.check_success_delete_ignore_noexist(
-                "multi-networkpolicies"
-            ),
-        )
+        if not self._cleanup_testspace_api(cfg_descr):
+            client.oc("delete pods -l tft-tests", namespace=namespace)
+            client.oc("delete services -l tft-tests", namespace=namespace)
+            client.oc(
+                "delete multi-networkpolicies -l tft-tests",
+                namespace=namespace,
+                check_success=client.check_success_delete_ignore_noexist(
+                    "multi-networkpolicies"
+                ),
+            )
 
         logger.info(
             f"Cleaning external containers {task.EXTERNAL_PERF_SERVER} (if present)"
@@ -65,93 +156,209 @@ class TrafficFlowTests:
         logger.info(f"Logs will be written to {log_file}")
         return log_file
 
-    def _run_test_case_instance(
+    def _run_test_case_instances(
         self,
         cfg_descr: ConfigDescriptor,
-        instance_index: int,
+        instance_indexes: list[int],
+        pod_pool: PodPool,
         reverse: bool = False,
-    ) -> TftResult:
+    ) -> list[TftResult]:
+        # Run the given instances of a connection at the same time. Each
+        # instance has its own server/client pair (on its own port) and
+        # plugins. They all share one client-monitor barrier, so the traffic
+        # starts together, and we only tear down after all clients finished.
         connection = cfg_descr.get_connection()
 
-        servers: list[task.ServerTask] = []
-        clients: list[task.ClientTask] = []
-        monitors: list[Task] = []
+        all_ts: list[TestSettings] = []
+        all_tasks: list[list[Task]] = []
+        clmo_parties = 0
 
-        ts = TestSettings(
-            cfg_descr=cfg_descr,
-            instance_index=instance_index,
-            reverse=reverse,
-        )
-        s, c = connection.test_type_handler.create_server_client(ts)
-        servers.append(s)
-        clients.append(c)
-        for plugin in connection.plugins:
-            m = plugin.plugin.enable(
-                ts=ts,
-                perf_server=servers[-1],
-                perf_client=clients[-1],
-                tenant=True,
+        for instance_index in instance_indexes:
+            ts = TestSettings(
+                cfg_descr=cfg_descr,
+                instance_index=instance_index,
+                reverse=reverse,
+                pod_pool=pod_pool,
             )
-            monitors.extend(m)
+            logger.info(f"Starting test {ts.get_test_info()}")
+            s, c = connection.test_type_handler.create_server_client(ts)
+            monitors: list[Task] = []
+            for plugin in connection.plugins:
+                m = plugin.plugin.enable(
+                    ts=ts,
+                    perf_server=s,
+                    perf_client=c,
+                    tenant=True,
+                )
+                monitors.extend(m)
+            all_ts.append(ts)
+            all_tasks.append([s, c, *monitors])
+            clmo_parties += 1 + len(monitors)
+
+        tasks_flat = [t for tasks in all_tasks for t in tasks]
 
-        for t in servers + clients + monitors:
+        for t in tasks_flat:
             t.initialize()
 
-        ts.initialize_clmo_barrier(len(clients) + len(monitors))
+        manifest_batch = ManifestBatch(cfg_descr.tc)
+        for t in tasks_flat:
+            t.prepare_manifests(manifest_batch)
+        manifest_batch.apply()
 
-        for tasks in servers + clients + monitors:
-            tasks.start_setup()
+        clmo_barrier = threading.Barrier(parties=clmo_parties)
+        for ts in all_ts:
+            ts.attach_clmo_barrier(clmo_barrier)
 
-        ts.event_server_alive.wait()
+        for t in tasks_flat:
+            t.start_setup()
 
-        for tasks in servers + clients + monitors:
-            tasks.start_task()
+        for ts in all_ts:
+            ts.event_server_alive.wait()
 
-        ts.event_client_finished.wait()
+        for t in tasks_flat:
+            t.start_task()
 
-        for tasks in servers + clients + monitors:
-            tasks.finish_task()
+        for ts in all_ts:
+            ts.event_client_finished.wait()
 
-        for tasks in servers + clients + monitors:
-            tasks.finish_setup()
+        for t in tasks_flat:
+            t.finish_task()
 
-        tft_result_builder = tftbase.TftResultBuilder()
+        for t in tasks_flat:
+            t.finish_setup()
 
-        for tasks in servers + clients + monitors:
-            tasks.aggregate_output(tft_result_builder)
+        tft_results: list[TftResult] = []
+        for tasks in all_tasks:
+            tft_result_builder = tftbase.TftResultBuilder()
+            for t in tasks:
+                t.aggregate_output(tft_result_builder)
+            tft_result = tft_result_builder.build()
+            if self._results_writer is not None:
+                self._results_writer.write(tft_result)
+            tft_results.append(tft_result)
+
+        if len(tft_results) > 1:
+            bitrate = Bitrate.aggregate(r.flow_test.bitrate_gbps for r in tft_results)
+            logger.info(
+                f"Aggregate bitrate of {len(tft_results)} parallel instances of {connection.name}{' (reverse)' if reverse else ''}: {bitrate.pretty_str}"
+            )
 
-        return tft_result_builder.build()
+        return tft_results
 
-    def _run_test_case(self, cfg_descr: ConfigDescriptor) -> list[TftResult]:
-        # TODO Allow for multiple connections / instances to run simultaneously
+    def _run_connection(
+        self,
+        cfg_descr: ConfigDescriptor,
+        pod_pool: PodPool,
+    ) -> list[TftResult]:
+        connection = cfg_descr.get_connection()
+        logger.info(f"Starting {connection.name}")
+        logger.info(f"Number Of Simultaneous connections {connection.instances}")
+        if connection.instances_parallel:
+            instance_groups = [list(range(connection.instances))]
+        else:
+            instance_groups = [[idx] for idx in range(connection.instances)]
         tft_results: list[TftResult] = []
-        for cfg_descr2 in cfg_descr.describe_all_connections():
-            connection = cfg_descr2.get_connection()
-            logger.info(f"Starting {connection.name}")
-            logger.info(f"Number Of Simultaneous connections {connection.instances}")
-            for instance_index in range(connection.instances):
-                tft_results.append(
-                    self._run_test_case_instance(
-                        cfg_descr2,
-                        instance_index=instance_index,
-                    )
+        for instance_indexes in instance_groups:
+            tft_results.extend(
+                self._run_test_case_instances(
+                    cfg_descr,
+                    instance_indexes,
+                    pod_pool,
                 )
-                if connection.test_type_handler.can_run_reverse():
-                    tft_results.append(
-                        self._run_test_case_instance(
-                            cfg_descr2,
-                            instance_index=instance_index,
-                            reverse=True,
-                        )
+            )
+            if connection.test_type_handler.can_run_reverse():
+                tft_results.extend(
+                    self._run_test_case_instances(
+                        cfg_descr,
+                        instance_indexes,
+                        pod_pool,
+                        reverse=True,
                     )
-                self._cleanup_previous_testspace(cfg_descr2)
+                )
         return tft_results
 
-    def _run_test_cases(self, cfg_descr: ConfigDescriptor) -> TftResults:
-        tft_results_lst: list[TftResult] = []
-        for cfg_descr2 in cfg_descr.describe_all_test_cases():
-            tft_results_lst.extend(self._run_test_case(cfg_descr2))
-        return TftResults(lst=tuple(tft_results_lst))
+    def _run_test_case(
+        self,
+        cfg_descr: ConfigDescriptor,
+        pod_pool: PodPool,
+    ) -> list[TftResult]:
+        max_parallel = cfg_descr.get_tft().max_parallel_connections
+        cfg_descrs = list(cfg_descr.describe_all_connections())
+
+        if max_parallel <= 1 or len(cfg_descrs) <= 1:
+            results = [self._run_connection(c, pod_pool) for c in cfg_descrs]
+        else:
+            # Connections that don't share a node run at the same time.
+            logger.info(
+                f"Run {len(cfg_descrs)} connections with up to {max_parallel} in parallel"
+            )
+            results = connectionScheduler.run_scheduled(
+                lambda idx: self._run_connection(cfg_descrs[idx], pod_pool),
+                resources=[
+                    connectionScheduler.connection_resources(c) for c in cfg_descrs
+                ],
+                max_parallel=max_parallel,
+            )
+
+        return [r for lst in results for r in lst]
+
+    def _prepare_test_case(
+        self,
+        cfg_descr: ConfigDescriptor,
+        pod_pool: PodPool,
+        busy: frozenset[str],
+    ) -> None:
+        # Create the tasks like the test case would, but only to create their
+        # pods. When the test case runs later, it reuses them from the pod
+        # pool. Pods that the running test case uses ("busy") are left alone.
+        logger.info(f"Prepare test case {cfg_descr.get_test_case().name} ahead")
+        for t in create_test_case_tasks(cfg_descr, pod_pool):
+            if t.pod_resources() & busy:
+                continue
+            t.initialize()
+            t.prewarm_pod()
+
+    def _run_test_cases(
+        self,
+        cfg_descr: ConfigDescriptor,
+        pod_pool: PodPool,
+    ) -> TftResults:
+        cfg_descrs = list(cfg_descr.describe_all_test_cases())
+        results = connectionScheduler.run_pipelined(
+            lambda idx: self._run_test_case(cfg_descrs[idx], pod_pool),
+            prepare=lambda idx, busy: self._prepare_test_case(
+                cfg_descrs[idx],
+                pod_pool,
+                busy,
+            ),
+            resources=[test_case_resources(c, pod_pool) for c in cfg_descrs],
+            lookahead=cfg_descr.get_tft().prepare_lookahead,
+        )
+        return TftResults(lst=tuple(r for lst in results for r in lst))
+
+    def _link_results_file(self, log_file: Path) -> None:
+        # For backward compatiblity, still provide the "-RESULTS" file. It's
+        # mostly useless now as it's identical to the main file, so only
+        # link it.
+        results_file = log_file.parent / (str(log_file.stem) + "-RESULTS")
+        results_file.unlink(missing_ok=True)
+        try:
+            os.link(log_file, results_file)
+        except OSError:
+            shutil.copyfile(log_file, results_file)
+
+    def _save_partial_results(self, journal_file: Path, log_file: Path) -> None:
+        # The test run failed. Keep the results that completed, as the (not
+        # evaluated) results file instead of the journal.
+        try:
+            tft_results = TftResults.parse_from_file(journal_file)
+            tft_results.serialize_to_file(log_file)
+        except Exception as e:
+            logger.warning(f"Cannot save the results of {journal_file}: {e}")
+            return
+        logger.info(f"Write the results that completed to {log_file}")
+        self._link_results_file(log_file)
+        os.unlink(journal_file)
 
     def test_run(
         self,
@@ -162,8 +369,28 @@ class TrafficFlowTests:
         self._configure_namespace(cfg_descr)
         self._cleanup_previous_testspace(cfg_descr)
 
+        log_file = self._create_log_paths_from_tests(test)
+        journal_file = log_file.with_suffix(".jsonl")
+
         logger.info(f"Running test {test.name} for {test.duration} seconds")
-        tft_results = self._run_test_cases(cfg_descr)
+        logger.info(f"Write results as they complete to {journal_file}")
+        # The pods are kept and reused across instances and test cases. Only
+        # delete them once, when all test cases are done.
+        pod_pool = PodPool()
+        completed = False
+        try:
+            with tftbase.TftResultsWriter(journal_file) as results_writer:
+                self._results_writer = results_writer
+                try:
+                    tft_results = self._run_test_cases(cfg_descr, pod_pool)
+                finally:
+                    self._results_writer = None
+            completed = True
+        finally:
+            if not completed:
+                self._save_partial_results(journal_file, log_file)
+            pod_pool.clear()
+            self._cleanup_previous_testspace(cfg_descr)
 
         logger.info("Evaluating results of tests")
         tft_results = evaluator.eval(tft_results=tft_results)
@@ -171,15 +398,11 @@ class TrafficFlowTests:
         result_status = tft_results.get_pass_fail_status()
         result_status.log()
 
-        log_file = self._create_log_paths_from_tests(test)
-
         logger.info(f"Write results to {log_file}")
         tft_results.serialize_to_file(log_file)
-        # For backward compatiblity, still write the "-RESULTS" file. It's
-        # mostly useless now as it's identical to the main file.
-        tft_results.serialize_to_file(
-            log_file.parent / (str(log_file.stem) + "-RESULTS")
-        )
+        self._link_results_file(log_file)
+        # All results are in the main file now.
+        os.unlink(journal_file)
 
         if not result_status.result:
             logger.error(f"Failure detected in {cfg_descr.get_tft().name} results")
@@ -0,0 +1,134 @@
+import threading
+
+from collections.abc import Iterable
+from typing import Callable
+from typing import Optional
+
+
+class VfRepCache:
+    """The VF representors that were discovered during one test run.
+
+    Finding the VF representor of a pod takes an exec in the pod (to get the
+    PCI address of its interface) and one in the tools pod on the node (to
+    get the representor of that PCI address). Neither changes while the pod
+    lives, and pods are reused across instances, reverse runs and test
+    cases. So remember the PCI address by (pod name, pod UID, ifname) and
+    the representor by (node, pciaddr). A recreated pod has a new UID. When
+    the UID is unknown, the pod pool forgets the pod when it goes away (see
+    forget_pod()).
+
+    On the node, the output of the device listing is kept too. It contains
+    the representors of all VFs, so get_vf_rep() resolves the representors
+    of all perf pods on a node (whose PCI address is known) with one exec.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._key_locks: dict[tuple[str, str], threading.Lock] = {}
+        self._pciaddrs: dict[tuple[str, str, str], str] = {}
+        self._node_devices: dict[str, str] = {}
+        self._vf_reps: dict[tuple[str, str], str] = {}
+
+    def _key_lock(self, key: tuple[str, str]) -> threading.Lock:
+        with self._lock:
+            lock = self._key_locks.get(key)
+            if lock is None:
+                lock = threading.Lock()
+                self._key_locks[key] = lock
+            return lock
+
+    def get_pciaddr(
+        self,
+        pod_name: str,
+        pod_uid: str,
+        ifname: str,
+        fetch: Callable[[], Optional[str]],
+    ) -> Optional[str]:
+        # fetch() determines the PCI address in the pod. A failure (None)
+        # is not cached.
+        key = (pod_name, pod_uid, ifname)
+        with self._key_lock(("pod", pod_name)):
+            with self._lock:
+                pciaddr = self._pciaddrs.get(key)
+            if pciaddr is not None:
+                return pciaddr
+            pciaddr = fetch()
+            if pciaddr is not None:
+                with self._lock:
+                    self._pciaddrs[key] = pciaddr
+            return pciaddr
+
+    def lookup_pciaddr(
+        self,
+        pod_name: str,
+        pod_uid: str,
+        ifname: str,
+    ) -> Optional[str]:
+        with self._lock:
+            return self._pciaddrs.get((pod_name, pod_uid, ifname))
+
+    def forget_pod(self, pod_name: str) -> None:
+        with self._lock:
+            for key in [k for k in self._pciaddrs if k[0] == pod_name]:
+                del self._pciaddrs[key]
+
+    def get_vf_rep(
+        self,
+        node_name: str,
+        pciaddr: str,
+        fetch: Callable[[], Optional[str]],
+        resolve: Callable[[str, str], Optional[str]],
+        *,
+        other_pciaddrs: Iterable[str] = (),
+    ) -> Optional[str]:
+        """Look up the VF representor on "node_name" for "pciaddr".
+
+        fetch() returns the device listing of the node (or None on failure)
+        and resolve(listing, pciaddr) finds a representor in it. The listing
+        is fetched at most once per node, unless "pciaddr" is not found in a
+        previous listing. Then it is fetched once more.
+
+        The representors of "other_pciaddrs" (of the other pods on the node)
+        are resolved from the same listing, so that looking them up later
+        needs no exec. They never cause a fetch.
+        """
+        key = (node_name, pciaddr)
+        with self._key_lock(("node", node_name)):
+            with self._lock:
+                vf_rep = self._vf_reps.get(key)
+                devices = self._node_devices.get(node_name)
+            if vf_rep is not None:
+                return vf_rep
+
+            if devices is not None:
+                vf_rep = resolve(devices, pciaddr)
+
+            if vf_rep is None:
+                devices = fetch()
+                if devices is None:
+                    return None
+                with self._lock:
+                    self._node_devices[node_name] = devices
+                vf_rep = resolve(devices, pciaddr)
+
+            assert devices is not None
+            with self._lock:
+                others = [
+                    p
+                    for p in other_pciaddrs
+                    if p != pciaddr and (node_name, p) not in self._vf_reps
+                ]
+            vf_reps = {pciaddr: vf_rep, **{p: resolve(devices, p) for p in others}}
+
+            with self._lock:
+                for p, r in vf_reps.items():
+                    if r is not None:
+                        self._vf_reps[(node_name, p)] = r
+            return vf_rep
+
+    def clear(self) -> None:
+        with self._lock:
+            self._key_locks.clear()
+            self._pciaddrs.clear()
+            self._node_devices.clear()
+            self._vf_reps.clear()